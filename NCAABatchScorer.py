@@ -0,0 +1,166 @@
+"""Stream-score large player CSVs (e.g. simulated dynasties) across a process pool
+
+Usage: python NCAABatchScorer.py players.csv [-o scored.csv] [--model models/ncaa_v3.0.json]
+                                 [--chunk-size 50000] [--workers N]
+
+Input columns use the names save_complete_data uses: position, year,
+dev_trait, xp_penalty and the 13 coaching flags (HC_Moti.1 ... DC_TD3);
+the workbook's Position/Year/DevT/XP.Penalty headers are accepted too and
+missing coaching columns count as 0. Coaching flags are 0/1, yes/no or
+true/false (an empty cell is 0). Every input column is passed through
+and predicted_skill_points is appended. Blocks of lines are parsed and
+scored in worker processes while the main process only reads and writes
+text, and at most a few blocks per worker are in flight, so memory stays
+flat however large the file is and output keeps the input order. Rows
+with an unknown category or flag value get an empty prediction and are
+counted on stderr. Quoted fields may not contain line breaks.
+"""
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from NCAAScoringEngine import DEFAULT_MODEL_PATH, ScoringEngine, load_artifact
+
+OUTPUT_COLUMN = 'predicted_skill_points'
+
+# Workbook (R) header -> save_complete_data name
+ALIASES = {'Position': 'position', 'Year': 'year', 'DevT': 'dev_trait', 'XP.Penalty': 'xp_penalty'}
+
+# Coaching flag spellings (lower-cased); numbers equal to 0 or 1 are accepted too
+FLAGS = {'': 0, '0': 0, '1': 1, 'no': 0, 'yes': 1, 'false': 0, 'true': 1, 'n': 0, 'y': 1}
+
+_engine = None
+_columns = None
+
+
+def _init_worker(model_path, floor, header):
+    global _engine, _columns
+    _engine = ScoringEngine.from_artifact(load_artifact(model_path), floor=floor)
+    names = [ALIASES.get(name.strip(), name.strip()) for name in header]
+    _columns = {name: i for i, name in enumerate(names)}
+    missing = {'position', 'year', 'dev_trait', 'xp_penalty'} - set(_columns)
+    if missing:
+        raise KeyError(f"Input is missing columns: {', '.join(sorted(missing))}")
+
+
+def _float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def _flag(value):
+    """1 or 0 for a coaching flag cell, -1 when it is neither"""
+    flag = FLAGS.get(value.lower())
+    if flag is None:
+        number = _float(value)
+        flag = int(number) if number in (0, 1) else -1
+    return flag
+
+
+def _codes(values, lookup):
+    """Map a column of strings through lookup(unique value) without a per-row Python call"""
+    uniques, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    return np.array([lookup(u.strip()) for u in uniques.tolist()])[inverse.reshape(-1)]
+
+
+def score_block(text):
+    """Score one block of CSV lines; returns (output text, rows, invalid rows)"""
+    engine, columns = _engine, _columns
+    lines = text.splitlines()
+    width = len(columns)
+    rows = [row if len(row) >= width else row + [''] * (width - len(row)) for row in csv.reader(lines)]
+    if not rows:
+        return '', 0, 0
+    cells = list(zip(*rows))
+
+    positions = _codes(cells[columns['position']], lambda v: engine.position_index.get(v, -1))
+    years = _codes(cells[columns['year']], lambda v: engine.year_index.get(v, -1))
+    dev_traits = _codes(cells[columns['dev_trait']], lambda v: engine.dev_trait_index.get(v, -1))
+    xp = _codes(cells[columns['xp_penalty']], _float)
+    masks = np.zeros(len(rows), dtype=np.int64)
+    valid = (positions >= 0) & (years >= 0) & (dev_traits >= 0) & ~np.isnan(xp)
+    for bit, var in enumerate(engine.coaching_vars):
+        if var in columns:
+            flags = _codes(cells[columns[var]], _flag)
+            valid &= flags >= 0
+            masks |= (flags == 1).astype(np.int64) << bit
+
+    keys = engine.table.pack(positions[valid], years[valid], dev_traits[valid], masks[valid])
+    formatted = np.full(len(rows), '', dtype=object)
+    formatted[valid] = np.char.mod('%.4f', engine.table.predict_keys(keys, xp[valid]))
+
+    # Lines hold no embedded line breaks, so the prediction is appended to the raw text
+    out = '\n'.join(f"{line},{p}" for line, p in zip(lines, formatted.tolist()))
+    return out + '\n', len(rows), int((~valid).sum())
+
+
+def blocks(lines, chunk_size):
+    while True:
+        block = ''.join(itertools.islice(lines, chunk_size))
+        if not block:
+            return
+        yield block
+
+
+def score_file(source, sink, model_path=DEFAULT_MODEL_PATH, floor=0, chunk_size=50000, workers=None,
+               in_flight=2):
+    """Stream source CSV to sink with predictions appended; returns (rows, invalid rows)"""
+    header_line = source.readline()
+    header = next(csv.reader([header_line]))
+    csv.writer(sink, lineterminator='\n').writerow(header + [OUTPUT_COLUMN])
+
+    workers = workers or os.cpu_count() or 1
+    total = invalid = 0
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model_path, floor, header)) as pool:
+        limit = in_flight * workers
+        pending = deque()
+        for block in blocks(source, chunk_size):
+            pending.append(pool.submit(score_block, block))
+            if len(pending) >= limit:
+                text, rows, bad = pending.popleft().result()
+                sink.write(text)
+                total, invalid = total + rows, invalid + bad
+        while pending:
+            text, rows, bad = pending.popleft().result()
+            sink.write(text)
+            total, invalid = total + rows, invalid + bad
+    return total, invalid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="CSV of players ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="scored CSV ('-' for stdout)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--no-floor", action="store_true", help="allow negative predictions, as the desktop app does")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="lines per block sent to a worker")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == '-' else open(args.input, newline='')
+    sink = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    start = time.perf_counter()
+    try:
+        rows, invalid = score_file(source, sink, args.model, None if args.no_floor else 0,
+                                   args.chunk_size, args.workers)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows:,} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s); "
+          f"{invalid:,} with unknown categories or flag values left blank", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Scoring benchmarks: per-player dict arithmetic vs the vectorized engine and lookup tables
+
+The apps' scalar paths (calculate_prediction, predict_skill) now score
+through the engine too, so the dict arithmetic they used to do is kept
+here as dict_prediction and timed as the baseline.
+
+Usage: python NCAABenchmark.py [--players 100000] [--scalar-players 2000]
+       python NCAABenchmark.py --startup [--runs 5] [--max-first-prediction 1.5]
+
+--startup instead times cold starts: each run is a fresh interpreter that
+imports an entry point and makes its first prediction, which is what an
+autoscaled container pays before its first user sees a result. With
+--max-first-prediction the exit status is 1 when the web app's median
+time-to-first-prediction exceeds the budget, so it can gate a change.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+
+def random_players(position_coeffs, year_coeffs, dev_trait_coeffs, coaching_vars, n, seed=0):
+    """Random player dicts in the same layout as the web app's last_inputs"""
+    rng = random.Random(seed)
+    positions = list(position_coeffs)
+    years = list(year_coeffs)
+    dev_traits = list(dev_trait_coeffs)
+    players = []
+    for _ in range(n):
+        player = {var: rng.randint(0, 1) for var in coaching_vars}
+        player.update(
+            position=rng.choice(positions),
+            year=rng.choice(years),
+            dev_trait=rng.choice(dev_traits),
+            xp_penalty=rng.randint(0, 100)
+        )
+        players.append(player)
+    return players
+
+
+def dict_prediction(model, position, year, dev_trait, xp_penalty, coaching_abilities):
+    """Skill points from the coefficient dicts, as calculate_prediction computed them before the engine
+
+    Interaction terms are not summed, so it only matches the engine for
+    artifacts without them (the shipped ones).
+    """
+    coefficients = model.coefficients
+    prediction = coefficients['Intercept']
+    prediction += model.position_coeffs[position]
+    prediction += model.year_coeffs[year]
+    prediction += model.dev_trait_coeffs[dev_trait]
+    prediction += coefficients['XP_Penalty'] * xp_penalty
+    for var, value in coaching_abilities.items():
+        if value:
+            prediction += coefficients[var]
+    if model.engine.floor is not None:
+        prediction = max(model.engine.floor, prediction)
+    return prediction
+
+
+def bench_dict_baseline(model, players, coaching_vars):
+    """Time dict_prediction over players and check it agrees with the engine"""
+    def baseline():
+        return [dict_prediction(model, p['position'], p['year'], p['dev_trait'], p['xp_penalty'],
+                                {var: p[var] for var in coaching_vars})
+                for p in players]
+
+    report("dict arithmetic (pre-engine baseline)", best_time(baseline, 1), len(players))
+    if not model.engine.interaction_factors:
+        difference = max(abs(a - b) for a, b in zip(baseline(), model.engine.predict_batch(players)))
+        print(f"{'':<40} max difference from the engine: {difference:.2e}")
+
+
+def best_time(fn, repeat=3):
+    """Best wall time of several runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(name, seconds, n):
+    print(f"{name:<40} {seconds / n * 1e6:>10.3f} us/player {n / seconds:>14,.0f} players/s")
+
+
+def bench_web_app(n, scalar_n):
+    import NCAAModelWebApp as app
+
+    model = app.current_model()
+    coaching_vars = list(app.variable_labels)
+    players = random_players(model.position_coeffs, model.year_coeffs, model.dev_trait_coeffs, coaching_vars, n)
+    scalar = players[:scalar_n]
+
+    def scalar_path():
+        for p in scalar:
+            app.calculate_prediction(p['position'], p['year'], p['dev_trait'], p['xp_penalty'],
+                                     {var: p[var] for var in coaching_vars})
+
+    engine = model.engine
+    positions, years, dev_traits, masks, xp = engine.encode(players)
+    keys = engine.table.pack(positions, years, dev_traits, masks)
+
+    print(f"--- Web app, model v{model.version} ({n:,} players) ---")
+    bench_dict_baseline(model, scalar, coaching_vars)
+    report("calculate_prediction (scalar)", best_time(scalar_path, 1), len(scalar))
+    report("ScoringEngine.predict_batch", best_time(lambda: engine.predict_batch(players)), n)
+    report("ScoringEngine.predict_lookup", best_time(lambda: engine.predict_lookup(players)), n)
+    report("PredictionTable.predict_keys (pre-encoded)", best_time(lambda: engine.table.predict_keys(keys, xp)), n)
+
+
+def bench_desktop_gui(n, scalar_n):
+    import tkinter as tk
+    import NCAAPredictorGUI as gui
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"--- Desktop GUI model skipped: {e} ---")
+        return
+    root.withdraw()
+    app = gui.SkillPointsPredictor(root)
+
+    model = app.model
+    coaching_vars = list(gui.variable_labels)
+    players = random_players(model.position_coeffs, model.year_coeffs, model.dev_trait_coeffs, coaching_vars, n)
+    scalar = players[:scalar_n]
+    labels = {1: "Yes", 0: "No"}
+
+    def scalar_path():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for p in scalar:
+                app.position_var.set(p['position'])
+                app.year_var.set(p['year'])
+                app.dev_var.set(p['dev_trait'])
+                app.xp_entry.delete(0, tk.END)
+                app.xp_entry.insert(0, str(p['xp_penalty']))
+                for var in coaching_vars:
+                    app.entries[var].set(labels[p[var]])
+                app.predict_skill()
+
+    engine = model.engine
+    positions, years, dev_traits, masks, xp = engine.encode(players)
+    keys = engine.table.pack(positions, years, dev_traits, masks)
+
+    print(f"--- Desktop GUI, model v{model.version} ({n:,} players) ---")
+    bench_dict_baseline(model, scalar, coaching_vars)
+    report("SkillPointsPredictor.predict_skill (scalar)", best_time(scalar_path, 1), len(scalar))
+    report("ScoringEngine.predict_batch", best_time(lambda: engine.predict_batch(players)), n)
+    report("ScoringEngine.predict_lookup", best_time(lambda: engine.predict_lookup(players)), n)
+    report("PredictionTable.predict_keys (pre-encoded)", best_time(lambda: engine.table.predict_keys(keys, xp)), n)
+    root.destroy()
+
+
+# Run in a fresh interpreter: import an entry point, then make its first prediction
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module} as app
+imported = time.perf_counter()
+{predict}
+done = time.perf_counter()
+heavy = [m for m in ('pandas', 'gspread', 'google.oauth2.service_account') if m in sys.modules]
+print(json.dumps({{'import': imported - start, 'first_prediction': done - start, 'loaded': heavy}}))
+"""
+
+STARTUP_TARGETS = {
+    'web app': ('NCAAModelWebApp',
+                "app.calculate_prediction('QB', 'FR', 'Impact', 0, {v: 0 for v in app.variable_labels})"),
+    'desktop GUI': ('NCAAPredictorGUI',
+                    "app.MODEL_STORE.get().engine.predict('QB', 'FR', 'Impact', 0, {})"),
+}
+
+
+def time_startup(module, predict):
+    """Seconds to import module and to its first prediction, measured in a new interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT.format(module=module, predict=predict)],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def bench_startup(runs):
+    """Median cold-start times per entry point; returns the web app's median time-to-first-prediction"""
+    print(f"--- Cold start, median of {runs} fresh interpreters ---")
+    medians = {}
+    for name, (module, predict) in STARTUP_TARGETS.items():
+        try:
+            samples = [time_startup(module, predict) for _ in range(runs)]
+        except subprocess.CalledProcessError as e:
+            print(f"{name:<14} skipped: {e.stderr.strip().splitlines()[-1] if e.stderr.strip() else e}")
+            continue
+        imported = statistics.median(s['import'] for s in samples)
+        first = medians[name] = statistics.median(s['first_prediction'] for s in samples)
+        loaded = ', '.join(samples[0]['loaded']) or 'none'
+        print(f"{name:<14} import {imported * 1000:>8.1f} ms   first prediction {first * 1000:>8.1f} ms   "
+              f"heavy modules loaded: {loaded}")
+    return medians.get('web app')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=100000, help="players scored by the batch paths")
+    parser.add_argument("--scalar-players", type=int, default=2000, help="players scored by the per-player paths")
+    parser.add_argument("--startup", action="store_true", help="time cold starts instead of scoring throughput")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per entry point with --startup")
+    parser.add_argument("--max-first-prediction", type=float, default=None,
+                        help="fail when the web app's median time-to-first-prediction exceeds this many seconds")
+    args = parser.parse_args()
+
+    if args.startup:
+        first = bench_startup(args.runs)
+        if args.max_first_prediction is not None and (first is None or first > args.max_first_prediction):
+            print(f"Time-to-first-prediction over budget ({args.max_first_prediction:.2f}s)")
+            sys.exit(1)
+        return
+
+    for bench in (bench_web_app, bench_desktop_gui):
+        try:
+            bench(args.players, min(args.scalar_players, args.players))
+        except ImportError as e:
+            print(f"--- {bench.__name__} skipped: {e} ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Bootstrap prediction intervals for every position x year x dev trait cell
+
+Usage: python NCAABootstrap.py ["NCAA R Code Data.xlsx"] [--model models/ncaa_v3.0.json]
+                               [--replicates 2000] [--workers N] [--work-dir bootstrap_work]
+
+Each replicate resamples the cleaned training rows with replacement, refits
+Dummy_Model_Clean and records, for every cell, the refit's prediction plus
+a residual drawn from the same dev trait bucket, as an offset from the full
+fit's prediction. Cells are evaluated at the training set's average staff
+and XP penalty, so the offsets carry the uncertainty of the position, year
+and dev trait terms plus the residual spread. Chunks of replicates run
+across a process pool and each chunk is saved as it finishes, so an
+interrupted run picks up where it stopped. Chunk files are named after a
+digest of the training rows, the formula and the artifact's cells, so a
+run on other data or another model never reuses them. The quantiles are written next to
+the model artifact (<artifact>.intervals.npz), where both apps pick them up.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from NCAAScoringEngine import DEFAULT_MODEL_PATH, Model, PredictionIntervals, intervals_path, load_artifact
+from NCAATraining import COACHING_VARS, DATA_PATH, DUMMY_MODEL, design_matrix, load_training_data, train
+
+LEVELS = [0.5, 0.8, 0.95]
+
+_data = None
+
+
+def _init_worker(data):
+    global _data
+    _data = data
+
+
+def cell_design(data, positions, years, dev_traits):
+    """One design row per position x year x dev trait cell, at the average staff and XP"""
+    grid = np.array([(p, y, d) for p in positions for y in years for d in dev_traits], dtype=object)
+    cells = {
+        'Position': grid[:, 0],
+        'Year': grid[:, 1],
+        'DevT': grid[:, 2],
+        'Skill.Points': np.zeros(len(grid)),
+        'XP.Penalty': np.full(len(grid), data['XP.Penalty'].mean())
+    }
+    for var in COACHING_VARS:
+        cells[var] = np.full(len(grid), data[var].mean())
+    levels = {'Position': positions, 'Year': years, 'DevT': dev_traits}
+    X, _ = design_matrix(cells, DUMMY_MODEL, levels)
+    return X, grid[:, 2]
+
+
+def run_chunk(chunk, size, seed, draws, categories):
+    """Prediction offsets for one chunk of replicates: array (size * draws, cells)"""
+    positions, years, dev_traits = categories
+    data = _data
+    levels = {'Position': positions, 'Year': years, 'DevT': dev_traits}
+    X, _ = design_matrix(data, DUMMY_MODEL, levels)
+    y = data['Skill.Points']
+    devt = data['DevT']
+    X_cells, cell_devt = cell_design(data, positions, years, dev_traits)
+    point = X_cells @ np.linalg.lstsq(X, y, rcond=None)[0]
+
+    offsets = np.empty((size * draws, len(X_cells)), dtype=np.float32)
+    for r in range(size):
+        rng = np.random.default_rng([seed, chunk, r])
+        sample = rng.integers(0, len(y), len(y))
+        beta = np.linalg.lstsq(X[sample], y[sample], rcond=None)[0]
+        residuals = y[sample] - X[sample] @ beta
+        refit = X_cells @ beta
+        noise = np.empty((draws, len(X_cells)))
+        for d in dev_traits:
+            pool = residuals[devt[sample] == d]
+            if pool.size == 0:
+                pool = residuals
+            cells = cell_devt == d
+            noise[:, cells] = rng.choice(pool, size=(draws, int(cells.sum())))
+        offsets[r * draws:(r + 1) * draws] = refit + noise - point
+    return offsets
+
+
+def inputs_digest(data, categories, terms=DUMMY_MODEL):
+    """Short hash of everything a chunk's offsets depend on besides seed, chunk size and draws"""
+    digest = hashlib.sha256(json.dumps([terms, [list(c) for c in categories]]).encode())
+    for column in ['Skill.Points', 'Position', 'Year', 'DevT', 'XP.Penalty'] + COACHING_VARS:
+        values = data[column]
+        if values.dtype == object:
+            digest.update('\x00'.join(map(str, values)).encode())
+        else:
+            digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def bootstrap(data, categories, work_dir, replicates=2000, chunk_size=100, draws=4, seed=0, workers=None):
+    """Run (or resume) the replicate chunks and return all offsets stacked"""
+    os.makedirs(work_dir, exist_ok=True)
+    n_chunks = -(-replicates // chunk_size)
+    tag = f"{seed}_{chunk_size}x{draws}_{inputs_digest(data, categories)}"
+    paths = [os.path.join(work_dir, f"chunk_{tag}_{i:05d}.npy") for i in range(n_chunks)]
+    todo = [i for i, path in enumerate(paths) if not os.path.exists(path)]
+    print(f"{n_chunks - len(todo)} of {n_chunks} chunks already done")
+
+    if todo:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(data,)) as pool:
+            futures = {
+                pool.submit(run_chunk, i, min(chunk_size, replicates - i * chunk_size), seed, draws, categories): i
+                for i in todo
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                tmp = paths[i] + '.tmp'
+                with open(tmp, 'wb') as f:
+                    np.save(f, future.result())
+                os.replace(tmp, paths[i])
+                print(f"  chunk {i} done ({done}/{len(todo)})")
+    return np.concatenate([np.load(path) for path in paths])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data", nargs="?", default=DATA_PATH, help="training workbook")
+    parser.add_argument("--sheet", default=0)
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="artifact whose cells the intervals are keyed to")
+    parser.add_argument("--replicates", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=100)
+    parser.add_argument("--draws", type=int, default=4, help="residual draws per replicate and cell")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--work-dir", default="bootstrap_work", help="where finished chunks are kept for resuming")
+    args = parser.parse_args()
+
+    engine = Model(load_artifact(args.model)).engine
+    categories = (engine.positions, engine.years, engine.dev_traits)
+    _, data = train(load_training_data(args.data, args.sheet))
+
+    start = time.perf_counter()
+    offsets = bootstrap(data, categories, args.work_dir, args.replicates, args.chunk_size,
+                        args.draws, args.seed, args.workers)
+    quantiles = []
+    for level in LEVELS:
+        tail = (1 - level) / 2
+        quantiles.append(np.quantile(offsets, [tail, 1 - tail], axis=0).T)
+    intervals = PredictionIntervals(LEVELS, np.stack(quantiles, axis=1), *categories, n_boot=args.replicates)
+
+    out = intervals_path(args.model)
+    intervals.save(out)
+    print(f"Wrote {intervals.offsets.shape[0]} cells x {len(LEVELS)} levels to {out} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Out-of-sample comparison of the notebook's candidate models
+
+Usage: python NCAACrossValidation.py ["NCAA R Code Data.xlsx"] [--folds 10] [--repeats 5]
+                                     [--workers N] [--json cv_results.json]
+
+Runs repeated k-fold and leave-one-team-out cross-validation for
+Full_Model, Dummy_Model and their _Clean variants in parallel across a
+process pool. _Clean variants drop 1.5 x IQR residual outliers from the
+training folds only; every held-out row is scored, so their error is
+not flattered by removing hard cases. Reports overall, per DevT and per
+position error next to the in-sample numbers the notebook shows.
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from NCAATraining import (
+    CATEGORICAL, DATA_PATH, DUMMY_MODEL, FULL_MODEL, category_levels, design_matrix, iqr_inliers,
+    load_training_data
+)
+
+CANDIDATES = {
+    'Full_Model': (FULL_MODEL, False),
+    'Dummy_Model': (DUMMY_MODEL, False),
+    'Full_Model_Clean': (FULL_MODEL, True),
+    'Dummy_Model_Clean': (DUMMY_MODEL, True)
+}
+
+_data = None
+
+
+def _init_worker(data):
+    global _data
+    _data = data
+
+
+def kfold_splits(n, folds, repeats, seed=0):
+    """(repeat, test index arrays) for repeated shuffled k-fold"""
+    for repeat in range(repeats):
+        order = np.random.default_rng([seed, repeat]).permutation(n)
+        yield f"kfold-{repeat}", np.array_split(order, folds)
+
+
+def team_splits(teams):
+    """Leave-one-team-out test index arrays"""
+    yield "team", [np.flatnonzero(teams == team) for team in sorted(set(teams))]
+
+
+def fit_predict(X, y, train, test, clean):
+    beta = np.linalg.lstsq(X[train], y[train], rcond=None)[0]
+    if clean:
+        train = train[iqr_inliers(y[train] - X[train] @ beta)]
+        beta = np.linalg.lstsq(X[train], y[train], rcond=None)[0]
+    return X[test] @ beta
+
+
+def run_split(candidate, split, tests):
+    """Held-out predictions for every fold of one split of one candidate"""
+    terms, clean = CANDIDATES[candidate]
+    data = _data
+    levels = {column: category_levels(data, column) for column in CATEGORICAL}
+    X, _ = design_matrix(data, terms, levels)
+    y = data['Skill.Points']
+    everything = np.arange(len(y))
+
+    start = time.perf_counter()
+    predicted = np.full(len(y), np.nan)
+    for test in tests:
+        train = np.setdiff1d(everything, test, assume_unique=True)
+        predicted[test] = fit_predict(X, y, train, test, clean)
+    return candidate, split, predicted, time.perf_counter() - start, len(tests)
+
+
+def error_summary(residuals):
+    abs_err = np.abs(residuals)
+    return {
+        'n': int(residuals.size),
+        'mae': float(abs_err.mean()),
+        'rmse': float(np.sqrt((residuals ** 2).mean())),
+        'within_5': float((abs_err <= 5).mean() * 100),
+        'within_10': float((abs_err <= 10).mean() * 100)
+    }
+
+
+def summarize(data, predictions):
+    """Overall, per DevT and per position error for stacked held-out predictions"""
+    y = data['Skill.Points']
+    residuals = np.concatenate([y - p for p in predictions])
+    devt = np.concatenate([data['DevT']] * len(predictions))
+    position = np.concatenate([data['Position']] * len(predictions))
+    summary = error_summary(residuals)
+    summary['r_squared'] = float(1 - (residuals ** 2).sum() / (len(predictions) * ((y - y.mean()) ** 2).sum()))
+    summary['by_devt'] = {d: error_summary(residuals[devt == d]) for d in category_levels(data, 'DevT')}
+    summary['by_position'] = {p: error_summary(residuals[position == p]) for p in category_levels(data, 'Position')}
+    return summary
+
+
+def in_sample(data, candidate):
+    terms, clean = CANDIDATES[candidate]
+    X, _ = design_matrix(data, terms)
+    y = data['Skill.Points']
+    everything = np.arange(len(y))
+    keep = everything
+    if clean:
+        beta = np.linalg.lstsq(X, y, rcond=None)[0]
+        keep = everything[iqr_inliers(y - X @ beta)]
+    predicted = fit_predict(X, y, keep, keep, False)
+    return error_summary(y[keep] - predicted)
+
+
+def cross_validate(data, candidates=tuple(CANDIDATES), folds=10, repeats=5, seed=0, workers=None):
+    """Run every candidate over repeated k-fold and leave-one-team-out splits"""
+    tasks = []
+    for candidate in candidates:
+        for split, tests in kfold_splits(len(data['Skill.Points']), folds, repeats, seed):
+            tasks.append((candidate, split, tests))
+        for split, tests in team_splits(data['Team']):
+            tasks.append((candidate, split, tests))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(data,)) as pool:
+        outputs = list(pool.map(run_split, *zip(*tasks)))
+    wall = time.perf_counter() - start
+
+    results = {}
+    for candidate in candidates:
+        runs = [o for o in outputs if o[0] == candidate]
+        kfold = [o for o in runs if o[1].startswith('kfold')]
+        team = [o for o in runs if o[1] == 'team']
+        fits = sum(o[4] for o in runs)
+        results[candidate] = {
+            'in_sample': in_sample(data, candidate),
+            'kfold': summarize(data, [o[2] for o in kfold]),
+            'team': summarize(data, [o[2] for o in team]),
+            'fits': fits,
+            'ms_per_fit': sum(o[3] for o in runs) / fits * 1000
+        }
+    return results, wall
+
+
+def print_report(results, wall, folds, repeats):
+    print(f"{'Model':<20} {'In-sample MAE':>14} {f'{repeats}x{folds}-fold MAE':>16} {'RMSE':>7} {'R2':>7} "
+          f"{'Team-out MAE':>13} {'RMSE':>7} {'ms/fit':>7}")
+    for candidate, r in results.items():
+        print(f"{candidate:<20} {r['in_sample']['mae']:>14.3f} {r['kfold']['mae']:>16.3f} "
+              f"{r['kfold']['rmse']:>7.3f} {r['kfold']['r_squared']:>7.4f} {r['team']['mae']:>13.3f} "
+              f"{r['team']['rmse']:>7.3f} {r['ms_per_fit']:>7.2f}")
+
+    for group, label in (('by_devt', 'DevT'), ('by_position', 'Position')):
+        print(f"\nOut-of-sample MAE (k-fold) by {label}")
+        candidates = list(results)
+        levels = list(results[candidates[0]]['kfold'][group])
+        print(f"{label:<10} {'n':>5} " + " ".join(f"{c:>18}" for c in candidates))
+        for level in levels:
+            n = results[candidates[0]]['kfold'][group][level]['n'] // repeats
+            print(f"{level:<10} {n:>5} " + " ".join(
+                f"{results[c]['kfold'][group][level]['mae']:>18.3f}" for c in candidates))
+
+    fits = sum(r['fits'] for r in results.values())
+    print(f"\n{fits} fits in {wall:.2f}s wall time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data", nargs="?", default=DATA_PATH, help="training workbook")
+    parser.add_argument("--sheet", default=0)
+    parser.add_argument("--folds", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--json", help="also write the full results here")
+    args = parser.parse_args()
+
+    data = load_training_data(args.data, args.sheet)
+    results, wall = cross_validate(data, folds=args.folds, repeats=args.repeats, seed=args.seed, workers=args.workers)
+    print_report(results, wall, args.folds, args.repeats)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Columnar cache of the training workbooks so refits skip the XLSX parse
+
+Usage: python NCAADataCache.py ["NCAA R Code Data.xlsx"] [--sheet FINAL] [--rebuild]
+
+A workbook sheet is converted once into .npy columns under CACHE_DIR:
+Team/Name/Position/Year/DevT as int16 codes plus a level list (already
+trimmed), the 13 coaching flags as one uint16 bitmask (bit i is
+COACHING_VARS[i], as in PredictionTable; a flag column holding anything
+but 0/1, such as blanks read as NaN, is kept as float64 instead) and the
+numeric columns as float64. Each workbook path gets its own directory.
+Later loads memory-map the arrays without parsing anything. The
+cache is rebuilt only when the source changes: a matching size and mtime is
+trusted as-is, and on an mtime change the file hash decides.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from NCAATraining import COACHING_VARS, DATA_PATH, parse_training_data, write_json_atomic
+
+CACHE_DIR = os.environ.get("NCAA_CACHE_DIR", ".ncaa_cache")
+CACHE_FORMAT = 1
+
+CATEGORY_COLUMNS = ['Team', 'Name', 'Position', 'Year', 'DevT']
+NUMERIC_COLUMNS = ['Skill.Points', 'Snaps', 'XP.Penalty']
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(path, sheet_name):
+    """Directory name for a workbook sheet; the hash of the absolute path keeps same-named workbooks apart"""
+    stem = os.path.splitext(os.path.basename(path))[0].replace(' ', '_')
+    digest = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:12]
+    return f"{stem}-{sheet_name}-{digest}"
+
+
+def encode_coaching(data):
+    """Pack the 0/1 coaching flag columns into one uint16 bitmask per row
+
+    Returns the masks and the flag columns that hold anything else, which
+    are kept as they are so a cached load matches parse_training_data.
+    """
+    masks = np.zeros(len(data['Skill.Points']), dtype=np.uint16)
+    other = {}
+    for bit, var in enumerate(COACHING_VARS):
+        flags = data[var]
+        if np.isin(flags, (0, 1)).all():
+            masks |= flags.astype(np.uint16) << bit
+        else:
+            other[var] = flags
+    return masks, other
+
+
+def decode_coaching(masks, other=None):
+    data = {var: ((masks >> bit) & 1).astype(np.float64) for bit, var in enumerate(COACHING_VARS)}
+    data.update(other or {})
+    return data
+
+
+class DataCache:
+    """One cached workbook sheet: a manifest plus its .npy columns"""
+
+    def __init__(self, path=DATA_PATH, sheet_name=0, cache_dir=CACHE_DIR):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.directory = os.path.join(cache_dir, cache_key(path, sheet_name))
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+
+    def _manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return manifest if manifest.get('format') == CACHE_FORMAT else None
+
+    def is_fresh(self):
+        """Whether the cached columns still match the source workbook"""
+        manifest = self._manifest()
+        if manifest is None or manifest['source'] != os.path.abspath(self.path):
+            return False
+        st = os.stat(self.path)
+        if (st.st_size, st.st_mtime_ns) == (manifest['size'], manifest['mtime_ns']):
+            return True
+        if st.st_size != manifest['size'] or file_hash(self.path) != manifest['sha256']:
+            return False
+        # Touched but unchanged: remember the new mtime so the next check skips hashing
+        manifest['mtime_ns'] = st.st_mtime_ns
+        write_json_atomic(manifest, self.manifest_path)
+        return True
+
+    def build(self):
+        """Parse the workbook and write a new generation of cached columns"""
+        st = os.stat(self.path)
+        data = parse_training_data(self.path, self.sheet_name)
+        os.makedirs(self.directory, exist_ok=True)
+        generation = time.time_ns()
+
+        columns = {}
+        levels = {}
+        for column in CATEGORY_COLUMNS:
+            levels[column], codes = np.unique(data[column].astype(str), return_inverse=True)
+            columns[column] = codes.astype(np.int16)
+            levels[column] = levels[column].tolist()
+        for column in NUMERIC_COLUMNS:
+            columns[column] = data[column]
+        columns['coaching'], other = encode_coaching(data)
+        columns.update(other)
+
+        files = {}
+        for column, values in columns.items():
+            files[column] = f"{column}.{generation}.npy"
+            np.save(os.path.join(self.directory, files[column]), values)
+
+        previous = self._manifest()
+        write_json_atomic({
+            'format': CACHE_FORMAT,
+            'source': os.path.abspath(self.path),
+            'sheet': self.sheet_name,
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': file_hash(self.path),
+            'rows': len(data['Skill.Points']),
+            'coaching_vars': COACHING_VARS,
+            'levels': levels,
+            'files': files
+        }, self.manifest_path)
+        # Readers open the arrays named in the manifest, so the old generation can go now
+        if previous:
+            for name in previous['files'].values():
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def columns(self):
+        """Raw cached columns: memory-mapped arrays plus the category levels"""
+        manifest = self._manifest()
+        arrays = {
+            column: np.load(os.path.join(self.directory, name), mmap_mode='r')
+            for column, name in manifest['files'].items()
+        }
+        return arrays, manifest['levels']
+
+    def load(self, rebuild=False):
+        """Training data in the load_training_data layout, rebuilding the cache if stale"""
+        if rebuild or not self.is_fresh():
+            self.build()
+        arrays, levels = self.columns()
+        data = {}
+        for column in CATEGORY_COLUMNS:
+            data[column] = np.array(levels[column], dtype=object)[arrays[column]]
+        for column in NUMERIC_COLUMNS:
+            data[column] = np.asarray(arrays[column])
+        other = {var: np.asarray(arrays[var]) for var in COACHING_VARS if var in arrays}
+        data.update(decode_coaching(arrays['coaching'], other))
+        return data
+
+
+def load_cached(path=DATA_PATH, sheet_name=0, cache_dir=CACHE_DIR):
+    return DataCache(path, sheet_name, cache_dir).load()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data", nargs="?", default=DATA_PATH, help="training workbook")
+    parser.add_argument("--sheet", default=0)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="rebuild even if the cache is fresh")
+    args = parser.parse_args()
+
+    cache = DataCache(args.data, args.sheet, args.cache_dir)
+    start = time.perf_counter()
+    fresh = cache.is_fresh()
+    data = cache.load(rebuild=args.rebuild)
+    elapsed = (time.perf_counter() - start) * 1000
+    state = "hit" if fresh and not args.rebuild else "rebuilt"
+    print(f"{args.data} [{args.sheet}]: {len(data['Skill.Points'])} rows, cache {state} in {elapsed:.1f} ms")
+
+    start = time.perf_counter()
+    cache.load()
+    print(f"Cached load: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
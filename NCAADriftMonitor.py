@@ -0,0 +1,294 @@
+"""Shadow-score submitted results with every registered model and watch for drift
+
+Usage: python NCAADriftMonitor.py [drift_state.json]                  (report)
+       python NCAADriftMonitor.py --replay submissions.db [--out drift_state.json]
+
+Every actual result that comes in is scored by all model artifacts in
+models/ (the served one and the ones in shadow). The error is folded into
+running Welford statistics per model, overall and per DevT and position,
+both all-time and in fixed time windows, so a submission costs a constant
+amount of work however long the history is. A drift alert fires when a
+group's MAE over the recent windows exceeds the model's own baseline (the
+per-DevT MAE from devt_accuracy, or the overall model_stats MAE) by the
+tolerance factor, once the group has min_n recent results; it clears once
+the recent MAE is back within half the tolerance.
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from NCAAMetrics import inc, set_gauge
+from NCAAScoringEngine import MODELS_DIR, ModelStore
+from NCAATraining import COACHING_VARS, write_json_atomic
+
+STATE_PATH = "drift_state.json"
+
+
+class ErrorStats:
+    """Welford running mean/variance of errors (actual - predicted) plus the mean absolute error"""
+
+    __slots__ = ('n', 'mean', 'm2', 'abs_sum')
+
+    def __init__(self, n=0, mean=0.0, m2=0.0, abs_sum=0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.abs_sum = abs_sum
+
+    def add(self, error):
+        self.n += 1
+        delta = error - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (error - self.mean)
+        self.abs_sum += abs(error)
+
+    def merge(self, other):
+        """Combined statistics of two disjoint samples (Chan et al.)"""
+        n = self.n + other.n
+        if not n:
+            return ErrorStats()
+        delta = other.mean - self.mean
+        return ErrorStats(n, self.mean + delta * other.n / n,
+                          self.m2 + other.m2 + delta * delta * self.n * other.n / n,
+                          self.abs_sum + other.abs_sum)
+
+    @property
+    def mae(self):
+        return self.abs_sum / self.n if self.n else math.nan
+
+    @property
+    def rmse(self):
+        return math.sqrt(self.m2 / self.n + self.mean ** 2) if self.n else math.nan
+
+    @property
+    def bias(self):
+        return self.mean if self.n else math.nan
+
+    def to_list(self):
+        return [self.n, self.mean, self.m2, self.abs_sum]
+
+
+class WindowedStats:
+    """All-time ErrorStats plus one ErrorStats per time window, keeping the last `windows` windows"""
+
+    def __init__(self, window, windows, total=None, buckets=None):
+        self.window = window
+        self.windows = windows
+        self.total = total or ErrorStats()
+        self.buckets = buckets or {}
+
+    def add(self, error, now):
+        self.total.add(error)
+        period = int(now // self.window)
+        bucket = self.buckets.get(period)
+        if bucket is None:
+            bucket = self.buckets[period] = ErrorStats()
+            while len(self.buckets) > self.windows:
+                del self.buckets[min(self.buckets)]
+        bucket.add(error)
+
+    def recent(self, now):
+        """Statistics over the last `windows` windows ending at now"""
+        first = int(now // self.window) - self.windows + 1
+        stats = ErrorStats()
+        for period, bucket in self.buckets.items():
+            if period >= first:
+                stats = stats.merge(bucket)
+        return stats
+
+    def to_dict(self):
+        return {'total': self.total.to_list(),
+                'buckets': {str(period): bucket.to_list() for period, bucket in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, d, window, windows):
+        return cls(window, windows, ErrorStats(*d['total']),
+                   {int(period): ErrorStats(*bucket) for period, bucket in d['buckets'].items()})
+
+
+def registered_models(models_dir=MODELS_DIR):
+    """ModelStore per coefficient artifact in models_dir, keyed by file name (e.g. ncaa_v3.0)"""
+    stores = {}
+    for path in sorted(glob.glob(os.path.join(models_dir, '*.json'))):
+        stores[os.path.splitext(os.path.basename(path))[0]] = ModelStore(path)
+    return stores
+
+
+class DriftMonitor:
+    """Shadow scoring of submitted rows with running error statistics and drift alerts
+
+    models maps a label to a ModelStore (reloaded as its artifact changes)
+    or a Model. on_alert, when given, is called with each new alert dict.
+    """
+
+    def __init__(self, models, window=86400.0, windows=7, min_n=30, tolerance=1.25, on_alert=None,
+                 max_alerts=100):
+        self.models = models
+        self.window = window
+        self.windows = windows
+        self.min_n = min_n
+        self.tolerance = tolerance
+        self.on_alert = on_alert
+        self.max_alerts = max_alerts
+        self.stats = {}
+        self.skipped = {}
+        self.alerts = []
+        self.alerting = set()
+        self._lock = threading.Lock()
+
+    def _model(self, label):
+        model = self.models[label]
+        return model.get() if isinstance(model, ModelStore) else model
+
+    def baseline(self, model, group, level):
+        """MAE the model reported on its own training data for this group"""
+        if group == 'devt' and level in model.devt_accuracy:
+            return model.devt_accuracy[level]['mae']
+        return model.model_stats.get('mae', math.nan)
+
+    def observe(self, rows, now=None):
+        """Score sheet rows (save_complete_data layout) with every model; returns new alerts"""
+        now = time.time() if now is None else now
+        fired = []
+        with self._lock:
+            for row in rows:
+                actual, position, year, devt, xp = float(row[2]), row[3], row[4], row[5], row[21]
+                flags = dict(zip(COACHING_VARS, row[8:21]))
+                for label in self.models:
+                    model = self._model(label)
+                    try:
+                        error = actual - model.engine.predict(position, year, devt, xp, flags)
+                    except KeyError:
+                        # The model has no coefficient for this position/year/DevT (e.g. SR in v3.0)
+                        self.skipped[label] = self.skipped.get(label, 0) + 1
+                        continue
+                    for group, level in (('all', ''), ('devt', devt), ('position', position)):
+                        key = (label, group, level)
+                        stats = self.stats.get(key)
+                        if stats is None:
+                            stats = self.stats[key] = WindowedStats(self.window, self.windows)
+                        stats.add(error, now)
+                        alert = self._check(model, key, stats.recent(now), now)
+                        if alert is not None:
+                            fired.append(alert)
+        for alert in fired:
+            inc("ncaa_drift_alerts_total", model=alert['model'])
+            if self.on_alert is not None:
+                self.on_alert(alert)
+        return fired
+
+    def _check(self, model, key, recent, now):
+        label, group, level = key
+        set_gauge("ncaa_drift_mae", recent.mae, model=label, group=group, level=level)
+        baseline = self.baseline(model, group, level)
+        if key in self.alerting:
+            # Clear only once the error is back halfway to baseline, so a group hovering at the
+            # threshold does not alert on every other submission
+            if recent.mae <= (1 + (self.tolerance - 1) / 2) * baseline:
+                self.alerting.discard(key)
+            return None
+        if recent.n < self.min_n or not recent.mae > self.tolerance * baseline:
+            return None
+        self.alerting.add(key)
+        alert = {
+            'model': label, 'group': group, 'level': level, 'n': recent.n,
+            'mae': recent.mae, 'rmse': recent.rmse, 'bias': recent.bias, 'baseline_mae': baseline,
+            'at': datetime.fromtimestamp(now, timezone.utc).isoformat(timespec='seconds')
+        }
+        self.alerts.append(alert)
+        del self.alerts[:-self.max_alerts]
+        return alert
+
+    def report(self, now=None):
+        """One dict per (model, group, level) with all-time and recent statistics"""
+        now = time.time() if now is None else now
+        with self._lock:
+            items = sorted(self.stats.items())
+        rows = []
+        for (label, group, level), stats in items:
+            recent = stats.recent(now)
+            model = self._model(label) if label in self.models else None
+            rows.append({
+                'model': label, 'group': group, 'level': level,
+                'n': stats.total.n, 'mae': stats.total.mae, 'rmse': stats.total.rmse, 'bias': stats.total.bias,
+                'recent_n': recent.n, 'recent_mae': recent.mae,
+                'baseline_mae': self.baseline(model, group, level) if model else math.nan,
+                'alerting': (label, group, level) in self.alerting
+            })
+        return rows
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'window': self.window,
+                'windows': self.windows,
+                'stats': [[list(key), stats.to_dict()] for key, stats in self.stats.items()],
+                'skipped': self.skipped,
+                'alerts': self.alerts,
+                'alerting': [list(key) for key in self.alerting]
+            }
+
+    def save(self, path=STATE_PATH):
+        write_json_atomic(self.to_dict(), path)
+
+    @classmethod
+    def load(cls, path, models, **kwargs):
+        with open(path) as f:
+            state = json.load(f)
+        monitor = cls(models, window=state['window'], windows=state['windows'], **kwargs)
+        monitor.stats = {tuple(key): WindowedStats.from_dict(d, monitor.window, monitor.windows)
+                         for key, d in state['stats']}
+        monitor.skipped = state['skipped']
+        monitor.alerts = state['alerts']
+        monitor.alerting = {tuple(key) for key in state['alerting']}
+        return monitor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("state", nargs="?", default=STATE_PATH)
+    parser.add_argument("--replay", help="rebuild the state from every new-player row in this submission log")
+    parser.add_argument("--out", help="where to write a replayed state (default: the state path)")
+    parser.add_argument("--models", default=MODELS_DIR, help="directory of artifacts to shadow-score with")
+    parser.add_argument("--window-hours", type=float, default=24.0)
+    parser.add_argument("--windows", type=int, default=7)
+    args = parser.parse_args()
+
+    models = registered_models(args.models)
+    if args.replay:
+        from NCAASubmissionLog import SubmissionLog
+        monitor = DriftMonitor(models, window=args.window_hours * 3600, windows=args.windows)
+        log = SubmissionLog(args.replay)
+        # The live app only observes new players, not corrections of them
+        entries = log.entries(kind='append')
+        for created_at, row in entries:
+            monitor.observe([row], now=created_at)
+        log.close()
+        monitor.save(args.out or args.state)
+        print(f"Replayed {len(entries)} submissions into {args.out or args.state}")
+        now = entries[-1][0] if entries else None
+    else:
+        monitor = DriftMonitor.load(args.state, models)
+        now = None
+
+    print(f"{'Model':<12} {'Group':<9} {'Level':<8} {'N':>6} {'MAE':>7} {'RMSE':>7} {'Bias':>7} "
+          f"{'Recent N':>8} {'Recent':>7} {'Base':>6}")
+    for row in monitor.report(now):
+        flag = "  DRIFT" if row['alerting'] else ""
+        print(f"{row['model']:<12} {row['group']:<9} {row['level']:<8} {row['n']:>6} {row['mae']:>7.2f} "
+              f"{row['rmse']:>7.2f} {row['bias']:>7.2f} {row['recent_n']:>8} {row['recent_mae']:>7.2f} "
+              f"{row['baseline_mae']:>6.2f}{flag}")
+    for label, count in sorted(monitor.skipped.items()):
+        print(f"{label}: {count} rows outside the model's categories were not scored")
+    for alert in monitor.alerts[-10:]:
+        print(f"Alert {alert['at']}: {alert['model']} {alert['group']} {alert['level']} MAE {alert['mae']:.2f} "
+              f"over {alert['n']} results vs baseline {alert['baseline_mae']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Monte Carlo dynasty simulator: skill points over a player's whole career
+
+Usage: python NCAADynastySimulator.py roster.csv [--dynasties 10000] [--seasons 4]
+                                      [--redshirt 0.25] [--staff-change 0.2] [--data "NCAA R Code Data.xlsx"]
+
+roster.csv uses the web app's input names (player_name, position, year,
+dev_trait, xp_penalty and the coaching flags). Every simulated dynasty
+advances the whole roster one offseason at a time: each player earns the
+model's prediction for their current class year, staff and XP penalty plus
+a residual draw, then moves up a class or redshirts. A player whose next
+class year is not one the model has coefficients for (seniors, or
+juniors that never redshirted under v3.0) has finished their career. All
+dynasties are simulated together as (dynasty, player) arrays; only the
+seasons are a Python loop.
+"""
+import argparse
+import csv
+import math
+import time
+
+import numpy as np
+
+from NCAAScoringEngine import DEFAULT_MODEL_PATH, Model, load_artifact
+from NCAAStaffOptimizer import coach_slot
+
+CLASSES = ['FR', 'SO', 'JR', 'SR']
+
+
+def parse_year(label):
+    """(class index, redshirted) for a year label such as 'SO (RS)'"""
+    label = label.strip()
+    redshirt = label.endswith('(RS)')
+    return CLASSES.index(label.replace('(RS)', '').strip()), redshirt
+
+
+def year_label(class_index, redshirt):
+    return CLASSES[class_index] + (' (RS)' if redshirt else '')
+
+
+class SimulationResult:
+    """Simulated skill points, indexed [dynasty, season, player]"""
+
+    def __init__(self, players, points, active, year_codes, years):
+        self.players = players
+        self.points = points
+        self.active = active
+        self.year_codes = year_codes
+        self.years = years
+
+    @property
+    def totals(self):
+        """Cumulative skill points per dynasty and player, shape (dynasties, players)"""
+        return self.points.sum(axis=1)
+
+    def summary(self, quantiles=(0.1, 0.5, 0.9)):
+        """Per-player distribution of career skill points"""
+        totals = self.totals
+        q = np.quantile(totals, quantiles, axis=0)
+        seasons = self.active.sum(axis=1).mean(axis=0)
+        return [
+            {
+                'player': player,
+                'mean': float(totals[:, i].mean()),
+                'std': float(totals[:, i].std()),
+                'quantiles': dict(zip(quantiles, q[:, i].tolist())),
+                'seasons': float(seasons[i])
+            }
+            for i, player in enumerate(self.players)
+        ]
+
+
+class DynastySimulator:
+    """Vectorized multi-season simulation on top of a model's lookup tables
+
+    Residuals come from residual_pools (DevT -> array of training
+    residuals, drawn with replacement) when given, otherwise from a normal
+    distribution per DevT whose spread matches the artifact's per-DevT MAE.
+    """
+
+    def __init__(self, model, residual_pools=None):
+        self.model = model
+        self.engine = model.engine
+        self.residual_pools = residual_pools
+
+        rmse = model.model_stats.get('rmse', 0.0)
+        self.sigma = np.array([
+            model.devt_accuracy.get(d, {}).get('mae', rmse * math.sqrt(2 / math.pi)) * math.sqrt(math.pi / 2)
+            for d in self.engine.dev_traits
+        ])
+
+        # Model year code for every (class, redshirt) state, -1 where the model has none
+        self.year_code = np.full((len(CLASSES), 2), -1, dtype=np.intp)
+        for c in range(len(CLASSES)):
+            for r in (0, 1):
+                self.year_code[c, r] = self.engine.year_index.get(year_label(c, r), -1)
+
+        self.slot_masks = {}
+        for bit, var in enumerate(self.engine.coaching_vars):
+            self.slot_masks[coach_slot(var)] = self.slot_masks.get(coach_slot(var), 0) | (1 << bit)
+
+    def staff_paths(self, rng, n, seasons, staff, change_prob=0.0, ability_prob=0.5):
+        """Coaching mask per dynasty and season, shape (n, seasons)
+
+        staff is the opening mask, a mask per season or an (n, seasons)
+        array. With change_prob each coach (HC/OC/DC) is replaced before a
+        season with that probability, and the new coach has each of the
+        slot's abilities with probability ability_prob.
+        """
+        staff = np.asarray(staff, dtype=np.int64)
+        if staff.ndim:
+            return np.broadcast_to(staff, (n, seasons)).copy()
+        paths = np.empty((n, seasons), dtype=np.int64)
+        current = np.full(n, int(staff), dtype=np.int64)
+        n_bits = len(self.engine.coaching_vars)
+        for s in range(seasons):
+            if s and change_prob:
+                hired = (rng.random((n, n_bits)) < ability_prob).astype(np.int64) << np.arange(n_bits)
+                hired = hired.sum(axis=1)
+                for slot_mask in self.slot_masks.values():
+                    change = rng.random(n) < change_prob
+                    current = np.where(change, (current & ~slot_mask) | (hired & slot_mask), current)
+            paths[:, s] = current
+        return paths
+
+    def residuals(self, rng, dev_traits, shape):
+        """Residual draws for players with the given DevT codes, shape (..., players)"""
+        if self.residual_pools is None:
+            return rng.standard_normal(shape) * self.sigma[dev_traits]
+        noise = np.empty(shape)
+        for code, devt in enumerate(self.engine.dev_traits):
+            players = np.flatnonzero(dev_traits == code)
+            pool = np.asarray(self.residual_pools.get(devt, np.concatenate(list(self.residual_pools.values()))))
+            noise[..., players] = rng.choice(pool, size=shape[:-1] + (players.size,))
+        return noise
+
+    def simulate(self, roster, seasons=4, n_dynasties=10000, staff=None, staff_change_prob=0.0,
+                 ability_prob=0.5, xp_penalty=None, redshirt_prob=0.0, redshirt_classes=('FR',), seed=0):
+        """Simulate n_dynasties careers for every player on the roster
+
+        roster is a list of player dicts (web app layout). staff defaults to
+        the most common coaching mask on the roster. xp_penalty overrides
+        the roster's values: a scalar, one value per season, or a
+        (seasons, players) array. Each season a not-yet-redshirted player in
+        redshirt_classes redshirts with probability redshirt_prob.
+        """
+        engine, table = self.engine, self.engine.table
+        positions, years, dev_traits, masks, xp = engine.encode(roster)
+        n_players = len(positions)
+        rng = np.random.default_rng(seed)
+
+        if staff is None:
+            values, counts = np.unique(masks, return_counts=True)
+            staff = int(values[counts.argmax()]) if values.size else 0
+        staff = self.staff_paths(rng, n_dynasties, seasons, staff, staff_change_prob, ability_prob)
+        if xp_penalty is not None:
+            xp = np.asarray(xp_penalty, dtype=np.float64)
+            if xp.ndim == 1:
+                xp = xp[:, None]
+        xp = np.broadcast_to(xp, (seasons, n_players))
+
+        start = [parse_year(engine.years[y]) for y in years]
+        klass = np.tile(np.array([c for c, _ in start], dtype=np.intp), (n_dynasties, 1))
+        redshirt = np.tile(np.array([r for _, r in start], dtype=np.intp), (n_dynasties, 1))
+        can_redshirt = np.isin(np.arange(len(CLASSES)), [CLASSES.index(c) for c in redshirt_classes])
+        base_cells = table.pack(positions, 0, dev_traits, 0)
+        year_stride = len(engine.dev_traits)
+
+        points = np.zeros((n_dynasties, seasons, n_players), dtype=np.float32)
+        active = np.zeros((n_dynasties, seasons, n_players), dtype=bool)
+        year_codes = np.full((n_dynasties, seasons, n_players), -1, dtype=np.int8)
+        for s in range(seasons):
+            code = self.year_code[np.minimum(klass, len(CLASSES) - 1), redshirt]
+            playing = (code >= 0) & (klass < len(CLASSES))
+            cells = base_cells + np.where(playing, code, 0) * year_stride
+            predicted = table.base[cells] + table.coaching[staff[:, s]][:, None] + table.xp_coef * xp[s]
+            predicted = predicted + table.cross(cells, staff[:, s][:, None])
+            if engine.floor is not None:
+                predicted = np.maximum(predicted, engine.floor)
+            drawn = np.maximum(predicted + self.residuals(rng, dev_traits, (n_dynasties, n_players)), 0)
+            points[:, s] = np.where(playing, drawn, 0)
+            active[:, s] = playing
+            year_codes[:, s] = np.where(playing, code, -1)
+
+            sits = (redshirt == 0) & can_redshirt[np.minimum(klass, len(CLASSES) - 1)] & (
+                rng.random((n_dynasties, n_players)) < redshirt_prob)
+            redshirt = redshirt | sits
+            # A finished career stays finished even if a later state has coefficients
+            klass = np.where(playing, np.where(sits, klass, klass + 1), len(CLASSES))
+
+        names = [p.get('player_name', f'Player {i + 1}') for i, p in enumerate(roster)]
+        return SimulationResult(names, points, active, year_codes, engine.years)
+
+
+def training_residuals(path, sheet_name=0):
+    """Residuals of the cleaned training fit, pooled by DevT"""
+    from NCAATraining import load_training_data, train
+
+    model, rows = train(load_training_data(path, sheet_name))
+    return {d: model.residuals[rows['DevT'] == d] for d in set(rows['DevT'])}
+
+
+def read_roster(path, coaching_vars):
+    """Player dicts from a roster CSV with xp_penalty and the coaching flags as numbers; other columns stay text"""
+    with open(path, newline='') as f:
+        players = list(csv.DictReader(f))
+    for player in players:
+        for key in ['xp_penalty'] + list(coaching_vars):
+            if key in player:
+                player[key] = float(player[key] or 0)
+    return players
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("roster", help="CSV roster in the web app's input layout")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--dynasties", type=int, default=10000)
+    parser.add_argument("--seasons", type=int, default=4)
+    parser.add_argument("--redshirt", type=float, default=0.0, help="chance a freshman redshirts")
+    parser.add_argument("--staff-change", type=float, default=0.0, help="chance each coach is replaced per season")
+    parser.add_argument("--xp-penalty", type=float, default=None, help="override every player's XP penalty")
+    parser.add_argument("--data", help="draw residuals from this training workbook's fit")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    model = Model(load_artifact(args.model))
+    pools = training_residuals(args.data) if args.data else None
+    simulator = DynastySimulator(model, pools)
+    roster = read_roster(args.roster, model.engine.coaching_vars)
+
+    start = time.perf_counter()
+    result = simulator.simulate(roster, args.seasons, args.dynasties, staff_change_prob=args.staff_change,
+                                xp_penalty=args.xp_penalty, redshirt_prob=args.redshirt, seed=args.seed)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'Player':<24} {'Seasons':>7} {'Mean':>8} {'P10':>8} {'P50':>8} {'P90':>8}")
+    for row in result.summary():
+        q = row['quantiles']
+        print(f"{row['player'][:24]:<24} {row['seasons']:>7.2f} {row['mean']:>8.1f} "
+              f"{q[0.1]:>8.1f} {q[0.5]:>8.1f} {q[0.9]:>8.1f}")
+    print(f"\n{args.dynasties:,} dynasties x {len(roster)} players x {args.seasons} seasons in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
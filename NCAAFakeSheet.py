@@ -0,0 +1,161 @@
+import random
+import re
+import threading
+import time
+from collections import deque
+
+
+def _column_letter(n):
+    """Convert a 1-based column number to its A1 letter"""
+    letters = ''
+    while n:
+        n, rem = divmod(n - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _column_number(letters):
+    n = 0
+    for letter in letters:
+        n = n * 26 + ord(letter) - 64
+    return n
+
+
+class FakeAPIError(Exception):
+    """Error shaped like gspread's APIError: the HTTP status is in .code and .response.status_code"""
+
+    class _Response:
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+    def __init__(self, code, message):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.response = self._Response(code)
+
+
+class FakeWorksheet:
+    """In-memory stand-in for a gspread Worksheet, for offline runs and tests
+
+    Every call sleeps latency seconds plus an exponentially distributed
+    jitter with that mean. Failures can be injected: writes beyond
+    write_quota within a minute raise a 429 like the Sheets per-minute
+    write quota, every call during an outage ((start, end) seconds after
+    creation) raises a 503, and error_rate is the chance of a random 500.
+    Failing calls change nothing.
+    """
+
+    def __init__(self, header=None, latency=0.0, title='Sheet1', jitter=0.0, write_quota=None, outages=(),
+                 error_rate=0.0, seed=None):
+        self.title = title
+        self.latency = latency
+        self.jitter = jitter
+        self.write_quota = write_quota
+        self.outages = list(outages)
+        self.error_rate = error_rate
+        self.rows = [list(header)] if header else []
+        self.write_calls = 0
+        self.read_calls = 0
+        self.errors = {}
+        self.created = time.monotonic()
+        self._writes = deque()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _fail(self, code, message):
+        with self._lock:
+            self.errors[code] = self.errors.get(code, 0) + 1
+        raise FakeAPIError(code, message)
+
+    def _call(self, write=False):
+        """Simulate the request latency, then raise any injected failure"""
+        with self._lock:
+            delay = self.latency + (self._random.expovariate(1 / self.jitter) if self.jitter else 0.0)
+            failing = self.error_rate and self._random.random() < self.error_rate
+        time.sleep(delay)
+        now = time.monotonic()
+        if any(start <= now - self.created < end for start, end in self.outages):
+            self._fail(503, "The service is currently unavailable.")
+        if failing:
+            self._fail(500, "Internal error encountered.")
+        if write and self.write_quota is not None:
+            with self._lock:
+                while self._writes and self._writes[0] <= now - 60:
+                    self._writes.popleft()
+                exceeded = len(self._writes) >= self.write_quota
+                if not exceeded:
+                    self._writes.append(now)
+            if exceeded:
+                self._fail(429, "Quota exceeded for quota metric 'Write requests' per minute per user.")
+
+    def _append(self, rows):
+        self._call(write=True)
+        with self._lock:
+            self.write_calls += 1
+            start = len(self.rows) + 1
+            self.rows.extend(list(row) for row in rows)
+            end = len(self.rows)
+        width = max((len(row) for row in rows), default=1)
+        return {
+            'updates': {
+                'updatedRange': f"{self.title}!A{start}:{_column_letter(width)}{end}",
+                'updatedRows': len(rows)
+            }
+        }
+
+    def append_row(self, values, **kwargs):
+        return self._append([values])
+
+    def append_rows(self, values, **kwargs):
+        return self._append(values)
+
+    def update(self, range_name, values=None, **kwargs):
+        """Overwrite the cells of an A1 range ('A12:V12'), growing the sheet if needed (gspread 5 argument order)"""
+        return self.batch_update([{'range': range_name, 'values': values}])['responses'][0]
+
+    def batch_update(self, data, **kwargs):
+        """Overwrite several ranges ([{'range': 'A12:V12', 'values': [[...]]}, ...]) in one write request"""
+        self._call(write=True)
+        starts = [self._range_start(item['range']) for item in data]
+        with self._lock:
+            self.write_calls += 1
+            for (first_col, first_row), item in zip(starts, data):
+                for offset, values_row in enumerate(item['values']):
+                    index = first_row - 1 + offset
+                    while len(self.rows) <= index:
+                        self.rows.append([])
+                    row = self.rows[index]
+                    row.extend([''] * (first_col + len(values_row) - len(row)))
+                    row[first_col:first_col + len(values_row)] = list(values_row)
+        return {'responses': [{'updatedRange': item['range'], 'updatedRows': len(item['values'])} for item in data]}
+
+    @staticmethod
+    def _range_start(range_name):
+        """0-based first column and 1-based first row of an A1 range"""
+        match = re.fullmatch(r"(?:.*!)?([A-Z]+)(\d+)(?::[A-Z]+\d+)?", range_name or "A1")
+        if not match:
+            raise ValueError(f"Unsupported range: {range_name}")
+        return _column_number(match.group(1)) - 1, int(match.group(2))
+
+    def get_all_values(self):
+        self._call()
+        with self._lock:
+            return [list(row) for row in self.rows]
+
+    def get(self, range_name, **kwargs):
+        """Values in an A1 range ('A2:V101' or 'Sheet1!A2:V101') as strings, like the Sheets API
+
+        Rows past the end of the data are omitted, so a short result means
+        the reader has caught up.
+        """
+        self._call()
+        match = re.fullmatch(r"(?:.*!)?([A-Z]+)(\d+):([A-Z]+)(\d*)", range_name)
+        if not match:
+            raise ValueError(f"Unsupported range: {range_name}")
+        first_col, first_row, last_col, last_row = match.groups()
+        first_col, last_col = _column_number(first_col) - 1, _column_number(last_col)
+        with self._lock:
+            self.read_calls += 1
+            end = int(last_row) if last_row else len(self.rows)
+            rows = self.rows[int(first_row) - 1:end]
+            return [["" if v is None else str(v) for v in row[first_col:last_col]] for row in rows]
@@ -0,0 +1,305 @@
+"""Load test of the web app's predict-then-submit flow against a simulated Google Sheet
+
+Usage: python NCAALoadTest.py [--sessions 20] [--duration 30] [--think 1.0] [--correction-rate 0.1]
+                              [--latency 0.3] [--jitter 0.2] [--write-quota 60] [--outage 10:20]
+                              [--error-rate 0.01] [--writes-per-minute 50] [--drain 60] [--max-lost 0]
+                              [--max-submit-p99 SECONDS]
+                              [--json load_results.json]
+
+The web app is imported the way NCAABenchmark imports it, with its
+submission log, index and drift state in a temporary directory and
+connect_gsheet opening a FakeWorksheet that injects request latency,
+per-minute write quota errors (429), outages (503) and random 500s, so
+writes go through the app's own rate limiting, backoff and circuit
+breaker (NCAASheetsConnection). Every simulated session is a thread, as
+Streamlit runs sessions: it thinks for an exponentially distributed
+time, calls
+calculate_prediction and then save_complete_data with an actual result
+for a new player, or (--correction-rate) a changed result for the player
+it submitted last. Sessions stop after --duration seconds and the
+submission queue then gets --drain seconds to empty.
+
+Reports session throughput and p50/p95/p99 latency of predictions, of
+save_complete_data (what a user waits for) and of the time until a
+result is in the sheet. A submission is lost when save_complete_data
+accepted it but its latest value is neither in the sheet nor pending in
+the submission log (which replays it on restart). The exit status is 1
+when more than --max-lost submissions were lost or the save p99 is over
+--max-submit-p99, so a change to the save_complete_data path can be
+checked before it ships.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from NCAABenchmark import random_players
+from NCAAFakeSheet import FakeWorksheet
+from NCAATraining import SHEET_COLUMNS
+
+
+class TimedSheet:
+    """Worksheet proxy noting when each (team, player, skill points) row was written"""
+
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self.landed = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.sheet, name)
+
+    def _note(self, rows):
+        now = time.monotonic()
+        with self._lock:
+            for row in rows:
+                self.landed.setdefault((row[0], row[1], float(row[2])), now)
+
+    def append_row(self, values, **kwargs):
+        response = self.sheet.append_row(values, **kwargs)
+        self._note([values])
+        return response
+
+    def append_rows(self, values, **kwargs):
+        response = self.sheet.append_rows(values, **kwargs)
+        self._note(values)
+        return response
+
+    def batch_update(self, data, **kwargs):
+        # Corrections are written here, one call per flush
+        response = self.sheet.batch_update(data, **kwargs)
+        self._note([row for item in data for row in item['values']])
+        return response
+
+
+def load_app(directory, sheet, writes_per_minute=None):
+    """Import the web app with its local state in directory and sheet standing in for Google Sheets"""
+    if writes_per_minute:
+        os.environ["NCAA_SHEETS_WRITES_PER_MINUTE"] = str(writes_per_minute)
+    os.environ.update(
+        NCAA_SUBMISSION_LOG=os.path.join(directory, "submissions.db"),
+        NCAA_SUBMISSION_INDEX=os.path.join(directory, "submission_index.db"),
+        NCAA_DRIFT_STATE=os.path.join(directory, "drift_state.json"),
+        NCAA_ONLINE_STATE=os.path.join(directory, "online_state.json")
+    )
+    # Outside `streamlit run` every st call from a session thread warns about the missing script context
+    from streamlit.logger import set_log_level
+    set_log_level("error")
+    import NCAAModelWebApp as app
+    app.connect_gsheet = lambda: (sheet, None)
+    return app
+
+
+def run_session(app, session, stop_at, think, correction_rate, players, seed, results):
+    """One simulated user submitting results until stop_at; appends a dict per submission to results"""
+    rng = random.Random(seed)
+    coaching_vars = list(app.variable_labels)
+    previous = None
+    count = 0
+    while True:
+        if think:
+            time.sleep(min(rng.expovariate(1 / think), max(0.0, stop_at - time.monotonic())))
+        if time.monotonic() >= stop_at:
+            return
+        if previous is not None and rng.random() < correction_rate:
+            player, last_actual = previous
+            correction = True
+        else:
+            count += 1
+            player = dict(rng.choice(players), team=f"Load {session:03d}", player_name=f"Player {count}",
+                          snaps=rng.randint(0, 900))
+            last_actual = None
+            correction = False
+
+        start = time.monotonic()
+        prediction = app.calculate_prediction(player['position'], player['year'], player['dev_trait'],
+                                              player['xp_penalty'], {var: player[var] for var in coaching_vars})
+        predicted = time.monotonic()
+        actual = max(0, round(prediction + rng.gauss(0, 6)))
+        if correction and actual == last_actual:
+            actual += 1
+        kind = app.save_complete_data(player, actual)
+        saved = time.monotonic()
+
+        results.append({
+            'key': (player['team'], player['player_name']), 'actual': actual, 'kind': kind,
+            'correction': correction, 'submitted_at': saved,
+            'predict': predicted - start, 'submit': saved - predicted
+        })
+        if kind:
+            previous = (player, actual)
+
+
+def drain(queue, timeout):
+    """Flush the submission queue until it is empty or timeout seconds have passed"""
+    deadline = time.monotonic() + timeout
+    while queue.depth() and time.monotonic() < deadline:
+        if not queue.flush():
+            time.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+    queue.close(timeout=1.0)
+
+
+def percentiles(values):
+    if not values:
+        return {'n': 0, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'n': len(values), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'max': float(max(values))}
+
+
+def load_test(sessions=20, duration=30.0, think=1.0, correction_rate=0.1, latency=0.3, jitter=0.2,
+              write_quota=60, outages=(), error_rate=0.01, drain_timeout=60.0, writes_per_minute=None, seed=0):
+    """Run the load test and return its report dict"""
+    fake = FakeWorksheet(header=SHEET_COLUMNS, latency=latency, jitter=jitter, write_quota=write_quota,
+                         outages=outages, error_rate=error_rate, seed=seed)
+    sheet = TimedSheet(fake)
+    with tempfile.TemporaryDirectory() as directory:
+        app = load_app(directory, sheet, writes_per_minute)
+        model = app.current_model()
+        players = random_players(model.position_coeffs, model.year_coeffs, model.dev_trait_coeffs,
+                                 list(app.variable_labels), 1000, seed)
+        queue = app.get_submission_queue()
+
+        results = []
+        start = time.monotonic()
+        threads = [
+            threading.Thread(target=run_session, name=f"session-{i}", daemon=True,
+                             args=(app, i, start + duration, think, correction_rate, players, seed * 1000 + i, results))
+            for i in range(sessions)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+
+        drain_start = time.monotonic()
+        drain(queue, drain_timeout)
+        drain_time = time.monotonic() - drain_start
+
+        log = app.get_submission_log()
+        pending = {(row[0], row[1], float(row[2])) for _, row, _ in log.pending_entries()}
+        queue_stats = queue.stats()
+        connection_stats = app.get_sheets_connection().stats()
+        log.close()
+        app.get_submission_index().close()
+
+    # Latest accepted value per player against what the sheet ends up holding
+    expected = {}
+    for result in results:
+        if result['kind'] in ('new', 'correction'):
+            expected[result['key']] = result['actual']
+    sheet_rows = {}
+    for row in fake.rows[1:]:
+        if row:
+            sheet_rows.setdefault((row[0], row[1]), []).append(float(row[2]))
+    lost = stale = still_pending = 0
+    for key, actual in expected.items():
+        if actual in sheet_rows.get(key, []):
+            continue
+        if key + (float(actual),) in pending:
+            still_pending += 1
+        elif key in sheet_rows:
+            stale += 1
+        else:
+            lost += 1
+
+    landed = [sheet.landed[r['key'] + (float(r['actual']),)] - r['submitted_at']
+              for r in results if r['kind'] in ('new', 'correction')
+              and r['key'] + (float(r['actual']),) in sheet.landed]
+    return {
+        'sessions': sessions,
+        'duration': elapsed,
+        'submissions': len(results),
+        'throughput': len(results) / elapsed if elapsed else 0.0,
+        'kinds': {kind: sum(1 for r in results if r['kind'] == kind)
+                  for kind in ('new', 'correction', 'duplicate', False)},
+        'predict': percentiles([r['predict'] for r in results]),
+        'submit': percentiles([r['submit'] for r in results]),
+        'landed': percentiles(landed),
+        'drain_time': drain_time,
+        'lost': lost,
+        'stale': stale,
+        'pending': still_pending,
+        'duplicate_rows': sum(len(values) - 1 for values in sheet_rows.values()),
+        'sheet': {'writes': fake.write_calls, 'errors': fake.errors, 'rows': len(fake.rows) - 1},
+        'queue': queue_stats,
+        'connection': connection_stats
+    }
+
+
+def print_report(report):
+    kinds = report['kinds']
+    print(f"{report['sessions']} sessions, {report['submissions']} submissions in {report['duration']:.1f}s "
+          f"({report['throughput']:.2f}/s): {kinds['new']} new, {kinds['correction']} corrections, "
+          f"{kinds['duplicate']} duplicates, {kinds[False]} failed")
+    print(f"\n{'Latency':<22} {'N':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for label, key in (("calculate_prediction", 'predict'), ("save_complete_data", 'submit'),
+                       ("submit -> in sheet", 'landed')):
+        stats = report[key]
+        if not stats['n']:
+            print(f"{label:<22} {0:>6}")
+            continue
+        print(f"{label:<22} {stats['n']:>6} {stats['p50'] * 1000:>9.1f} {stats['p95'] * 1000:>9.1f} "
+              f"{stats['p99'] * 1000:>9.1f} {stats['max'] * 1000:>9.1f}")
+    sheet, queue = report['sheet'], report['queue']
+    errors = ', '.join(f"{count} x {code}" for code, count in sorted(sheet['errors'].items())) or 'none'
+    print(f"\nSheet: {sheet['writes']} writes, {sheet['rows']} rows, errors: {errors}")
+    print(f"Queue: {queue['flushes']} flushes, {queue['failed_flushes']} failed, "
+          f"drained in {report['drain_time']:.1f}s with {queue['depth']} rows left")
+    connection = report['connection']
+    print(f"Connection: circuit {connection['state']}, {connection['connects']} connects, "
+          f"last error: {connection['last_error'] or 'none'}")
+    print(f"Lost: {report['lost']}   stale corrections: {report['stale']}   "
+          f"pending in log: {report['pending']}   duplicate sheet rows: {report['duplicate_rows']}")
+
+
+def parse_outage(text):
+    start, end = text.split(':')
+    return float(start), float(end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds sessions keep submitting")
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds between a session's submissions")
+    parser.add_argument("--correction-rate", type=float, default=0.1,
+                        help="chance a submission corrects the session's previous player")
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds every sheet call takes")
+    parser.add_argument("--jitter", type=float, default=0.2, help="mean extra exponential latency per call")
+    parser.add_argument("--write-quota", type=int, default=60, help="sheet writes allowed per minute (0: no limit)")
+    parser.add_argument("--outage", type=parse_outage, action="append", default=[],
+                        help="START:END seconds into the run when every sheet call fails with 503")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="chance of a random 500 per sheet call")
+    parser.add_argument("--writes-per-minute", type=float,
+                        help="the app's write rate limit (NCAA_SHEETS_WRITES_PER_MINUTE, default 50)")
+    parser.add_argument("--drain", type=float, default=60.0, help="seconds the queue gets to empty afterwards")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-lost", type=int, default=0, help="exit 1 when more submissions than this are lost")
+    parser.add_argument("--max-submit-p99", type=float, help="exit 1 when save_complete_data's p99 exceeds this")
+    parser.add_argument("--json", help="also write the report here")
+    args = parser.parse_args()
+
+    report = load_test(args.sessions, args.duration, args.think, args.correction_rate, args.latency, args.jitter,
+                       args.write_quota or None, args.outage, args.error_rate, args.drain, args.writes_per_minute,
+                       args.seed)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+
+    failed = report['lost'] + report['stale'] > args.max_lost
+    if args.max_submit_p99 is not None and (report['submit']['p99'] or 0) > args.max_submit_p99:
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Process-wide timing and counter metrics in Prometheus text format
+
+Usage: python NCAAMetrics.py [metrics.prom]   (print a dump file written by a running app)
+
+Environment switches, read once at import:
+    NCAA_METRICS=0               turn instrumentation off (timed() becomes a no-op)
+    NCAA_METRICS_PORT=9108       serve /metrics on localhost from the app process
+    NCAA_METRICS_FILE=path       rewrite the text exposition to path every NCAA_METRICS_INTERVAL seconds
+    NCAA_PROFILE_SAMPLE=0.01     run this fraction of timed calls under cProfile
+    NCAA_PROFILE_DIR=profiles    where the aggregated <name>.prof files are written
+"""
+import bisect
+import cProfile
+import functools
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.environ.get("NCAA_METRICS", "1") != "0"
+PROFILE_SAMPLE = float(os.environ.get("NCAA_PROFILE_SAMPLE", "0") or 0)
+PROFILE_DIR = os.environ.get("NCAA_PROFILE_DIR", "profiles")
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_profiles = {}
+_constant_labels = {}
+_exporters = {}
+_profiling = threading.local()
+
+
+def configure(**labels):
+    """Labels added to every series of this process, e.g. configure(app='web')"""
+    _constant_labels.update(labels)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Add to a counter"""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name, seconds, **labels):
+    """Record one duration in a latency histogram"""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+        histogram[0][bisect.bisect_left(BUCKETS, seconds)] += 1
+        histogram[1] += seconds
+
+
+class _NoTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __call__(self, fn):
+        return fn
+
+
+_NO_TIMER = _NoTimer()
+
+
+class _Timer:
+    """Times a block or function into ncaa_<name>_seconds and counts ncaa_<name>_total by outcome"""
+
+    __slots__ = ('name', 'labels', 'start', 'profile')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.profile = None
+
+    def __enter__(self):
+        # One profiler per thread: a block nested in a sampled one is already covered by it
+        if PROFILE_SAMPLE and not getattr(_profiling, 'active', False) and random.random() < PROFILE_SAMPLE:
+            _profiling.active = True
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if self.profile is not None:
+            self.profile.disable()
+            _profiling.active = False
+            _add_profile(self.name, self.profile)
+            self.profile = None
+        observe(f"ncaa_{self.name}_seconds", elapsed, **self.labels)
+        inc(f"ncaa_{self.name}_total", outcome='failure' if exc_type else 'success', **self.labels)
+        return False
+
+    def __call__(self, fn):
+        name, labels = self.name, self.labels
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(name, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def timed(name, **labels):
+    """Context manager or decorator timing a hot path; a no-op when metrics are off"""
+    if not ENABLED:
+        return _NO_TIMER
+    return _Timer(name, labels)
+
+
+def _add_profile(name, profile):
+    with _lock:
+        stats = _profiles.get(name)
+        if stats is None:
+            _profiles[name] = pstats.Stats(profile)
+        else:
+            stats.add(profile)
+
+
+def dump_profiles(directory=PROFILE_DIR):
+    """Write the sampled cProfile data aggregated per timed name (<name>.prof)"""
+    with _lock:
+        profiles = list(_profiles.items())
+    if not profiles:
+        return []
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, stats in profiles:
+        path = os.path.join(directory, f"{name}.prof")
+        stats.dump_stats(path)
+        paths.append(path)
+    return paths
+
+
+def _format_labels(labels, extra=()):
+    items = list(_constant_labels.items()) + list(labels) + list(extra)
+    if not items:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    with _lock:
+        counters = sorted(_counters.items())
+        gauges = sorted(_gauges.items())
+        histograms = sorted((key, (list(buckets), total)) for key, (buckets, total) in _histograms.items())
+
+    lines = []
+    typed = set()
+
+    def header(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in counters:
+        header(name, 'counter')
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), value in gauges:
+        header(name, 'gauge')
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), (buckets, total) in histograms:
+        header(name, 'histogram')
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), buckets):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total:.9f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+def dump(path):
+    """Atomically write the current exposition (and sampled profiles) to path"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(render())
+    os.replace(tmp, path)
+    if PROFILE_SAMPLE:
+        dump_profiles()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port, host='127.0.0.1'):
+    """Serve /metrics from a daemon thread; returns the server"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def start_dumping(path, interval=15.0):
+    """Rewrite the dump file every interval seconds from a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                dump(path)
+            except OSError:
+                pass
+
+    threading.Thread(target=run, name='metrics-dump', daemon=True).start()
+
+
+def start_exporters():
+    """Start the endpoint and dump file configured by environment, at most once per process"""
+    if not ENABLED:
+        return
+    with _lock:
+        if _exporters:
+            return
+        _exporters['started'] = True
+    port = os.environ.get("NCAA_METRICS_PORT")
+    if port:
+        try:
+            _exporters['server'] = serve(int(port))
+        except OSError as e:
+            print(f"Metrics endpoint not started: {e}", file=sys.stderr)
+    path = os.environ.get("NCAA_METRICS_FILE")
+    if path:
+        start_dumping(path, float(os.environ.get("NCAA_METRICS_INTERVAL", "15")))
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else os.environ.get("NCAA_METRICS_FILE", "metrics.prom")
+    with open(path) as f:
+        print(f.read(), end='')
+
+
+if __name__ == "__main__":
+    main()
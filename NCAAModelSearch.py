@@ -0,0 +1,277 @@
+"""Exhaustive search over feature and interaction subsets of the skill points regression
+
+Usage: python NCAAModelSearch.py ["NCAA R Code Data.xlsx"] [--max-changes 2] [--rank cv|aic] [--folds 10]
+                                 [--workers N] [--top 20] [--out model.json] [--json search_results.json]
+
+Starts from Dummy_Model and scores every formula within --max-changes
+edits of it: dropping one of its terms (DevT is always kept) or adding
+an interaction of a coaching ability with DevT, Position or Year, or of
+two of those categories. An interaction is only tried with both of its
+main effects in the formula. Snaps is not a candidate: the apps have no
+snap count to score it with, so a winner using it could not be written.
+
+The Gram matrix X'X of every column any candidate can use is built once,
+for all rows and for the training rows of each CV fold. Candidates are
+enumerated depth first, so adding a column grows the Cholesky factors by
+one row (kept inverted, which makes the update a matrix-vector product)
+and backtracking drops that row again; a candidate costs a few rank-one
+updates instead of a refit. Branches, one per first edit, are spread
+across a process pool. All candidates are compared on the rows
+Dummy_Model_Clean trains on (1.5 x IQR residual outliers of the base
+model removed) and ranked by k-fold CV RMSE or AIC. --out refits the
+winner on those rows and writes it as a coefficient artifact.
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from NCAACrossValidation import kfold_splits
+from NCAATraining import (
+    CATEGORICAL, COACHING_VARS, DATA_PATH, DUMMY_MODEL, category_levels, fit, load_training_data, save_artifact,
+    term_columns, to_artifact, train
+)
+
+CATEGORIES = ['DevT', 'Position', 'Year']
+KEEP = ['DevT']
+
+# A column whose variance left after projecting out the columns before it is below this fraction
+# of its own is collinear with them (or empty, like an unseen Position x Year cell) and gets no coefficient
+COLLINEAR_TOL = 1e-9
+
+
+def interaction_pool(categories=CATEGORIES):
+    """Coaching ability x category and category x category interaction terms"""
+    terms = [f"{var}:{category}" for category in categories for var in COACHING_VARS]
+    terms += [f"{a}:{b}" for i, a in enumerate(categories) for b in categories[i + 1:]]
+    return terms
+
+
+class SearchSpace:
+    """Sufficient statistics of every candidate column, for all rows and per CV fold
+
+    Index 0 of gram/xty/yty covers all rows and index f the training rows
+    of fold f; held_* hold the statistics of each fold's held-out rows.
+    """
+
+    def __init__(self, data, base=DUMMY_MODEL, keep=KEEP, interactions=None, folds=10, seed=0):
+        self.levels = {column: category_levels(data, column) for column in CATEGORICAL}
+        self.keep = list(keep)
+        self.base = [term for term in base if term not in keep]
+        self.terms = self.base + (interaction_pool() if interactions is None else list(interactions))
+
+        y = data['Skill.Points']
+        self.n = len(y)
+        columns = [np.ones(self.n)]
+        self.term_columns = {}
+        for term in self.keep + self.terms:
+            term_cols, _ = term_columns(data, term, self.levels)
+            self.term_columns[term] = list(range(len(columns), len(columns) + len(term_cols)))
+            columns.extend(term_cols)
+        X = np.column_stack(columns)
+        self.core_columns = [0] + [c for term in self.keep for c in self.term_columns[term]]
+
+        _, tests = next(kfold_splits(self.n, folds, 1, seed))
+        self.held_gram = np.stack([X[test].T @ X[test] for test in tests])
+        self.held_xty = np.stack([X[test].T @ y[test] for test in tests])
+        self.held_yty = np.array([y[test] @ y[test] for test in tests])
+        gram, xty, yty = X.T @ X, X.T @ y, y @ y
+        self.gram = np.concatenate([gram[None], gram - self.held_gram])
+        self.xty = np.concatenate([xty[None], xty - self.held_xty])
+        self.yty = np.concatenate([[yty], yty - self.held_yty])
+
+    def allowed(self, term, included):
+        """Whether term may join a formula holding the included terms (interactions need their main effects)"""
+        return ':' not in term or all(factor in included for factor in term.split(':'))
+
+    def formula(self, changes):
+        """Term list of the candidate reached by changes ('+term' / '-term') from the base formula"""
+        dropped = {change[1:] for change in changes if change[0] == '-'}
+        added = {change[1:] for change in changes if change[0] == '+'}
+        return self.keep + [term for term in self.terms if (term in self.base and term not in dropped) or term in added]
+
+
+class CholeskyPath:
+    """Inverse Cholesky factors of X_S'X_S for all rows and every training fold, grown a column at a time
+
+    Appending column c to L L' = X_S'X_S adds the row [w', d] with
+    w = L^-1 X_S'x_c and d^2 = x_c'x_c - w'w, and the inverse grows by
+    [-w'L^-1 / d, 1 / d]. z = L^-1 X_S'y gives RSS = y'y - z'z and
+    beta = L^-T z. Collinear columns get an all-zero row, so every factor
+    keeps the same column positions and popping is truncation.
+    """
+
+    def __init__(self, space):
+        size = space.gram.shape[1]
+        folds = len(space.yty)
+        self.space = space
+        self.inv = np.zeros((folds, size, size))
+        self.z = np.zeros((folds, size))
+        self.ok = np.zeros((folds, size), dtype=bool)
+        self.columns = []
+
+    def push(self, column):
+        space = self.space
+        m = len(self.columns)
+        inv = self.inv[:, :m, :m]
+        w = np.einsum('fij,fj->fi', inv, space.gram[:, self.columns, column])
+        gcc = space.gram[:, column, column]
+        d2 = gcc - np.einsum('fi,fi->f', w, w)
+        ok = d2 > COLLINEAR_TOL * gcc
+        d = np.sqrt(np.where(ok, d2, 1.0))
+        self.inv[:, m, :] = 0.0
+        self.inv[:, m, :m] = np.where(ok[:, None], -np.einsum('fi,fij->fj', w, inv) / d[:, None], 0.0)
+        self.inv[:, m, m] = np.where(ok, 1 / d, 0.0)
+        self.z[:, m] = np.where(ok, (space.xty[:, column] - np.einsum('fi,fi->f', w, self.z[:, :m])) / d, 0.0)
+        self.ok[:, m] = ok
+        self.columns.append(column)
+
+    def pop(self, size):
+        del self.columns[size:]
+
+    def evaluate(self):
+        """(parameters, RSS, AIC, CV RMSE) of the current columns"""
+        space = self.space
+        m = len(self.columns)
+        z = self.z[:, :m]
+        rss = float(space.yty[0] - z[0] @ z[0])
+        rank = int(self.ok[0, :m].sum())
+        n = space.n
+        # Same definition as LinearFit.aic (R's AIC() for lm)
+        aic = n * (np.log(2 * np.pi) + 1 + np.log(rss / n)) + 2 * (rank + 1)
+
+        beta = np.einsum('fji,fj->fi', self.inv[1:, :m, :m], z[1:])
+        columns = np.array(self.columns)
+        held_gram = space.held_gram[:, columns[:, None], columns]
+        sse = (space.held_yty - 2 * np.einsum('fi,fi->f', beta, space.held_xty[:, columns])
+               + np.einsum('fi,fij,fj->f', beta, held_gram, beta))
+        return rank, rss, float(aic), float(np.sqrt(sse.sum() / n))
+
+
+_space = None
+
+
+def _init_worker(space):
+    global _space
+    _space = space
+
+
+def search_branch(first, max_changes):
+    """Scores of every candidate whose first edit is to term index first (None: the base formula itself)"""
+    space = _space
+    path = CholeskyPath(space)
+    for column in space.core_columns:
+        path.push(column)
+    base = set(space.base)
+    included = set(space.keep)
+    changes = []
+    results = []
+
+    def visit(i):
+        if i == len(space.terms):
+            results.append((tuple(changes),) + path.evaluate())
+            return
+        term = space.terms[i]
+        default = term in base
+        if first is None or i < first:
+            options = [default]
+        elif i == first:
+            options = [not default]
+        else:
+            options = [default, not default] if len(changes) < max_changes else [default]
+        for include in options:
+            if include and not space.allowed(term, included):
+                continue
+            size = len(path.columns)
+            if include:
+                for column in space.term_columns[term]:
+                    path.push(column)
+                included.add(term)
+            if include != default:
+                changes.append(('+' if include else '-') + term)
+            visit(i + 1)
+            if include != default:
+                changes.pop()
+            if include:
+                included.discard(term)
+                path.pop(size)
+
+    visit(0)
+    return results
+
+
+def search(space, max_changes=2, workers=None):
+    """Score every candidate within max_changes edits of the base formula; returns (results, seconds)"""
+    firsts = [None] + list(range(len(space.terms))) if max_changes else [None]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(space,)) as pool:
+        branches = list(pool.map(search_branch, firsts, [max_changes] * len(firsts)))
+    wall = time.perf_counter() - start
+    results = [
+        {'changes': list(changes), 'params': params, 'rss': rss, 'aic': aic, 'cv_rmse': cv_rmse}
+        for branch in branches for changes, params, rss, aic, cv_rmse in branch
+    ]
+    return results, wall
+
+
+def rank_results(results, by='cv'):
+    key = 'cv_rmse' if by == 'cv' else 'aic'
+    return sorted(results, key=lambda r: (r[key], r['params']))
+
+
+def describe(changes):
+    return ' '.join(changes) if changes else '(Dummy_Model)'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data", nargs="?", default=DATA_PATH, help="training workbook")
+    parser.add_argument("--sheet", default=0)
+    parser.add_argument("--max-changes", type=int, default=2, help="edits of the base formula per candidate")
+    parser.add_argument("--rank", choices=["cv", "aic"], default="cv")
+    parser.add_argument("--folds", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-clean", action="store_true", help="search on every row, outliers included")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", help="write the best candidate as a coefficient artifact here")
+    parser.add_argument("--version", default=datetime.now().strftime("%Y.%m.%d"), help="artifact version label")
+    parser.add_argument("--json", help="also write every scored candidate here")
+    args = parser.parse_args()
+
+    data = load_training_data(args.data, args.sheet)
+    _, rows = train(data, DUMMY_MODEL, clean=not args.no_clean)
+    space = SearchSpace(rows, folds=args.folds, seed=args.seed)
+    results, wall = search(space, args.max_changes, args.workers)
+    ranked = rank_results(results, args.rank)
+
+    print(f"{len(results)} candidates over {space.gram.shape[1]} columns and {space.n} rows "
+          f"in {wall:.2f}s ({len(results) / wall:.0f} candidates/s)\n")
+    base = next(r for r in results if not r['changes'])
+    print(f"{'Rank':>4} {'Params':>6} {'RMSE':>7} {'AIC':>9} {'CV RMSE':>8}  Changes from Dummy_Model")
+    for i, r in enumerate(ranked[:args.top], 1):
+        print(f"{i:>4} {r['params']:>6} {np.sqrt(r['rss'] / space.n):>7.3f} {r['aic']:>9.2f} "
+              f"{r['cv_rmse']:>8.3f}  {describe(r['changes'])}")
+    position = ranked.index(base) + 1
+    print(f"{position:>4} {base['params']:>6} {np.sqrt(base['rss'] / space.n):>7.3f} {base['aic']:>9.2f} "
+          f"{base['cv_rmse']:>8.3f}  {describe(base['changes'])}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(ranked, f, indent=2)
+    if args.out:
+        best = ranked[0]
+        terms = space.formula(best['changes'])
+        model = fit(rows, terms, space.levels)
+        artifact = to_artifact(model, rows, args.version, f"Dummy_Model_Clean {describe(best['changes'])}".strip())
+        artifact['terms'] = terms
+        artifact['model_stats']['cv_rmse'] = best['cv_rmse']
+        save_artifact(artifact, args.out)
+        print(f"\nWrote {describe(best['changes'])} to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,19 @@
+import logging
+import os
+import threading
 import streamlit as st
-import pandas as pd
-from datetime import datetime
-import gspread
-from google.oauth2.service_account import Credentials
+from NCAADriftMonitor import DriftMonitor, registered_models
+from NCAAMetrics import configure, start_exporters, timed
+from NCAAOnlineModel import OnlineStore
+from NCAAPlayerRecord import PlayerRecord, inputs_row
+from NCAAScoringEngine import DEFAULT_MODEL_PATH, ModelStore
+from NCAASheetConfig import SCOPES, SHEET_ID
+from NCAASheetsConnection import SheetsConnection
+from NCAASubmissionIndex import CORRECTION, DUPLICATE, NEW, SubmissionIndex
+from NCAASubmissionLog import SubmissionLog
+from NCAASubmissionQueue import SubmissionQueue
+
+logger = logging.getLogger(__name__)
 
 # Page config
 st.set_page_config(
@@ -11,18 +22,29 @@ st.set_page_config(
     layout="centered"
 )
 
-# Google Sheets setup
-SHEET_ID = "1ANYMLAgjc1nwXYCdm2nbegrgPtUfUGh1aR_nhLxcMK8"
-SCOPES = [
-    'https://www.googleapis.com/auth/spreadsheets',
-    'https://www.googleapis.com/auth/drive'
-]
+# Google Sheets setup (SHEET_ID and SCOPES live in NCAASheetConfig)
+SUBMISSION_LOG_PATH = os.environ.get("NCAA_SUBMISSION_LOG", "submissions.db")
+ONLINE_STATE_PATH = os.environ.get("NCAA_ONLINE_STATE", "online_state.json")
+# The online state is always updated, but its refit only replaces the artifact's coefficients when asked to
+SERVE_ONLINE = os.environ.get("NCAA_SERVE_ONLINE", "0") == "1"
+DRIFT_STATE_PATH = os.environ.get("NCAA_DRIFT_STATE", "drift_state.json")
+SUBMISSION_INDEX_PATH = os.environ.get("NCAA_SUBMISSION_INDEX", "submission_index.db")
+SEASON = os.environ.get("NCAA_SEASON", "")
+# Sheets allows 60 write requests per minute per user; stay below it so retries have room
+SHEETS_WRITES_PER_MINUTE = float(os.environ.get("NCAA_SHEETS_WRITES_PER_MINUTE", "50"))
 
-# Initialize Google Sheets connection using Streamlit secrets
-@st.cache_resource
-def get_gsheet_connection():
-    """Connect to Google Sheets using secrets"""
-    try:
+# Timing/counter metrics (see NCAAMetrics.py for the endpoint and dump file switches)
+configure(app="web")
+start_exporters()
+
+def connect_gsheet():
+    """Open the sheet using secrets; returns (worksheet, credentials)"""
+    # The Sheets client libraries take longer to import than the rest of the app, so they
+    # load here (off the first render, see start_sheets_warmup) rather than at the top
+    import gspread
+    from google.oauth2.service_account import Credentials
+    
+    with timed("sheets_connect"):
         # Load credentials from Streamlit secrets
         creds = Credentials.from_service_account_info(
             st.secrets["gcp_service_account"],
@@ -30,70 +52,97 @@ def get_gsheet_connection():
         )
         client = gspread.authorize(creds)
         sheet = client.open_by_key(SHEET_ID).sheet1
-        return sheet
-    except Exception as e:
-        st.error(f"Error connecting to Google Sheets: {e}")
-        return None
+    return sheet, creds
 
-# ===== UPDATED COEFFICIENTS (610 entries, No Auburn) =====
-coefficients = {
-    'Intercept': 84.3846,
-    'HC_Moti.1': 0.8413,
-    'HC_Moti.2': 1.3696,
-    'OC_Moti.1': 0.1399,
-    'DC_Moti.1': 2.0169,
-    'HC_TD1': 6.3471,
-    'HC_TD2': 1.5988,
-    'HC_TD3': -2.6348,
-    'OC_TD1': 0.9023,
-    'OC_TD2': 0.9902,
-    'OC_TD3': 4.0082,
-    'DC_TD1': 3.5946,
-    'DC_TD2': 1.8137,
-    'DC_TD3': -1.0978,
-    'XP_Penalty': -0.4372
-}
+# One connection manager per process: it reconnects after failures, refreshes the token before
+# it expires and paces writes, so a failed first attempt is retried instead of cached
+@st.cache_resource
+def get_sheets_connection():
+    """Self-healing, rate-limited Google Sheets connection shared by every session"""
+    return SheetsConnection(connect_gsheet, writes_per_minute=SHEETS_WRITES_PER_MINUTE)
 
-# Development Trait coefficients (baseline is Elite)
-dev_trait_coeffs = {
-    'Elite': 0,
-    'Star': -23.4378,
-    'Impact': -36.3314,
-    'Normal': -47.7393
-}
+def get_gsheet_connection():
+    """Managed Google Sheets worksheet, or None while the sheet is unreachable"""
+    return get_sheets_connection().sheet()
 
-# DevT to number mapping for database
-dev_trait_num = {
-    'Elite': 4,
-    'Star': 3,
-    'Impact': 2,
-    'Normal': 1
-}
+# Connect and replay unsent rows in the background once the first page has rendered
+@st.cache_resource
+def start_sheets_warmup():
+    """Start the Sheets connection and submission queue on a background thread, once per process"""
+    def warm_up():
+        get_gsheet_connection()
+        get_submission_queue()
+    
+    thread = threading.Thread(target=warm_up, name="sheets-warmup", daemon=True)
+    thread.start()
+    return thread
 
-# Position coefficients (baseline is QB)
-position_coeffs = {
-    'QB': 0,
-    'RB': -6.2637,
-    'WR': -2.4537,
-    'TE': -7.1273,
-    'OL': -0.1576,
-    'DL': -8.0265,
-    'LB': -11.7211,
-    'CB': -1.7674,
-    'S': -4.449,
-    'K': -1.98,
-    'P': -2.2867
-}
+# Every submission is logged to local disk before it goes anywhere near Sheets
+@st.cache_resource
+def get_submission_log():
+    """Local write-ahead log of submitted rows"""
+    return SubmissionLog(SUBMISSION_LOG_PATH)
 
-# Year coefficients (baseline is FR)
-year_coeffs = {
-    'FR': 0,
-    'FR (RS)': -3.7344,
-    'SO': -1.8989,
-    'SO (RS)': -6.2791,
-    'JR': -3.9333,
-    'JR (RS)': -3.0805
-}
+# Submitted players keyed on team/player/position/year/season, so a resubmission updates its row
+@st.cache_resource
+def get_submission_index():
+    """Upsert index of submitted players and the sheet rows they landed in"""
+    return SubmissionIndex(SUBMISSION_INDEX_PATH, SEASON)
+
+# Submissions are buffered and written with append_rows in the background
+@st.cache_resource
+def get_submission_queue():
+    """Shared queue that batches submitted rows into Google Sheets"""
+    log = get_submission_log()
+    index = get_submission_index()
+    queue = SubmissionQueue(get_gsheet_connection, on_flush=log.mark_sent, on_append=index.record_append,
+                            in_sheet=index.in_sheet)
+    # Replay rows a previous process logged but never marked sent; an append may have
+    # reached the sheet just before that process stopped, so it is looked for first
+    for key, row, kind in log.pending_entries():
+        if kind == 'update':
+            queue.submit_update(row, index.sheet_row, key=key)
+        else:
+            queue.submit(row, key=key, check=True)
+    return queue
+
+# Running least-squares state updated by every submission (seed it with NCAAOnlineModel.py init),
+# reloaded when the file changes so a rollback reaches the running app
+@st.cache_resource
+def get_online_store():
+    """Online model state file shared by every session"""
+    return OnlineStore(ONLINE_STATE_PATH)
+
+# Every submitted result is scored by all artifacts in models/ to track live error per model
+@st.cache_resource
+def get_drift_monitor():
+    """Shadow-scoring drift monitor, resumed from its state file when present"""
+    models = registered_models()
+    if os.path.exists(DRIFT_STATE_PATH):
+        return DriftMonitor.load(DRIFT_STATE_PATH, models)
+    return DriftMonitor(models)
+
+def shadow_score(rows):
+    """Fold submitted rows into the drift statistics of every registered model"""
+    monitor = get_drift_monitor()
+    monitor.observe(rows)
+    monitor.save(DRIFT_STATE_PATH)
+
+# Versioned model artifact shared with the desktop app (models/), hot-reloaded on change
+MODEL_PATH = os.environ.get("NCAA_MODEL_ARTIFACT", DEFAULT_MODEL_PATH)
+
+@st.cache_resource
+def get_model_store():
+    """Model artifact parsed once per process and reloaded when the file changes"""
+    return ModelStore(MODEL_PATH)
+
+def current_model():
+    """Model for this run, with the online model's coefficients when NCAA_SERVE_ONLINE=1 and it is seeded"""
+    model = get_model_store().get()
+    online = get_online_store().get() if SERVE_ONLINE else None
+    if online is not None:
+        model = model.with_coefficients(online.served)
+    return model
 
 # Variable labels
 variable_labels = {
@@ -112,117 +161,113 @@ variable_labels = {
     'DC_TD3': 'DC Talent Developer Tier 3'
 }
 
-# ===== UPDATED MODEL PERFORMANCE STATISTICS =====
-MODEL_STATS = {
-    'r_squared': 0.92155,
-    'adj_r_squared': 0.92155,
-    'mae': 3.991,
-    'rmse': 5.209,
-    'n': 610
-}
+# Database functions
+def complete_row(prediction_data, actual_points):
+    """Sheet row for a player's inputs (PlayerRecord or input dict) and actual skill points"""
+    if not isinstance(prediction_data, PlayerRecord):
+        try:
+            prediction_data = PlayerRecord.from_inputs(prediction_data)
+        except ValueError:
+            return inputs_row(prediction_data, actual_points)
+    return prediction_data.to_row(actual_points)
 
-# ===== UPDATED DevT-specific accuracy data =====
-DEVT_ACCURACY = {
-    'Elite': {
-        'n': 8,
-        'mae': 8.26,
-        'ranges': [
-            {'range': 5, 'percentage': 37.5},
-            {'range': 10, 'percentage': 50.0},
-            {'range': 15, 'percentage': 75.0}
-        ]
-    },
-    'Star': {
-        'n': 145,
-        'mae': 5.60,
-        'ranges': [
-            {'range': 5, 'percentage': 51.0},
-            {'range': 10, 'percentage': 86.9},
-            {'range': 15, 'percentage': 96.6}
-        ]
-    },
-    'Impact': {
-        'n': 300,
-        'mae': 3.18,
-        'ranges': [
-            {'range': 5, 'percentage': 72.3},
-            {'range': 10, 'percentage': 98.3},
-            {'range': 15, 'percentage': 99.7}
-        ]
-    },
-    'Normal': {
-        'n': 157,
-        'mae': 4.43,
-        'ranges': [
-            {'range': 5, 'percentage': 62.4},
-            {'range': 10, 'percentage': 93.6},
-            {'range': 15, 'percentage': 98.7}
-        ]
-    }
-}
+def submit_rows(rows):
+    """Log and queue rows as upserts; returns NEW, DUPLICATE or CORRECTION per row
+    
+    New players are appended; a player already submitted this season is
+    skipped when nothing changed and otherwise overwrites its own sheet row.
+    Only new rows feed the online model and the drift monitor.
+    """
+    index = get_submission_index()
+    log = get_submission_log()
+    queue = get_submission_queue()
+    
+    new, corrections, new_keys, correction_keys = [], [], [], []
+    
+    def log_rows(kinds):
+        new.extend(row for row, kind in zip(rows, kinds) if kind == NEW)
+        corrections.extend(row for row, kind in zip(rows, kinds) if kind == CORRECTION)
+        new_keys.extend(log.append_many(new) if len(new) > 1 else [log.append(row) for row in new])
+        correction_keys.extend(log.append(row, kind='update') for row in corrections)
+    
+    # Rows enter the index only once they are in the log
+    kinds = index.upsert(rows, write=log_rows)
+    if len(new) > 1:
+        queue.submit_many(new, keys=new_keys)
+    elif new:
+        queue.submit(new[0], key=new_keys[0])
+    for row, key in zip(corrections, correction_keys):
+        queue.submit_update(row, index.sheet_row, key=key)
+    
+    # The rows are saved once logged and queued; drift and online-model upkeep must not turn that into an error
+    if new:
+        try:
+            shadow_score(new)
+        except Exception:
+            logger.exception("Shadow scoring failed for %d submitted rows", len(new))
+        try:
+            get_online_store().update(new)
+        except Exception:
+            logger.exception("Online model update failed for %d submitted rows", len(new))
+    return kinds
 
-# Database functions
 def save_complete_data(prediction_data, actual_points):
-    """Save complete data (prediction + actual) to Google Sheets"""
+    """Queue complete data (prediction + actual) for the Google Sheets writer
+    
+    Returns NEW, CORRECTION or DUPLICATE, or False when saving failed.
+    """
     try:
-        sheet = get_gsheet_connection()
-        if sheet is None:
-            return False
-        
-        row = [
-            prediction_data['team'],
-            prediction_data['player_name'],
-            actual_points,
-            prediction_data['position'],
-            prediction_data['year'],
-            prediction_data['dev_trait'],
-            dev_trait_num[prediction_data['dev_trait']],
-            prediction_data['snaps'],
-            prediction_data['HC_Moti.1'],
-            prediction_data['HC_Moti.2'],
-            prediction_data['OC_Moti.1'],
-            prediction_data['DC_Moti.1'],
-            prediction_data['HC_TD1'],
-            prediction_data['HC_TD2'],
-            prediction_data['HC_TD3'],
-            prediction_data['OC_TD1'],
-            prediction_data['OC_TD2'],
-            prediction_data['OC_TD3'],
-            prediction_data['DC_TD1'],
-            prediction_data['DC_TD2'],
-            prediction_data['DC_TD3'],
-            prediction_data['xp_penalty']
-        ]
-        
-        sheet.append_row(row)
+        with timed("submit"):
+            row = complete_row(prediction_data, actual_points)
+            return submit_rows([row])[0]
+    except Exception as e:
+        st.error(f"Error saving to database: {e}")
+        return False
+
+def save_roster_data(players, actual_points):
+    """Queue a whole roster's results, logged in one transaction and written in one append_rows call"""
+    try:
+        with timed("submit", kind="roster"):
+            rows = [complete_row(player, actual) for player, actual in zip(players, actual_points)]
+            kinds = submit_rows(rows)
+        if CORRECTION in kinds or DUPLICATE in kinds:
+            st.info(f"{kinds.count(CORRECTION)} players were already submitted and have their rows updated; "
+                    f"{kinds.count(DUPLICATE)} unchanged resubmissions were skipped.")
         return True
     except Exception as e:
         st.error(f"Error saving to database: {e}")
         return False
 
+@timed("predict")
 def calculate_prediction(position, year, dev_trait, xp_penalty, coaching_abilities):
     """Calculate skill points prediction with floor constraint"""
-    prediction = coefficients['Intercept']
-    prediction += position_coeffs[position]
-    prediction += year_coeffs[year]
-    prediction += dev_trait_coeffs[dev_trait]
-    prediction += coefficients['XP_Penalty'] * xp_penalty
-    
-    for var, value in coaching_abilities.items():
-        if value:
-            prediction += coefficients[var]
-    
-    # Apply floor constraint (no negative predictions)
-    prediction = max(0, prediction)
-    
-    return prediction
+    return current_model().engine.predict(position, year, dev_trait, xp_penalty, coaching_abilities)
+
+@timed("predict", kind="batch")
+def calculate_predictions(players):
+    """Calculate skill points predictions for a whole roster (DataFrame or list of dicts)"""
+    return current_model().engine.predict_batch(players)
 
 def main():
+    model = current_model()
+    
     st.title("🏈 NCAA 26 Skill Points Predictor")
-    st.caption(f"v3.0 | Updated Model (R² = {MODEL_STATS['r_squared']:.5f}, MAE = {MODEL_STATS['mae']:.2f})")
+    stats = model.model_stats
+    error = f"MAE = {stats['mae']:.2f}" if 'mae' in stats else f"RMSE = {stats['rmse']:.2f}"
+    st.caption(f"v{model.version} | {model.name} (R² = {stats['r_squared']:.5f}, {error})")
+    
+    page = st.sidebar.radio("Mode", ["Single Player", "Roster"])
     
     st.markdown("---")
     
+    if page == "Roster":
+        # pandas is only needed by the roster editor
+        from NCAARosterPage import roster_page
+        
+        roster_page(model, save_roster_data)
+        show_footer(model)
+        return
+    
     st.subheader("Player Information")
     
     col1, col2 = st.columns(2)
@@ -234,11 +279,12 @@ def main():
     col1, col2 = st.columns(2)
     
     with col1:
-        position = st.selectbox("Position", list(position_coeffs.keys()), index=0)
-        year = st.selectbox("Year", list(year_coeffs.keys()), index=0)
+        position = st.selectbox("Position", list(model.position_coeffs.keys()), index=0)
+        year = st.selectbox("Year", list(model.year_coeffs.keys()), index=0)
     
     with col2:
-        dev_trait = st.selectbox("Development Trait", list(dev_trait_coeffs.keys()), index=2)
+        dev_trait = st.selectbox("Development Trait", list(model.dev_trait_coeffs.keys()),
+                                 index=list(model.dev_trait_coeffs).index("Impact"))
         xp_penalty = st.number_input("XP Penalty Slider", min_value=0, max_value=100, value=0, step=1)
     
     snaps = st.number_input("Snaps Played", min_value=0, max_value=2000, value=0, step=1)
@@ -268,7 +314,7 @@ def main():
         
         st.session_state.last_prediction = prediction
         st.session_state.last_dev_trait = dev_trait
-        st.session_state.last_inputs = {
+        inputs = {
             'team': team_name,
             'player_name': player_name,
             'snaps': snaps,
@@ -276,20 +322,14 @@ def main():
             'year': year,
             'dev_trait': dev_trait,
             'xp_penalty': xp_penalty,
-            'HC_Moti.1': 1 if coaching_abilities['HC_Moti.1'] else 0,
-            'HC_Moti.2': 1 if coaching_abilities['HC_Moti.2'] else 0,
-            'OC_Moti.1': 1 if coaching_abilities['OC_Moti.1'] else 0,
-            'DC_Moti.1': 1 if coaching_abilities['DC_Moti.1'] else 0,
-            'HC_TD1': 1 if coaching_abilities['HC_TD1'] else 0,
-            'HC_TD2': 1 if coaching_abilities['HC_TD2'] else 0,
-            'HC_TD3': 1 if coaching_abilities['HC_TD3'] else 0,
-            'OC_TD1': 1 if coaching_abilities['OC_TD1'] else 0,
-            'OC_TD2': 1 if coaching_abilities['OC_TD2'] else 0,
-            'OC_TD3': 1 if coaching_abilities['OC_TD3'] else 0,
-            'DC_TD1': 1 if coaching_abilities['DC_TD1'] else 0,
-            'DC_TD2': 1 if coaching_abilities['DC_TD2'] else 0,
-            'DC_TD3': 1 if coaching_abilities['DC_TD3'] else 0
+            **coaching_abilities
         }
+        try:
+            inputs = PlayerRecord.from_inputs(inputs)
+        except ValueError:
+            # The artifact has a category the record codes do not; keep the input dict
+            pass
+        st.session_state.last_inputs = inputs
     
     if 'last_prediction' in st.session_state:
         prediction = st.session_state.last_prediction
@@ -297,19 +337,33 @@ def main():
         
         st.success(f"### Predicted: {prediction:.1f} skill points")
         
-        devt_stats = DEVT_ACCURACY[dev_trait]
+        inputs = st.session_state.last_inputs
+        if isinstance(inputs, PlayerRecord):
+            inputs = inputs.to_inputs()
+        intervals = model.interval(inputs['position'], inputs['year'], dev_trait, prediction)
         
-        st.info(f"""
-        **Accuracy for {dev_trait} players** (based on {devt_stats['n']} players)  
-        Typical error: ±{devt_stats['mae']:.2f} points
-        """)
-        
-        for acc in devt_stats['ranges']:
-            range_val = acc['range']
-            pct = acc['percentage']
-            lower = max(0, prediction - range_val)
-            upper = prediction + range_val
-            st.write(f"±{int(range_val)} points ({pct:.1f}% of the time): **{lower:.1f} - {upper:.1f}**")
+        if intervals:
+            st.info(f"""
+            **Prediction intervals for a {inputs['year']} {dev_trait} {inputs['position']}**  
+            Bootstrapped from {model.intervals.n_boot} model refits
+            """)
+            
+            for level, lower, upper in intervals:
+                st.write(f"{level:.0%} of the time: **{lower:.1f} - {upper:.1f}**")
+        else:
+            devt_stats = model.devt_accuracy[dev_trait]
+            
+            st.info(f"""
+            **Accuracy for {dev_trait} players** (based on {devt_stats['n']} players)  
+            Typical error: ±{devt_stats['mae']:.2f} points
+            """)
+            
+            for acc in devt_stats['ranges']:
+                range_val = acc['range']
+                pct = acc['percentage']
+                lower = max(0, prediction - range_val)
+                upper = prediction + range_val
+                st.write(f"±{int(range_val)} points ({pct:.1f}% of the time): **{lower:.1f} - {upper:.1f}**")
         
         st.markdown("---")
         
@@ -328,16 +382,31 @@ def main():
             if st.button("Submit Actual Results", key="submit_actual"):
                 error = abs(actual_points - prediction)
                 
-                if save_complete_data(st.session_state.last_inputs, actual_points):
-                    st.success(f"✅ Thank you! Data saved to database. Prediction error was {error:.1f} points")
+                saved = save_complete_data(st.session_state.last_inputs, actual_points)
+                if saved == DUPLICATE:
+                    st.info("This result was already submitted - nothing new to save.")
+                elif saved == CORRECTION:
+                    st.success(f"✅ Updated your earlier submission for this player. Prediction error was {error:.1f} points")
+                elif saved:
+                    st.success(f"✅ Thank you! Data queued for the database. Prediction error was {error:.1f} points")
                     st.balloons()
                 else:
                     st.error("Could not save to database")
+                if saved and not get_sheets_connection().available():
+                    st.caption("Google Sheets is unreachable right now - your result is saved here and will be "
+                               "written to the sheet once it is back.")
     
+    show_footer(model)
+
+def show_footer(model):
     st.markdown("---")
-    st.caption("71% of predictions within ±5 points | 94% within ±10 points | 99% within ±15 points")
-    st.caption("Model trained on 610 players (seasons 1-5) | Optimized for early-mid dynasty")
+    summary = model.accuracy_summary()
+    if summary:
+        st.caption(summary)
+    st.caption(f"Model trained on {model.model_stats['n']} players | Optimized for early-mid dynasty")
     st.caption("Created by Alex Swanner | [LinkedIn](https://linkedin.com/in/alexswanner/)")
 
 if __name__ == "__main__":
-    main()
+    with timed("rerun"):
+        main()
+    start_sheets_warmup()
@@ -0,0 +1,282 @@
+"""Incremental model updates from submitted actual results
+
+Usage:
+    python NCAAOnlineModel.py init ["NCAA R Code Data.xlsx"] [--out online_state.json]
+    python NCAAOnlineModel.py status [online_state.json]
+    python NCAAOnlineModel.py rollback [online_state.json]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from NCAATraining import (
+    CATEGORICAL, DATA_PATH, DUMMY_MODEL, category_levels, coefficient_dicts, design_matrix, fit,
+    iqr_bounds, load_training_data, rows_to_data, subset, write_json_atomic
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, saves fall back to last-writer-wins
+    fcntl = None
+
+STATE_PATH = "online_state.json"
+
+
+@contextmanager
+def state_lock(path=STATE_PATH):
+    """Exclusive lock on the state file for a load-modify-save (held in path + '.lock')"""
+    with open(path + '.lock', 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class OnlineModel:
+    """Running least-squares sufficient statistics (X'X, X'y, y'y) for the served model
+
+    Each submitted row costs one O(p^2) outer-product update, and the
+    coefficients come from solving the p x p normal equations, so the served
+    model is refreshed without refitting from scratch. Rows whose residual
+    falls outside the training IQR bounds are skipped, mirroring the
+    outlier filter of the clean model. New coefficients are only swapped in
+    once min_samples rows have arrived since the last swap, and every
+    swap keeps the previous coefficients together with the statistics they
+    were solved from, so a rollback also drops the rows that led to the
+    bad swap instead of re-solving from them at the next refresh.
+    """
+
+    def __init__(self, terms, levels, xtx, xty, yty, n, residual_bounds=(-np.inf, np.inf),
+                 min_samples=25, served=None, history=None, n_at_swap=None, rejected=0, max_history=10,
+                 swap_stats=None):
+        self.terms = list(terms)
+        self.levels = levels
+        self.xtx = np.asarray(xtx, dtype=np.float64)
+        self.xty = np.asarray(xty, dtype=np.float64)
+        self.yty = float(yty)
+        self.n = int(n)
+        self.residual_bounds = tuple(residual_bounds)
+        self.min_samples = min_samples
+        self.served = served
+        self.history = history or []
+        self.n_at_swap = self.n if n_at_swap is None else n_at_swap
+        self.rejected = rejected
+        self.max_history = max_history
+        self._lock = threading.Lock()
+        if self.served is None:
+            self.served = self._coefficients(self.solve())
+        # Statistics the served coefficients were solved from
+        self.swap_stats = swap_stats or self._stats()
+
+    @classmethod
+    def from_training(cls, data, terms=DUMMY_MODEL, **kwargs):
+        """Seed the statistics with the cleaned training set"""
+        residuals = fit(data, terms).residuals
+        lower, upper = bounds = iqr_bounds(residuals)
+        data = subset(data, (residuals >= lower) & (residuals <= upper))
+
+        levels = {column: category_levels(data, column) for column in CATEGORICAL}
+        X, _ = design_matrix(data, terms, levels)
+        y = data['Skill.Points']
+        return cls(terms, levels, X.T @ X, X.T @ y, y @ y, len(y), bounds, **kwargs)
+
+    def _design(self, rows):
+        data = rows_to_data(rows)
+        X, names = design_matrix(data, self.terms, self.levels)
+        return X, data['Skill.Points'], names
+
+    def _stats(self):
+        return {'xtx': self.xtx.tolist(), 'xty': self.xty.tolist(), 'yty': self.yty, 'n': self.n}
+
+    def solve(self):
+        """Least-squares coefficients from the current statistics"""
+        try:
+            return np.linalg.solve(self.xtx, self.xty)
+        except np.linalg.LinAlgError:
+            return np.linalg.lstsq(self.xtx, self.xty, rcond=None)[0]
+
+    def _coefficients(self, beta):
+        _, _, names = self._design([])
+        dicts = coefficient_dicts(dict(zip(names, beta.tolist())), self.levels)
+        rss = self.yty - 2 * beta @ self.xty + beta @ self.xtx @ beta
+        dicts['beta'] = beta.tolist()
+        dicts['n'] = self.n
+        dicts['rmse'] = float(np.sqrt(max(rss, 0.0) / self.n))
+        intercept = names.index('Intercept')
+        tss = self.yty - self.xty[intercept] ** 2 / self.n
+        dicts['r_squared'] = float(1 - rss / tss) if tss > 0 else 0.0
+        dicts['updated_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        return dicts
+
+    def update(self, rows):
+        """Fold sheet rows (save_complete_data layout) into the statistics; returns rows used"""
+        X, y, _ = self._design(rows)
+        with self._lock:
+            residuals = y - X @ np.asarray(self.served['beta'])
+            lower, upper = self.residual_bounds
+            keep = (residuals >= lower) & (residuals <= upper)
+            X, y = X[keep], y[keep]
+            self.xtx += X.T @ X
+            self.xty += X.T @ y
+            self.yty += float(y @ y)
+            self.n += int(keep.sum())
+            self.rejected += int((~keep).sum())
+            return int(keep.sum())
+
+    def refresh(self):
+        """Swap in freshly solved coefficients once enough new rows have arrived
+
+        Returns the new served coefficients, or None when the guard holds them back.
+        """
+        with self._lock:
+            if self.n - self.n_at_swap < self.min_samples:
+                return None
+            self.history.append({'served': self.served, 'stats': self.swap_stats})
+            del self.history[:-self.max_history]
+            self.served = self._coefficients(self.solve())
+            self.swap_stats = self._stats()
+            self.n_at_swap = self.n
+            return self.served
+
+    def rollback(self):
+        """Restore the previously served coefficients and the statistics they were solved from
+
+        Rows folded in since then are dropped; returns how many.
+        """
+        with self._lock:
+            if not self.history:
+                raise ValueError("No earlier coefficients to roll back to")
+            entry = self.history.pop()
+            stats = entry['stats']
+            dropped = self.n - stats['n']
+            self.served = entry['served']
+            self.xtx = np.asarray(stats['xtx'], dtype=np.float64)
+            self.xty = np.asarray(stats['xty'], dtype=np.float64)
+            self.yty = float(stats['yty'])
+            self.n = self.n_at_swap = int(stats['n'])
+            self.swap_stats = stats
+            return dropped
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'terms': self.terms,
+                'levels': self.levels,
+                'xtx': self.xtx.tolist(),
+                'xty': self.xty.tolist(),
+                'yty': self.yty,
+                'n': self.n,
+                'residual_bounds': list(self.residual_bounds),
+                'min_samples': self.min_samples,
+                'served': self.served,
+                'history': self.history,
+                'n_at_swap': self.n_at_swap,
+                'swap_stats': self.swap_stats,
+                'rejected': self.rejected
+            }
+
+    def save(self, path=STATE_PATH):
+        write_json_atomic(self.to_dict(), path)
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        with open(path) as f:
+            return cls(**json.load(f))
+
+
+class OnlineStore:
+    """Online state file shared by processes, reloaded when it changes on disk
+
+    Like ModelStore, get() stats the file at most once per check_interval
+    and re-reads it when its mtime or size changed, so a rollback from the
+    command line reaches a running app. update() re-reads, updates and
+    saves under state_lock, so concurrent writers never overwrite each
+    other's rows or a rollback made in between.
+    """
+
+    def __init__(self, path=STATE_PATH, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._model = None
+        self._checked = float('-inf')
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _reload(self):
+        self._checked = time.monotonic()
+        stamp = self._stat()
+        if stamp != self._stamp:
+            self._model = None if stamp is None else OnlineModel.load(self.path)
+            self._stamp = stamp
+        return self._model
+
+    def get(self):
+        """Current online model, or None when no state file has been seeded"""
+        with self._lock:
+            if time.monotonic() - self._checked >= self.check_interval:
+                self._reload()
+            return self._model
+
+    def update(self, rows):
+        """Fold rows into the state on disk and save it; returns the model, or None when unseeded"""
+        with self._lock, state_lock(self.path):
+            model = self._reload()
+            if model is None:
+                return None
+            model.update(rows)
+            model.refresh()
+            model.save(self.path)
+            self._stamp = self._stat()
+            return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    init = commands.add_parser("init", help="seed the state from the training workbook")
+    init.add_argument("data", nargs="?", default=DATA_PATH)
+    init.add_argument("--sheet", default=0)
+    init.add_argument("--out", default=STATE_PATH)
+    init.add_argument("--min-samples", type=int, default=25)
+    for name in ("status", "rollback"):
+        command = commands.add_parser(name)
+        command.add_argument("state", nargs="?", default=STATE_PATH)
+    args = parser.parse_args()
+
+    if args.command == "init":
+        model = OnlineModel.from_training(load_training_data(args.data, args.sheet), min_samples=args.min_samples)
+        model.save(args.out)
+        print(f"Seeded {args.out} with {model.n} rows")
+        return
+
+    if args.command == "rollback":
+        with state_lock(args.state):
+            model = OnlineModel.load(args.state)
+            dropped = model.rollback()
+            model.save(args.state)
+        print(f"Rolled back, dropping the {dropped} rows folded in since those coefficients were solved")
+    else:
+        model = OnlineModel.load(args.state)
+    print(f"Rows: {model.n} ({model.n - model.n_at_swap} since last swap, {model.rejected} rejected as outliers)")
+    print(f"Served coefficients from {model.served['updated_at']}, RMSE {model.served['rmse']:.3f}")
+    print(f"Rollback history: {len(model.history)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""Compact player records: category codes plus one coaching bitmask
+
+Usage: python NCAAPlayerRecord.py "NCAA R Code Data.xlsx" -o players.ncaarec [--sheet FINAL]
+       python NCAAPlayerRecord.py players.ncaarec        (print a summary of a record file)
+
+A submission is a team, a name, three category codes (indexes into
+POSITION_ORDER, YEAR_ORDER and DEVT_ORDER), snaps, the XP penalty, the 13
+coaching flags as one bitmask (bit i is COACHING_VARS[i], as in
+PredictionTable and NCAADataCache) and the actual skill points (NaN while
+unknown). PlayerRecord holds one of them in __slots__; PlayerRecords holds
+many in a NumPy structured array with team and player names interned in a
+string table, and reads and writes the .ncaarec binary format:
+
+    b'NCAAREC1', uint32 string count, uint32 record count,
+    each string as uint16 byte length + UTF-8, then the packed records (RECORD_DTYPE)
+
+Both convert to and from the 22-column sheet row layout (NCAATraining.SHEET_COLUMNS).
+"""
+import argparse
+import math
+import struct
+import sys
+
+import numpy as np
+
+from NCAATraining import COACHING_VARS, DEVT_ORDER, POSITION_ORDER, YEAR_ORDER
+
+MAGIC = b'NCAAREC1'
+RECORD_EXT = '.ncaarec'
+
+POSITION_CODES = {p: i for i, p in enumerate(POSITION_ORDER)}
+YEAR_CODES = {y: i for i, y in enumerate(YEAR_ORDER)}
+DEVT_CODES = {d: i for i, d in enumerate(DEVT_ORDER)}
+# DevT.Num as the web app writes it to the sheet (Elite 4 ... Normal 1)
+DEVT_NUM = {'Elite': 4, 'Star': 3, 'Impact': 2, 'Normal': 1}
+
+RECORD_DTYPE = np.dtype([
+    ('team', '<u4'), ('name', '<u4'),
+    ('skill_points', '<f4'), ('snaps', '<f4'), ('xp_penalty', '<f4'),
+    ('coaching', '<u2'), ('position', 'u1'), ('year', 'u1'), ('dev_trait', 'u1')
+])
+
+_HEADER = struct.Struct('<8sII')
+_LENGTH = struct.Struct('<H')
+# One PlayerRecord without its strings: codes, coaching mask, snaps, XP penalty, skill points
+_RECORD = struct.Struct('<BBBHfff')
+
+
+def _code(codes, value, label):
+    try:
+        return codes[str(value).strip()]
+    except KeyError:
+        raise ValueError(f"unknown {label} {value!r}") from None
+
+
+def coaching_mask(flags):
+    """Bitmask from a mapping of coaching variable -> truthy flag"""
+    mask = 0
+    for bit, var in enumerate(COACHING_VARS):
+        if flags.get(var):
+            mask |= 1 << bit
+    return mask
+
+
+def inputs_row(inputs, skill_points):
+    """Row in the save_complete_data layout straight from a web app input dict
+
+    For players a retrained artifact can score but PlayerRecord cannot
+    hold: NCAATraining.category_levels keeps levels beyond the fixed
+    orders the record codes index.
+    """
+    devt = str(inputs['dev_trait'])
+    return [
+        inputs.get('team') or '', inputs.get('player_name') or '', skill_points,
+        inputs['position'], inputs['year'], devt, DEVT_NUM.get(devt, ''), inputs.get('snaps') or 0
+    ] + [int(bool(inputs.get(var))) for var in COACHING_VARS] + [inputs.get('xp_penalty') or 0]
+
+
+class PlayerRecord:
+    """One player submission with categories as small integer codes"""
+
+    __slots__ = ('team', 'name', 'position', 'year', 'dev_trait', 'snaps', 'xp_penalty', 'coaching',
+                 'skill_points')
+
+    def __init__(self, team, name, position, year, dev_trait, snaps=0, xp_penalty=0, coaching=0,
+                 skill_points=math.nan):
+        self.team = team
+        self.name = name
+        self.position = position
+        self.year = year
+        self.dev_trait = dev_trait
+        self.snaps = snaps
+        self.xp_penalty = xp_penalty
+        self.coaching = coaching
+        self.skill_points = skill_points
+
+    @classmethod
+    def from_inputs(cls, inputs, skill_points=math.nan):
+        """Record from a web app input dict (team, player_name, position, ..., coaching flags)"""
+        return cls(
+            inputs.get('team') or '', inputs.get('player_name') or '',
+            _code(POSITION_CODES, inputs['position'], 'position'),
+            _code(YEAR_CODES, inputs['year'], 'year'),
+            _code(DEVT_CODES, inputs['dev_trait'], 'dev trait'),
+            inputs.get('snaps') or 0, inputs.get('xp_penalty') or 0,
+            coaching_mask(inputs), skill_points
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        """Record from a row in the save_complete_data layout"""
+        (team, name, skill_points, position, year, devt, _devt_num, snaps), flags = row[:8], row[8:21]
+        coaching = 0
+        for bit, flag in enumerate(flags):
+            if flag:
+                coaching |= 1 << bit
+        return cls(team, name, _code(POSITION_CODES, position, 'position'), _code(YEAR_CODES, year, 'year'),
+                   _code(DEVT_CODES, devt, 'dev trait'), snaps, row[21], coaching, skill_points)
+
+    @property
+    def position_label(self):
+        return POSITION_ORDER[self.position]
+
+    @property
+    def year_label(self):
+        return YEAR_ORDER[self.year]
+
+    @property
+    def dev_trait_label(self):
+        return DEVT_ORDER[self.dev_trait]
+
+    def flag(self, var):
+        return (self.coaching >> COACHING_VARS.index(var)) & 1
+
+    def to_row(self, skill_points=None):
+        """Row in the save_complete_data layout, optionally with the actual skill points filled in"""
+        devt = DEVT_ORDER[self.dev_trait]
+        coaching = self.coaching
+        return [
+            self.team, self.name, self.skill_points if skill_points is None else skill_points,
+            POSITION_ORDER[self.position], YEAR_ORDER[self.year], devt, DEVT_NUM[devt], self.snaps
+        ] + [(coaching >> bit) & 1 for bit in range(len(COACHING_VARS))] + [self.xp_penalty]
+
+    def to_inputs(self):
+        """Web app input dict, as accepted by ScoringEngine.predict_batch"""
+        inputs = {
+            'team': self.team, 'player_name': self.name, 'snaps': self.snaps,
+            'position': self.position_label, 'year': self.year_label, 'dev_trait': self.dev_trait_label,
+            'xp_penalty': self.xp_penalty
+        }
+        inputs.update((var, (self.coaching >> bit) & 1) for bit, var in enumerate(COACHING_VARS))
+        return inputs
+
+    def to_bytes(self):
+        team, name = self.team.encode('utf-8'), self.name.encode('utf-8')
+        return b''.join([
+            _LENGTH.pack(len(team)), team, _LENGTH.pack(len(name)), name,
+            _RECORD.pack(self.position, self.year, self.dev_trait, self.coaching, self.snaps, self.xp_penalty,
+                         self.skill_points)
+        ])
+
+    @classmethod
+    def from_bytes(cls, data):
+        strings = []
+        offset = 0
+        for _ in range(2):
+            (length,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            strings.append(bytes(data[offset:offset + length]).decode('utf-8'))
+            offset += length
+        position, year, devt, coaching, snaps, xp, skill_points = _RECORD.unpack_from(data, offset)
+        return cls(strings[0], strings[1], position, year, devt, snaps, xp, coaching, skill_points)
+
+    def __eq__(self, other):
+        if not isinstance(other, PlayerRecord):
+            return NotImplemented
+        return all(
+            getattr(self, s) == getattr(other, s) or (s == 'skill_points' and math.isnan(self.skill_points)
+                                                      and math.isnan(other.skill_points))
+            for s in self.__slots__
+        )
+
+    def __repr__(self):
+        return (f"PlayerRecord({self.team!r}, {self.name!r}, {self.position_label}, {self.year_label}, "
+                f"{self.dev_trait_label}, coaching={self.coaching:#06x}, skill_points={self.skill_points})")
+
+
+class PlayerRecords:
+    """Many records in one structured array, with team and player names interned"""
+
+    def __init__(self, records=None, strings=None):
+        self.records = np.zeros(0, dtype=RECORD_DTYPE) if records is None else records
+        self.strings = [] if strings is None else strings
+        self._string_index = {s: i for i, s in enumerate(self.strings)}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, i):
+        r = self.records[i]
+        return PlayerRecord(self.strings[r['team']], self.strings[r['name']], int(r['position']), int(r['year']),
+                            int(r['dev_trait']), float(r['snaps']), float(r['xp_penalty']), int(r['coaching']),
+                            float(r['skill_points']))
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def intern(self, value):
+        index = self._string_index.get(value)
+        if index is None:
+            index = self._string_index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    @classmethod
+    def from_records(cls, records):
+        out = cls()
+        out.records = np.array([
+            (out.intern(r.team), out.intern(r.name), r.skill_points, r.snaps, r.xp_penalty, r.coaching,
+             r.position, r.year, r.dev_trait)
+            for r in records
+        ], dtype=RECORD_DTYPE)
+        return out
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Records from rows in the save_complete_data layout"""
+        return cls.from_records(PlayerRecord.from_row(row) for row in rows)
+
+    @classmethod
+    def from_data(cls, data):
+        """Records from a training column dict (load_training_data / rows_to_data layout)"""
+        out = cls()
+        n = len(data['Skill.Points'])
+        records = np.zeros(n, dtype=RECORD_DTYPE)
+        for field, column in [('team', 'Team'), ('name', 'Name')]:
+            uniques, inverse = np.unique(np.asarray(data[column], dtype=str), return_inverse=True)
+            records[field] = np.array([out.intern(u) for u in uniques.tolist()], dtype=np.uint32)[inverse]
+        for field, column, codes in [('position', 'Position', POSITION_CODES), ('year', 'Year', YEAR_CODES),
+                                     ('dev_trait', 'DevT', DEVT_CODES)]:
+            uniques, inverse = np.unique(np.asarray(data[column], dtype=str), return_inverse=True)
+            records[field] = np.array([_code(codes, u, column) for u in uniques.tolist()], dtype=np.uint8)[inverse]
+        for field, column in [('skill_points', 'Skill.Points'), ('snaps', 'Snaps'), ('xp_penalty', 'XP.Penalty')]:
+            records[field] = data[column]
+        for bit, var in enumerate(COACHING_VARS):
+            flags = np.asarray(data[var])
+            if not np.isin(flags, (0, 1)).all():
+                raise ValueError(f"{var} has values other than 0/1 and cannot be stored as a bit")
+            records['coaching'] |= flags.astype(np.uint16) << bit
+        out.records = records
+        return out
+
+    def append(self, record):
+        item = np.array([(self.intern(record.team), self.intern(record.name), record.skill_points, record.snaps,
+                          record.xp_penalty, record.coaching, record.position, record.year, record.dev_trait)],
+                        dtype=RECORD_DTYPE)
+        self.records = np.concatenate([self.records, item])
+
+    def to_rows(self):
+        return [record.to_row() for record in self]
+
+    def to_data(self):
+        """Training column dict in the load_training_data layout"""
+        r = self.records
+        strings = np.array(self.strings, dtype=object)
+        data = {
+            'Team': strings[r['team']],
+            'Name': strings[r['name']],
+            'Position': np.array(POSITION_ORDER, dtype=object)[r['position']],
+            'Year': np.array(YEAR_ORDER, dtype=object)[r['year']],
+            'DevT': np.array(DEVT_ORDER, dtype=object)[r['dev_trait']],
+        }
+        for column, field in [('Skill.Points', 'skill_points'), ('Snaps', 'snaps'), ('XP.Penalty', 'xp_penalty')]:
+            data[column] = r[field].astype(np.float64)
+        for bit, var in enumerate(COACHING_VARS):
+            data[var] = ((r['coaching'] >> bit) & 1).astype(np.float64)
+        return data
+
+    def encode(self, engine):
+        """(positions, years, dev_traits, masks, xp) in engine codes, as ScoringEngine.encode returns
+
+        Categories the engine has no coefficient for are -1.
+        """
+        remap = [
+            np.array([index.get(level, -1) for level in order], dtype=np.intp)
+            for index, order in [(engine.position_index, POSITION_ORDER), (engine.year_index, YEAR_ORDER),
+                                 (engine.dev_trait_index, DEVT_ORDER)]
+        ]
+        r = self.records
+        masks = r['coaching'].astype(np.int64)
+        if list(engine.coaching_vars) != COACHING_VARS:
+            masks = np.zeros(len(r), dtype=np.int64)
+            for bit, var in enumerate(engine.coaching_vars):
+                if var in COACHING_VARS:
+                    masks |= ((r['coaching'] >> COACHING_VARS.index(var)) & 1).astype(np.int64) << bit
+        return (remap[0][r['position']], remap[1][r['year']], remap[2][r['dev_trait']], masks,
+                r['xp_penalty'].astype(np.float64))
+
+    def save(self, path):
+        encoded = [s.encode('utf-8') for s in self.strings]
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, len(encoded), len(self.records)))
+            f.write(b''.join(_LENGTH.pack(len(s)) + s for s in encoded))
+            f.write(np.ascontiguousarray(self.records).tobytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, n_strings, n_records = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a player record file")
+        offset = _HEADER.size
+        strings = []
+        for _ in range(n_strings):
+            (length,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            strings.append(data[offset:offset + length].decode('utf-8'))
+            offset += length
+        records = np.frombuffer(data, dtype=RECORD_DTYPE, count=n_records, offset=offset).copy()
+        return cls(records, strings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="training workbook to convert, or a .ncaarec file to summarize")
+    parser.add_argument("-o", "--output", help="record file to write")
+    parser.add_argument("--sheet", default=0, help="worksheet name (the notebook uses FINAL)")
+    args = parser.parse_args()
+
+    if args.source.endswith(RECORD_EXT):
+        records = PlayerRecords.load(args.source)
+    else:
+        from NCAATraining import load_training_data
+        records = PlayerRecords.from_data(load_training_data(args.source, args.sheet))
+
+    print(f"{len(records):,} records, {len(records.strings):,} distinct team/player names, "
+          f"{records.records.nbytes:,} bytes of records ({RECORD_DTYPE.itemsize} per player)")
+    if args.output:
+        records.save(args.output)
+        print(f"Wrote {args.output}")
+    elif not args.source.endswith(RECORD_EXT):
+        print("Nothing written; pass -o players.ncaarec", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""Headless HTTP/JSON prediction service with micro-batching
+
+Usage: python NCAAPredictionService.py [--host 127.0.0.1] [--port 8080] [--max-wait-ms 2]
+                                       [--model models/ncaa_v3.0.json]
+
+    POST /predict   one player object, a list of them, or {"players": [...]}
+                    in the web app's input layout (position, year, dev_trait,
+                    xp_penalty and the coaching flags, e.g. "HC_Moti.1": 1)
+    GET  /stats     request/batch counts and p50/p99 latency
+    GET  /health    model version
+
+Concurrent requests that arrive within max_wait of each other are scored
+together with one ScoringEngine.predict_terms call, so throughput grows
+with load instead of paying the per-call overhead for every request. Each
+prediction carries the same per-term breakdown the desktop app prints,
+plus bootstrap intervals when the artifact has them.
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+from NCAAMetrics import configure, inc, start_exporters, timed
+from NCAAScoringEngine import DEFAULT_MODEL_PATH, ModelStore
+
+MAX_BODY = 16 * 1024 * 1024
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error'}
+
+
+def check_player(player, coaching_vars):
+    """Raise ValueError unless every input of a player object is a scalar of the right type
+
+    The engine scores whole columns, so a list where a scalar belongs would
+    otherwise be broadcast into a wrong prediction instead of an error.
+    """
+    for field in ('position', 'year', 'dev_trait'):
+        if field not in player:
+            raise KeyError(field)
+        if not isinstance(player[field], str):
+            raise ValueError(f"{field} must be a string")
+    if 'xp_penalty' not in player:
+        raise KeyError('xp_penalty')
+    xp = player['xp_penalty']
+    if isinstance(xp, bool) or not isinstance(xp, (int, float)):
+        raise ValueError("xp_penalty must be a number")
+    # json.loads accepts NaN and Infinity, which would come back out as invalid JSON
+    if not math.isfinite(xp):
+        raise ValueError("xp_penalty must be finite")
+    for var in coaching_vars:
+        if var in player and (not isinstance(player[var], (bool, int, float)) or player[var] not in (0, 1)):
+            raise ValueError(f"{var} must be 0 or 1")
+
+
+class MicroBatcher:
+    """Collects concurrent scoring requests into one vectorized call
+
+    submit() queues a list of players and returns a future for their
+    results. The batch loop waits for the first request, keeps collecting
+    for max_wait seconds or until max_batch players are queued, then scores
+    the lot at once and resolves every future with its own slice.
+    """
+
+    def __init__(self, score, max_batch=4096, max_wait=0.002):
+        self.score = score
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.batched_players = 0
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    def submit(self, players):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((players, future))
+        return future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._score(batch)
+
+    def _score(self, batch):
+        self.batches += 1
+        self.batched_players += sum(len(players) for players, _ in batch)
+        inc("ncaa_service_players_total", sum(len(players) for players, _ in batch))
+        try:
+            with timed("predict", kind="service_batch"):
+                results = self.score([player for players, _ in batch for player in players])
+        except Exception:
+            # One bad request must not fail its neighbours (or stop this loop): score them one by one
+            for players, future in batch:
+                try:
+                    result = self.score(players)
+                except Exception as e:
+                    result = e
+                if not future.done():
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+            return
+        start = 0
+        for players, future in batch:
+            if not future.done():
+                future.set_result(results[start:start + len(players)])
+            start += len(players)
+
+
+class LatencyStats:
+    """Rolling window of request latencies"""
+
+    def __init__(self, window=10000):
+        self.samples = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, seconds, ok=True):
+        self.samples.append(seconds)
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+
+    def summary(self):
+        summary = {'requests': self.requests, 'errors': self.errors, 'window': len(self.samples)}
+        if self.samples:
+            p50, p99 = np.percentile(np.fromiter(self.samples, dtype=np.float64), [50, 99]) * 1000
+            summary.update(p50_ms=round(float(p50), 3), p99_ms=round(float(p99), 3))
+        return summary
+
+
+class PredictionService:
+    """Routes HTTP requests to the micro-batcher"""
+
+    def __init__(self, store, max_batch=4096, max_wait=0.002):
+        self.store = store
+        self.batcher = MicroBatcher(self.score, max_batch, max_wait)
+        self.latency = LatencyStats()
+
+    def score(self, players):
+        """Predictions with per-term breakdown (and intervals when available) for a list of players"""
+        model = self.store.get()
+        engine = model.engine
+        terms = engine.predict_terms(players)
+        columns = {name: values.tolist() for name, values in terms.items()}
+
+        intervals = None
+        if model.intervals is not None:
+            positions, years, dev_traits, _, _ = engine.encode(players)
+            cells = engine.table.pack(positions, years, dev_traits, 0)
+            offsets = model.intervals.offsets[cells].astype(np.float64)
+            bounds = terms['total'][:, None, None] + offsets
+            bounds[..., 0] = np.maximum(bounds[..., 0], 0)
+            intervals = bounds.tolist()
+
+        results = []
+        for i in range(len(players)):
+            result = {
+                'prediction': columns['total'][i],
+                'breakdown': {name: columns[name][i] for name in terms if name != 'total'}
+            }
+            if intervals is not None:
+                result['intervals'] = [
+                    {'level': level, 'lower': lower, 'upper': upper}
+                    for level, (lower, upper) in zip(model.intervals.levels, intervals[i])
+                ]
+            results.append(result)
+        return results
+
+    async def predict(self, body):
+        payload = json.loads(body)
+        single = isinstance(payload, dict) and 'players' not in payload
+        if single:
+            players = [payload]
+        elif isinstance(payload, dict):
+            players = payload['players']
+        else:
+            players = payload
+        if not isinstance(players, list) or not all(isinstance(p, dict) for p in players):
+            raise ValueError("expected a player object, a list of players or {\"players\": [...]}")
+        coaching_vars = self.store.get().engine.coaching_vars
+        for player in players:
+            check_player(player, coaching_vars)
+        results = await self.batcher.submit(players) if players else []
+        response = {'model_version': self.store.get().version}
+        if single:
+            response.update(results[0])
+        else:
+            response['predictions'] = results
+        return response
+
+    def stats(self):
+        stats = self.latency.summary()
+        stats['batches'] = self.batcher.batches
+        stats['avg_batch_players'] = round(self.batcher.batched_players / max(self.batcher.batches, 1), 2)
+        return stats
+
+    async def route(self, method, path, body):
+        if path == '/predict':
+            if method != 'POST':
+                return 405, {'error': 'use POST'}
+            try:
+                return 200, await self.predict(body)
+            except (KeyError, ValueError, TypeError) as e:
+                message = e.args[0] if isinstance(e, KeyError) and e.args else e
+                return 400, {'error': str(message)}
+            except Exception as e:
+                return 500, {'error': f"{type(e).__name__}: {e}"}
+        if path == '/stats':
+            return 200, self.stats()
+        if path == '/health':
+            return 200, {'status': 'ok', 'model_version': self.store.get().version}
+        return 404, {'error': f'no route {path}'}
+
+    async def handle(self, reader, writer):
+        """One keep-alive HTTP/1.1 connection"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # Without a usable length the body cannot be skipped, so the connection closes
+                    status, payload = 400, {'error': 'invalid Content-Length'}
+                    keep_alive = False
+                elif length > MAX_BODY:
+                    status, payload = 413, {'error': 'request body too large'}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = await self.route(method, target.split('?')[0], body)
+                    keep_alive = (headers.get('connection', '').lower() != 'close'
+                                  and version == 'HTTP/1.1')
+
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}"
+                    f"\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if target.startswith('/predict'):
+                    self.latency.record(time.perf_counter() - start, status == 200)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        print(f"Serving model v{self.store.get().version} on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--max-batch", type=int, default=4096, help="players per vectorized batch")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="how long a batch waits for company")
+    args = parser.parse_args()
+
+    configure(app="service")
+    start_exporters()
+    service = PredictionService(ModelStore(args.model), args.max_batch, args.max_wait_ms / 1000)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,17 @@
+import os
 import tkinter as tk
 from tkinter import ttk, messagebox
+from NCAAMetrics import configure, start_exporters, timed
+from NCAAScoringEngine import MODELS_DIR, ModelStore
 
-# Coefficients from Dummy_Model_Clean (506 players, outliers removed)
-coefficients = {
-    'Intercept': 83.40709,
-    'HC_Moti.1': 0.35494,
-    'HC_Moti.2': 2.03755,
-    'OC_Moti.1': 0.62476,
-    'DC_Moti.1': 3.16875,
-    'HC_TD1': 9.49064,
-    'HC_TD2': 2.77841,
-    'HC_TD3': -0.33346,
-    'OC_TD1': 3.08600,
-    'OC_TD2': 1.82702,
-    'OC_TD3': 2.45405,
-    'DC_TD1': -1.44690,
-    'DC_TD2': 14.21596,
-    'DC_TD3': 13.07231,
-    'XP_Penalty': -0.42761
-}
-
-# Development Trait coefficients (baseline is Elite)
-dev_trait_coeffs = {
-    'Elite': 0,  # baseline
-    'Impact': -38.18651,
-    'Normal': -50.53085,
-    'Star': -23.53652
-}
+# Versioned model artifact (models/), hot-reloaded on change. The desktop app keeps its v2.1 model
+# (with the SR year and DT position coefficients) unless NCAA_MODEL_ARTIFACT picks another
+MODEL_PATH = os.environ.get("NCAA_MODEL_ARTIFACT", os.path.join(MODELS_DIR, "ncaa_v2.1.json"))
+MODEL_STORE = ModelStore(MODEL_PATH, floor=None)
+MODEL_POLL_MS = 2000
 
-# Position coefficients (baseline is QB - not in model)
-position_coeffs = {
-    'QB': 0,  # baseline
-    'RB': -4.687237,
-    'WR': -0.3681322,
-    'TE': -6.699325,
-    'OL': 3.123435,
-    'DL': -6.514467,
-    'DT': -3.839926,
-    'LB': -10.68404,
-    'S': -2.186808,
-    'CB': 0.5434067,
-    'K': 0.2088728,
-    'P': 0.8526459
-}
-
-# Year coefficients (baseline is FR - not in model)
-year_coeffs = {
-    'FR': 0,  # baseline
-    'FR (RS)': -2.86779,
-    'SO': -3.145401,
-    'SO (RS)': -5.05219,
-    'JR': -4.748136,
-    'JR (RS)': -2.66559,
-    'SR': 0.08653364
-}
+# Timing/counter metrics (see NCAAMetrics.py for the endpoint and dump file switches)
+configure(app="desktop")
 
 # Binary mapping
 binary_map = {"Yes": 1, "No": 0}
@@ -75,69 +33,13 @@ variable_labels = {
     'DC_TD3': 'DC Talent Developer Tier 3'
 }
 
-# Model performance statistics
-MODEL_STATS = {
-    'r_squared': 0.9322,
-    'adj_r_squared': 0.9273,
-    'mae': 4.38,
-    'rmse': 5.65,
-    'n': 506,
-    # Overall accuracy ranges
-    'accuracy_ranges': [
-        {'range': 5, 'percentage': 58.7},
-        {'range': 7.5, 'percentage': 76.48},
-        {'range': 10, 'percentage': 89.33},
-        {'range': 20, 'percentage': 100.0},
-        {'range': 25, 'percentage': 100.0}
-    ]
-}
-
-# DevT-specific accuracy data
-DEVT_ACCURACY = {
-    'Elite': {
-        'n': 11,
-        'mae': 8.62,
-        'ranges': [
-            {'range': 5, 'percentage': 27.3},
-            {'range': 10, 'percentage': 63.6},
-            {'range': 15, 'percentage': 90.9}
-        ]
-    },
-    'Impact': {
-        'n': 250,
-        'mae': 4.05,
-        'ranges': [
-            {'range': 5, 'percentage': 68.8},
-            {'range': 10, 'percentage': 94.8},
-            {'range': 15, 'percentage': 99.2}
-        ]
-    },
-    'Normal': {
-        'n': 116,
-        'mae': 5.5,
-        'ranges': [
-            {'range': 5, 'percentage': 51.7},
-            {'range': 10, 'percentage': 82.8},
-            {'range': 15, 'percentage': 99.1}
-        ]
-    },
-    'Star': {
-        'n': 129,
-        'mae': 5.39,
-        'ranges': [
-            {'range': 5, 'percentage': 48.1},
-            {'range': 10, 'percentage': 86.8},
-            {'range': 15, 'percentage': 97.7}
-        ]
-    }
-}
-
 class SkillPointsPredictor:
     def __init__(self, root):
         self.root = root
         self.root.title("NCAA 26 Skill Points Predictor")
         self.root.geometry("600x700")  # Shorter window to force scrolling
         self.root.resizable(False, False)
+        self.model = MODEL_STORE.get()
         
         # Configure style
         style = ttk.Style()
@@ -173,9 +75,8 @@ class SkillPointsPredictor:
         title.grid(row=0, column=0, columnspan=2, pady=(0, 5))
         
         # Subtitle with version
-        subtitle = tk.Label(main_frame, text=f"v2.1 | Clean Model (R² = {MODEL_STATS['r_squared']:.4f}, MAE = {MODEL_STATS['mae']:.2f})", 
-                           font=('Arial', 8), fg='#7f8c8d')
-        subtitle.grid(row=1, column=0, columnspan=2, pady=(0, 8))
+        self.subtitle = tk.Label(main_frame, text="", font=('Arial', 8), fg='#7f8c8d')
+        self.subtitle.grid(row=1, column=0, columnspan=2, pady=(0, 8))
         
         self.entries = {}
         row_num = 2
@@ -191,10 +92,10 @@ class SkillPointsPredictor:
             row=row_num, column=0, padx=5, pady=2, sticky='w')
         self.position_var = tk.StringVar()
         self.position_var.set("QB")
-        position_dropdown = ttk.Combobox(main_frame, textvariable=self.position_var, 
-                                        values=list(position_coeffs.keys()), 
+        self.position_dropdown = ttk.Combobox(main_frame, textvariable=self.position_var, 
+                                        values=list(self.model.position_coeffs.keys()), 
                                         state='readonly', width=25)
-        position_dropdown.grid(row=row_num, column=1, padx=5, pady=2, sticky='w')
+        self.position_dropdown.grid(row=row_num, column=1, padx=5, pady=2, sticky='w')
         row_num += 1
         
         # Year dropdown
@@ -202,10 +103,10 @@ class SkillPointsPredictor:
             row=row_num, column=0, padx=5, pady=2, sticky='w')
         self.year_var = tk.StringVar()
         self.year_var.set("FR")
-        year_dropdown = ttk.Combobox(main_frame, textvariable=self.year_var, 
-                                    values=list(year_coeffs.keys()), 
+        self.year_dropdown = ttk.Combobox(main_frame, textvariable=self.year_var, 
+                                    values=list(self.model.year_coeffs.keys()), 
                                     state='readonly', width=25)
-        year_dropdown.grid(row=row_num, column=1, padx=5, pady=2, sticky='w')
+        self.year_dropdown.grid(row=row_num, column=1, padx=5, pady=2, sticky='w')
         row_num += 1
         
         # Developer Trait dropdown
@@ -213,10 +114,10 @@ class SkillPointsPredictor:
             row=row_num, column=0, padx=5, pady=2, sticky='w')
         self.dev_var = tk.StringVar()
         self.dev_var.set("Normal")
-        dev_dropdown = ttk.Combobox(main_frame, textvariable=self.dev_var, 
-                                    values=list(dev_trait_coeffs.keys()), 
+        self.dev_dropdown = ttk.Combobox(main_frame, textvariable=self.dev_var, 
+                                    values=list(self.model.dev_trait_coeffs.keys()), 
                                     state='readonly', width=25)
-        dev_dropdown.grid(row=row_num, column=1, padx=5, pady=2, sticky='w')
+        self.dev_dropdown.grid(row=row_num, column=1, padx=5, pady=2, sticky='w')
         row_num += 1
         
         # XP Penalty Section
@@ -269,6 +170,14 @@ class SkillPointsPredictor:
                              padx=15, pady=8, relief=tk.RAISED, cursor='hand2')
         reset_btn.grid(row=0, column=1, padx=5)
         
+        # Roster grid button
+        roster_btn = tk.Button(button_frame, text="Roster Grid", 
+                              command=self.open_roster_grid,
+                              bg='#8e44ad', fg='white', font=('Arial', 11, 'bold'),
+                              padx=15, pady=8, relief=tk.RAISED, cursor='hand2')
+        roster_btn.grid(row=0, column=2, padx=5)
+        self.roster_grid = None
+        
         # Result display
         self.result_frame = ttk.Frame(main_frame, relief=tk.SOLID, borderwidth=2)
         self.result_frame.grid(row=row_num+1, column=0, columnspan=2, pady=6, sticky='ew')
@@ -290,55 +199,85 @@ class SkillPointsPredictor:
         self.ci_label.pack(anchor='w')
         
         # Info label
-        info_text = f"59% of predictions within ±5 points | 89% within ±10 points"
-        info_label = tk.Label(main_frame, text=info_text, 
-                             font=('Arial', 8), fg='#7f8c8d')
-        info_label.grid(row=row_num+3, column=0, columnspan=2, pady=(8, 0))
+        self.info_label = tk.Label(main_frame, text="", font=('Arial', 8), fg='#7f8c8d')
+        self.info_label.grid(row=row_num+3, column=0, columnspan=2, pady=(8, 0))
+        
+        self.show_model_info()
+        self.root.after(MODEL_POLL_MS, self.poll_model)
+    
+    def show_model_info(self):
+        """Refresh the labels and dropdowns that depend on the loaded model"""
+        stats = self.model.model_stats
+        self.subtitle.config(text=f"v{self.model.version} | {self.model.name} (R² = {stats['r_squared']:.4f}, MAE = {stats['mae']:.2f})")
+        self.info_label.config(text=self.model.accuracy_summary())
+        self.position_dropdown.config(values=list(self.model.position_coeffs.keys()))
+        self.year_dropdown.config(values=list(self.model.year_coeffs.keys()))
+        self.dev_dropdown.config(values=list(self.model.dev_trait_coeffs.keys()))
+    
+    def poll_model(self):
+        """Pick up a changed model artifact without restarting the app"""
+        model = MODEL_STORE.get()
+        if model is not self.model:
+            self.model = model
+            self.show_model_info()
+            if self.roster_grid is not None:
+                self.roster_grid.set_model(model)
+        self.root.after(MODEL_POLL_MS, self.poll_model)
+    
+    def open_roster_grid(self):
+        """Open (or raise) the roster grid window"""
+        if self.roster_grid is not None and self.roster_grid.root.winfo_exists():
+            self.roster_grid.root.lift()
+            return
+        window = tk.Toplevel(self.root)
+        from NCAARosterGrid import RosterGrid
+        
+        self.roster_grid = RosterGrid(window, self.model, variable_labels)
+        window.protocol("WM_DELETE_WINDOW", self.close_roster_grid)
+    
+    def close_roster_grid(self):
+        self.roster_grid.root.destroy()
+        self.roster_grid = None
     
     def predict_skill(self):
         try:
-            # Start with intercept
-            prediction = coefficients['Intercept']
-            
-            # Add position effect
+            model = self.model
             position = self.position_var.get()
-            prediction += position_coeffs[position]
-            
-            # Add year effect
             year = self.year_var.get()
-            prediction += year_coeffs[year]
-            
-            # Add developer trait effect
             dev_trait = self.dev_var.get()
-            prediction += dev_trait_coeffs[dev_trait]
-            
-            # Get XP penalty and add its effect
             xp_penalty = float(self.xp_entry.get())
-            prediction += coefficients['XP_Penalty'] * xp_penalty
-            
-            # Add coaching traits
-            for var, var_option in self.entries.items():
-                val = binary_map[var_option.get()]
-                prediction += coefficients[var] * val
+            coaching_abilities = {var: binary_map[var_option.get()] for var, var_option in self.entries.items()}
+            with timed("predict"):
+                prediction = model.engine.predict(position, year, dev_trait, xp_penalty, coaching_abilities)
             
             # Display main prediction
             result_text = f"Predicted: {prediction:.1f} skill points"
             self.result_label.config(text=result_text, fg='#27ae60')
             
-            # Get DevT-specific accuracy data
-            devt_stats = DEVT_ACCURACY[dev_trait]
-            
-            # Display DevT-specific accuracy ranges
-            ci_text = f"Accuracy for {dev_trait} players (based on {devt_stats['n']} players):\n"
-            ci_text += f"Typical error: ±{devt_stats['mae']:.1f} points\n\n"
+            intervals = model.interval(position, year, dev_trait, prediction)
             
-            for acc in devt_stats['ranges']:
-                range_val = acc['range']
-                pct = acc['percentage']
-                lower = max(0, prediction - range_val)
-                upper = prediction + range_val
+            if intervals:
+                # Bootstrap intervals for this position / year / DevT cell
+                ci_text = f"Prediction intervals for a {year} {dev_trait} {position}\n"
+                ci_text += f"(bootstrapped from {model.intervals.n_boot} model refits):\n\n"
                 
-                ci_text += f"±{int(range_val)} points ({pct:.1f}% of the time): {lower:.1f} - {upper:.1f}\n"
+                for level, lower, upper in intervals:
+                    ci_text += f"{level:.0%} of the time: {lower:.1f} - {upper:.1f}\n"
+            else:
+                # Get DevT-specific accuracy data
+                devt_stats = model.devt_accuracy[dev_trait]
+                
+                # Display DevT-specific accuracy ranges
+                ci_text = f"Accuracy for {dev_trait} players (based on {devt_stats['n']} players):\n"
+                ci_text += f"Typical error: ±{devt_stats['mae']:.1f} points\n\n"
+                
+                for acc in devt_stats['ranges']:
+                    range_val = acc['range']
+                    pct = acc['percentage']
+                    lower = max(0, prediction - range_val)
+                    upper = prediction + range_val
+                    
+                    ci_text += f"±{int(range_val)} points ({pct:.1f}% of the time): {lower:.1f} - {upper:.1f}\n"
             
             self.ci_label.config(text=ci_text.strip())
             
@@ -352,16 +291,26 @@ class SkillPointsPredictor:
     
     def show_breakdown(self, total, position, year, dev_trait, xp_penalty):
         """Show detailed breakdown of prediction"""
+        model = self.model
         breakdown = f"\n--- Prediction Breakdown ---\n"
-        breakdown += f"Base: {coefficients['Intercept']:.2f}\n"
-        breakdown += f"Position ({position}): {position_coeffs[position]:+.2f}\n"
-        breakdown += f"Year ({year}): {year_coeffs[year]:+.2f}\n"
-        breakdown += f"Dev Trait ({dev_trait}): {dev_trait_coeffs[dev_trait]:+.2f}\n"
-        breakdown += f"XP Penalty: {coefficients['XP_Penalty'] * xp_penalty:+.2f}\n"
+        breakdown += f"Base: {model.coefficients['Intercept']:.2f}\n"
+        breakdown += f"Position ({position}): {model.position_coeffs[position]:+.2f}\n"
+        breakdown += f"Year ({year}): {model.year_coeffs[year]:+.2f}\n"
+        breakdown += f"Dev Trait ({dev_trait}): {model.dev_trait_coeffs[dev_trait]:+.2f}\n"
+        breakdown += f"XP Penalty: {model.coefficients['XP_Penalty'] * xp_penalty:+.2f}\n"
         
-        traits_sum = sum(coefficients[var] * binary_map[var_option.get()] 
+        traits_sum = sum(model.coefficients[var] * binary_map[var_option.get()] 
                         for var, var_option in self.entries.items())
         breakdown += f"Coaching Traits: {traits_sum:+.2f}\n"
+        
+        engine = model.engine
+        if engine.interactions:
+            # Interaction terms (e.g. HC_TD3:DevT from NCAAModelSearch) are the rest of the total
+            player = {'position': position, 'year': year, 'dev_trait': dev_trait, 'xp_penalty': xp_penalty}
+            player.update((var, binary_map[var_option.get()]) for var, var_option in self.entries.items())
+            start = engine.interaction_offset
+            interactions = float(engine.design_matrix([player])[0, start:] @ engine.beta[start:])
+            breakdown += f"Interactions: {interactions:+.2f}\n"
         breakdown += f"\nTotal: {total:.2f} points"
         
         print(breakdown)
@@ -380,6 +329,7 @@ class SkillPointsPredictor:
 
 # Run the application
 if __name__ == "__main__":
+    start_exporters()
     root = tk.Tk()
     app = SkillPointsPredictor(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,414 @@
+import csv
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+import numpy as np
+
+VISIBLE_ROWS = 25
+DEBOUNCE_MS = 40
+
+CATEGORY_FIELDS = {'position': 'positions', 'year': 'years', 'dev_trait': 'dev_traits'}
+
+
+class Roster:
+    """Roster state as NumPy columns with incrementally maintained predictions
+
+    Each player's prediction is split into the part that only depends on the
+    player (base cell + XP penalty) and the coaching lookup (plus the model's
+    coaching x category interactions, if any), so editing one
+    row recomputes one row and a roster-wide coaching change is one
+    vectorized pass over the masks.
+    """
+
+    def __init__(self, model, players=()):
+        self.model = model
+        self.names = []
+        self.codes = {field: np.zeros(0, dtype=np.intp) for field in CATEGORY_FIELDS}
+        self.masks = np.zeros(0, dtype=np.int64)
+        self.xp = np.zeros(0)
+        self.fixed = np.zeros(0)
+        self.predictions = np.zeros(0)
+        self.extend(players)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def engine(self):
+        return self.model.engine
+
+    def _labels(self, field):
+        return getattr(self.engine, CATEGORY_FIELDS[field])
+
+    def _code(self, field, label):
+        index = getattr(self.engine, f"{field}_index")
+        return index.get(str(label).strip(), -1)
+
+    def _score(self, rows):
+        """Recompute the player-dependent part and prediction for rows (index array or slice)"""
+        table = self.engine.table
+        valid = (self.codes['position'][rows] >= 0) & (self.codes['year'][rows] >= 0) & (
+            self.codes['dev_trait'][rows] >= 0)
+        cells = table.pack(self.codes['position'][rows], self.codes['year'][rows],
+                           self.codes['dev_trait'][rows], 0)
+        fixed = table.base[np.where(valid, cells, 0)] + table.xp_coef * self.xp[rows]
+        self.fixed[rows] = np.where(valid, fixed, np.nan)
+        self._predict(rows)
+
+    def _predict(self, rows):
+        table = self.engine.table
+        predictions = self.fixed[rows] + table.coaching[self.masks[rows]]
+        if table.cross_bits.size:
+            cells = table.pack(*(np.maximum(self.codes[field][rows], 0) for field in CATEGORY_FIELDS), 0)
+            predictions = predictions + table.cross(cells, self.masks[rows])
+        if self.engine.floor is not None:
+            predictions = np.maximum(predictions, self.engine.floor)
+        self.predictions[rows] = predictions
+
+    def append(self, player):
+        """Add a player dict in the web app layout; returns its row"""
+        self.extend([player])
+        return len(self.names) - 1
+
+    def extend(self, players):
+        """Add player dicts in the web app layout with one concatenation per column
+
+        Every player is encoded before the roster changes, so a bad value
+        leaves the roster as it was.
+        """
+        players = list(players)
+        start = len(self.names)
+        names = [str(player.get('player_name', f"Player {start + i + 1}")) for i, player in enumerate(players)]
+        codes = {
+            field: np.array([self._code(field, player.get(field, '')) for player in players], dtype=np.intp)
+            for field in CATEGORY_FIELDS
+        }
+        masks = np.zeros(len(players), dtype=np.int64)
+        for bit, var in enumerate(self.engine.coaching_vars):
+            flags = np.array([float(player.get(var) or 0) for player in players], dtype=np.float64)
+            masks |= (flags != 0).astype(np.int64) << bit
+        xp = np.array([float(player.get('xp_penalty') or 0) for player in players], dtype=np.float64)
+
+        self.names.extend(names)
+        for field in CATEGORY_FIELDS:
+            self.codes[field] = np.concatenate([self.codes[field], codes[field]])
+        self.masks = np.concatenate([self.masks, masks])
+        self.xp = np.concatenate([self.xp, xp])
+        self.fixed = np.concatenate([self.fixed, np.zeros(len(players))])
+        self.predictions = np.concatenate([self.predictions, np.zeros(len(players))])
+        self._score(slice(start, len(self.names)))
+
+    def delete(self, row):
+        del self.names[row]
+        for field in CATEGORY_FIELDS:
+            self.codes[field] = np.delete(self.codes[field], row)
+        for name in ('masks', 'xp', 'fixed', 'predictions'):
+            setattr(self, name, np.delete(getattr(self, name), row))
+
+    def set_field(self, row, field, value):
+        """Edit name, position, year, dev_trait or xp_penalty of one player"""
+        if field == 'player_name':
+            self.names[row] = value
+            return
+        if field == 'xp_penalty':
+            self.xp[row] = float(value)
+        else:
+            code = self._code(field, value)
+            if code < 0:
+                raise KeyError(f"Unknown {field}: {value!r}")
+            self.codes[field][row] = code
+        self._score(slice(row, row + 1))
+
+    def has_ability(self, row, var):
+        return bool(self.masks[row] >> self.engine.coaching_vars.index(var) & 1)
+
+    def set_ability(self, row, var, on):
+        """Set one coaching flag for one player"""
+        bit = 1 << self.engine.coaching_vars.index(var)
+        self.masks[row] = self.masks[row] | bit if on else self.masks[row] & ~bit
+        self._predict(slice(row, row + 1))
+
+    def set_ability_all(self, var, on):
+        """Set one coaching flag for the whole roster in a single pass"""
+        bit = 1 << self.engine.coaching_vars.index(var)
+        self.masks = self.masks | bit if on else self.masks & ~bit
+        self._predict(slice(None))
+
+    def set_model(self, model):
+        """Re-encode every player for a new model and rescore"""
+        labels = {field: self._labels(field) for field in CATEGORY_FIELDS}
+        old_vars = self.engine.coaching_vars
+        self.model = model
+        for field, codes in self.codes.items():
+            self.codes[field] = np.array([
+                self._code(field, labels[field][c]) if c >= 0 else -1 for c in codes.tolist()
+            ], dtype=np.intp)
+        masks = np.zeros_like(self.masks)
+        for bit, var in enumerate(self.engine.coaching_vars):
+            if var in old_vars:
+                masks |= (self.masks >> old_vars.index(var) & 1) << bit
+        self.masks = masks
+        self._score(slice(None))
+
+    def player(self, row):
+        """Player dict in the web app layout"""
+        player = {'player_name': self.names[row]}
+        for field, codes in self.codes.items():
+            code = codes[row]
+            player[field] = self._labels(field)[code] if code >= 0 else ''
+        for bit, var in enumerate(self.engine.coaching_vars):
+            player[var] = int(self.masks[row] >> bit & 1)
+        player['xp_penalty'] = float(self.xp[row])
+        return player
+
+    def load_csv(self, path):
+        """Add the players of a CSV file; nothing is added when any row fails to parse"""
+        with open(path, newline='') as f:
+            players = list(csv.DictReader(f))
+        self.extend(players)
+
+    def save_csv(self, path):
+        fields = ['player_name', 'position', 'year', 'dev_trait'] + self.engine.coaching_vars + [
+            'xp_penalty', 'predicted_skill_points']
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fields)
+            writer.writeheader()
+            for row in range(len(self)):
+                player = self.player(row)
+                player['predicted_skill_points'] = round(float(self.predictions[row]), 2)
+                writer.writerow(player)
+
+
+class RosterGrid:
+    """Editable roster table for the desktop predictor
+
+    The Treeview only ever holds VISIBLE_ROWS items; scrolling moves a
+    window over the Roster arrays and refills those items, so the widget
+    cost does not grow with the roster. Edits mark rows dirty and the
+    visible ones are redrawn once per DEBOUNCE_MS.
+    """
+
+    def __init__(self, root, model, labels):
+        self.root = root
+        self.root.title("NCAA 26 Roster Grid")
+        self.roster = Roster(model)
+        self.labels = labels
+        self.offset = 0
+        self._dirty = None
+        self._refresh_job = None
+        self._editor = None
+
+        toolbar = ttk.Frame(root, padding=5)
+        toolbar.pack(fill='x')
+        for text, command in [("Load CSV", self.load), ("Save CSV", self.save),
+                              ("Add Player", self.add_player), ("Delete Player", self.delete_player)]:
+            ttk.Button(toolbar, text=text, command=command).pack(side='left', padx=2)
+        self.total_label = tk.Label(toolbar, text="", font=('Arial', 10, 'bold'), fg='#27ae60')
+        self.total_label.pack(side='right', padx=5)
+
+        # Roster-wide staff toggles
+        self.staff_frame = ttk.LabelFrame(root, text="Coaching staff (whole roster)", padding=5)
+        self.staff_frame.pack(fill='x', padx=5)
+        self.staff_vars = {}
+        self.build_staff_toggles()
+
+        table = ttk.Frame(root)
+        table.pack(fill='both', expand=True, padx=5, pady=5)
+        self.tree = ttk.Treeview(table, show='headings', height=VISIBLE_ROWS, selectmode='browse')
+        self.scrollbar = ttk.Scrollbar(table, orient='vertical', command=self.on_scroll)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+        for k in range(VISIBLE_ROWS):
+            self.tree.insert('', 'end', iid=str(k), values=())
+        self.build_columns()
+
+        self.tree.bind('<Button-1>', self.on_click)
+        self.tree.bind('<Double-1>', self.on_double_click)
+        self.tree.bind('<MouseWheel>', lambda e: self.on_scroll('scroll', -int(e.delta / 120), 'units'))
+        self.tree.bind('<Button-4>', lambda e: self.on_scroll('scroll', -1, 'units'))
+        self.tree.bind('<Button-5>', lambda e: self.on_scroll('scroll', 1, 'units'))
+        self.render()
+
+    def build_columns(self):
+        engine = self.roster.engine
+        self.columns = ['player_name', 'position', 'year', 'dev_trait', 'xp_penalty'] + engine.coaching_vars + [
+            'prediction']
+        headings = {'player_name': 'Player', 'position': 'Pos', 'year': 'Year', 'dev_trait': 'DevT',
+                    'xp_penalty': 'XP', 'prediction': 'Predicted'}
+        self.tree.config(columns=self.columns)
+        for column in self.columns:
+            self.tree.heading(column, text=headings.get(column, column))
+            width = 140 if column == 'player_name' else 70 if column in headings else 62
+            self.tree.column(column, width=width, anchor='w' if column == 'player_name' else 'center',
+                             stretch=column == 'player_name')
+
+    def build_staff_toggles(self):
+        for child in self.staff_frame.winfo_children():
+            child.destroy()
+        self.staff_vars = {}
+        for i, var in enumerate(self.roster.engine.coaching_vars):
+            flag = tk.BooleanVar(value=len(self.roster) > 0 and bool((self.roster.masks >> i & 1).all()))
+            ttk.Checkbutton(self.staff_frame, text=self.labels.get(var, var), variable=flag,
+                            command=lambda v=var, f=flag: self.toggle_staff(v, f.get())
+                            ).grid(row=i // 4, column=i % 4, sticky='w', padx=4)
+            self.staff_vars[var] = flag
+
+    def set_model(self, model):
+        """Switch to a reloaded model artifact"""
+        self.close_editor()
+        self.roster.set_model(model)
+        self.build_columns()
+        self.build_staff_toggles()
+        self.mark_dirty(None)
+
+    # ===== Rendering =====
+
+    def row_values(self, row):
+        roster = self.roster
+        player = roster.player(row)
+        prediction = roster.predictions[row]
+        values = [player['player_name'], player['position'], player['year'], player['dev_trait'],
+                  f"{player['xp_penalty']:g}"]
+        values += ["✓" if player[var] else "" for var in roster.engine.coaching_vars]
+        values.append("?" if np.isnan(prediction) else f"{prediction:.1f}")
+        return values
+
+    def mark_dirty(self, rows):
+        """Queue rows (None for all) for the next debounced redraw"""
+        if rows is None:
+            self._dirty = None
+        elif self._dirty is not None:
+            self._dirty.update(rows)
+        if self._refresh_job is None:
+            self._refresh_job = self.root.after(DEBOUNCE_MS, self.render)
+
+    def render(self):
+        self._refresh_job = None
+        n = len(self.roster)
+        self.offset = max(0, min(self.offset, n - VISIBLE_ROWS))
+        window = range(self.offset, self.offset + VISIBLE_ROWS)
+        rows = window if self._dirty is None else sorted(r for r in self._dirty if r in window)
+        for row in rows:
+            self.tree.item(str(row - self.offset), values=self.row_values(row) if row < n else ())
+        self._dirty = set()
+
+        if n:
+            self.scrollbar.set(self.offset / n, min(1.0, (self.offset + VISIBLE_ROWS) / n))
+            predictions = self.roster.predictions
+            self.total_label.config(text=f"Roster total: {np.nansum(predictions):.1f} pts | "
+                                         f"Avg: {np.nanmean(predictions) if n else 0:.1f} | Players: {n}")
+        else:
+            self.scrollbar.set(0, 1)
+            self.total_label.config(text="Players: 0")
+
+    def on_scroll(self, action, amount=None, unit=None):
+        n = len(self.roster)
+        if action == 'moveto':
+            offset = int(float(amount) * n)
+        else:
+            step = VISIBLE_ROWS if unit == 'pages' else 1
+            offset = self.offset + int(amount) * step
+        offset = max(0, min(offset, n - VISIBLE_ROWS))
+        if offset != self.offset:
+            self.close_editor()
+            self.offset = offset
+            self.mark_dirty(None)
+
+    # ===== Editing =====
+
+    def cell_at(self, event):
+        item = self.tree.identify_row(event.y)
+        column = self.tree.identify_column(event.x)
+        if not item or not column:
+            return None, None
+        row = self.offset + int(item)
+        if row >= len(self.roster):
+            return None, None
+        return row, self.columns[int(column[1:]) - 1]
+
+    def on_click(self, event):
+        row, column = self.cell_at(event)
+        if row is not None and column in self.roster.engine.coaching_vars:
+            self.roster.set_ability(row, column, not self.roster.has_ability(row, column))
+            self.mark_dirty([row])
+
+    def on_double_click(self, event):
+        row, column = self.cell_at(event)
+        if row is None or column in self.roster.engine.coaching_vars or column == 'prediction':
+            return
+        self.close_editor()
+        bbox = self.tree.bbox(str(row - self.offset), column)
+        if not bbox:
+            return
+        current = self.roster.player(row)[column]
+        value = tk.StringVar(value=f"{current:g}" if column == 'xp_penalty' else current)
+        if column in CATEGORY_FIELDS:
+            editor = ttk.Combobox(self.tree, textvariable=value, state='readonly',
+                                  values=list(getattr(self.roster.engine, CATEGORY_FIELDS[column])))
+            editor.bind('<<ComboboxSelected>>', lambda e: self.commit_edit(row, column, value.get()))
+        else:
+            editor = ttk.Entry(self.tree, textvariable=value)
+            editor.select_range(0, tk.END)
+            editor.bind('<Return>', lambda e: self.commit_edit(row, column, value.get()))
+            editor.bind('<FocusOut>', lambda e: self.commit_edit(row, column, value.get()))
+        editor.bind('<Escape>', lambda e: self.close_editor())
+        editor.place(x=bbox[0], y=bbox[1], width=bbox[2], height=bbox[3])
+        editor.focus_set()
+        self._editor = editor
+
+    def commit_edit(self, row, column, value):
+        if self._editor is None:
+            return
+        self.close_editor()
+        try:
+            self.roster.set_field(row, column, value)
+        except (KeyError, ValueError):
+            messagebox.showerror("Input Error", f"Invalid {column}: {value}")
+            return
+        self.mark_dirty([row])
+
+    def close_editor(self):
+        if self._editor is not None:
+            editor, self._editor = self._editor, None
+            editor.destroy()
+
+    def toggle_staff(self, var, on):
+        self.roster.set_ability_all(var, on)
+        self.mark_dirty(None)
+
+    # ===== Roster management =====
+
+    def add_player(self):
+        engine = self.roster.engine
+        row = self.roster.append({'position': engine.positions[0], 'year': engine.years[0],
+                                  'dev_trait': engine.dev_traits[-1], 'xp_penalty': 0,
+                                  **{var: flag.get() for var, flag in self.staff_vars.items()}})
+        self.offset = max(0, row - VISIBLE_ROWS + 1)
+        self.mark_dirty(None)
+
+    def delete_player(self):
+        selected = self.tree.selection()
+        if not selected:
+            return
+        row = self.offset + int(selected[0])
+        if row < len(self.roster):
+            self.close_editor()
+            self.roster.delete(row)
+            self.mark_dirty(None)
+
+    def load(self):
+        path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
+        if not path:
+            return
+        try:
+            self.roster.load_csv(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Load Error", str(e))
+            return
+        self.build_staff_toggles()
+        self.mark_dirty(None)
+
+    def save(self):
+        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+        if path:
+            self.roster.save_csv(path)
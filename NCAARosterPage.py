@@ -0,0 +1,168 @@
+"""Roster mode for the web app: an editable multi-player table with cached predictions
+
+Rows are scored through the served model's engine in one batch, and only
+rows whose scored inputs changed since the last rerun are rescored (the
+cache is keyed on a hash of those inputs and dropped when the model
+changes). The actual results of a whole roster are submitted in one go.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+INPUT_COLUMNS = ['team', 'player_name', 'position', 'year', 'dev_trait', 'snaps', 'xp_penalty']
+SCORED_COLUMNS = ['position', 'year', 'dev_trait', 'xp_penalty']
+
+
+def empty_roster(coaching_vars):
+    columns = INPUT_COLUMNS + list(coaching_vars) + ['actual']
+    return pd.DataFrame({column: pd.Series(dtype='object') for column in columns})
+
+
+def parse_roster(text, coaching_vars):
+    """Roster DataFrame from pasted or uploaded CSV/TSV text in the save_complete_data layout"""
+    sep = '\t' if '\t' in text.splitlines()[0] else ','
+    frame = pd.read_csv(io.StringIO(text), sep=sep)
+    frame.columns = [str(c).strip() for c in frame.columns]
+    roster = empty_roster(coaching_vars)
+    for column in roster.columns:
+        if column in frame:
+            roster[column] = frame[column]
+    for column in ['team', 'player_name', 'position', 'year', 'dev_trait']:
+        roster[column] = roster[column].fillna('').astype(str).str.strip()
+    roster['snaps'] = pd.to_numeric(roster['snaps'], errors='coerce').fillna(0).astype(int)
+    roster['xp_penalty'] = pd.to_numeric(roster['xp_penalty'], errors='coerce').fillna(0).astype(int)
+    for var in coaching_vars:
+        roster[var] = pd.to_numeric(roster[var], errors='coerce').fillna(0).astype(bool)
+    roster['actual'] = pd.to_numeric(roster['actual'], errors='coerce')
+    return roster
+
+
+def row_hashes(roster, coaching_vars):
+    """One hash per row over the inputs that change its prediction"""
+    return pd.util.hash_pandas_object(roster[SCORED_COLUMNS + list(coaching_vars)], index=False).to_numpy()
+
+
+def cached_predictions(model, roster):
+    """Predictions for every row, scoring only rows whose inputs are new since the last run
+
+    The cache lives in session state keyed by row hash and is dropped when
+    the served model changes.
+    """
+    engine = model.engine
+    cache = st.session_state.get('roster_cache')
+    if cache is None or cache['engine'] is not engine:
+        cache = st.session_state['roster_cache'] = {'engine': engine, 'predictions': {}}
+    known = cache['predictions']
+
+    hashes = row_hashes(roster, engine.coaching_vars)
+    predictions = np.array([known.get(h, np.nan) for h in hashes.tolist()])
+    missing = np.flatnonzero(np.isnan(predictions))
+    if missing.size:
+        rows = roster.iloc[missing]
+        valid = (rows['position'].isin(engine.position_index) & rows['year'].isin(engine.year_index)
+                 & rows['dev_trait'].isin(engine.dev_trait_index)).to_numpy()
+        if valid.any():
+            scored = engine.predict_batch(rows[valid].assign(
+                xp_penalty=pd.to_numeric(rows['xp_penalty'][valid], errors='coerce').fillna(0)))
+            predictions[missing[valid]] = scored
+            known.update(zip(hashes[missing[valid]].tolist(), scored.tolist()))
+    return predictions, int(missing.size)
+
+
+def roster_page(model, save_roster):
+    """Editable multi-player roster with cached per-row predictions and bulk submission
+
+    save_roster(players, actual_points) writes the actual results for a list
+    of player dicts in one go and returns True on success.
+    """
+    engine = model.engine
+    coaching_vars = engine.coaching_vars
+
+    st.subheader("Roster")
+    st.write("Upload or paste a roster (CSV or tab-separated, e.g. copied from a spreadsheet) with columns "
+             f"`{', '.join(INPUT_COLUMNS)}`, the coach ability columns (`{coaching_vars[0]}` ... "
+             f"`{coaching_vars[-1]}`, 1/0) and optionally `actual`.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        uploaded = st.file_uploader("Upload roster CSV", type=['csv', 'tsv', 'txt'])
+    with col2:
+        pasted = st.text_area("...or paste it here", height=100)
+
+    source = None
+    if uploaded is not None:
+        source = ('upload', uploaded.name, uploaded.size)
+    elif pasted.strip():
+        source = ('paste', hash(pasted))
+    if source is not None and source != st.session_state.get('roster_source'):
+        try:
+            text = uploaded.getvalue().decode('utf-8') if uploaded is not None else pasted
+            st.session_state.roster = parse_roster(text, coaching_vars)
+            st.session_state.roster_source = source
+            # A fresh editor key so edits made to the previous roster are not replayed onto this one
+            st.session_state.roster_version = st.session_state.get('roster_version', 0) + 1
+        except Exception as e:
+            st.error(f"Could not read roster: {e}")
+    if 'roster' not in st.session_state:
+        st.session_state.roster = empty_roster(coaching_vars)
+
+    column_config = {
+        'position': st.column_config.SelectboxColumn("Position", options=engine.positions, required=True),
+        'year': st.column_config.SelectboxColumn("Year", options=engine.years, required=True),
+        'dev_trait': st.column_config.SelectboxColumn("DevT", options=engine.dev_traits, required=True),
+        'xp_penalty': st.column_config.NumberColumn("XP Penalty", min_value=0, max_value=100, step=1),
+        'snaps': st.column_config.NumberColumn("Snaps", min_value=0, max_value=2000, step=1),
+        'actual': st.column_config.NumberColumn("Actual", min_value=0, max_value=200, step=1,
+                                                help="Skill points from the Training Results screen"),
+    }
+    for var in coaching_vars:
+        column_config[var] = st.column_config.CheckboxColumn(var, default=False)
+
+    roster = st.data_editor(st.session_state.roster, num_rows="dynamic", column_config=column_config,
+                            use_container_width=True, hide_index=True,
+                            key=f"roster_editor_{st.session_state.get('roster_version', 0)}")
+    for var in coaching_vars:
+        roster[var] = roster[var].fillna(False).astype(bool)
+
+    if roster.empty:
+        return
+
+    predictions, rescored = cached_predictions(model, roster)
+    results = roster[['team', 'player_name', 'position', 'year', 'dev_trait']].copy()
+    results['predicted'] = predictions.round(1)
+    results['actual'] = roster['actual']
+    results['error'] = (results['actual'] - results['predicted']).round(1)
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Players", len(roster))
+    col2.metric("Roster total", f"{np.nansum(predictions):.0f} pts")
+    col3.metric("Rescored this run", rescored)
+    st.dataframe(results, use_container_width=True, hide_index=True)
+    if np.isnan(predictions).any():
+        st.warning("Rows with a missing position, year or development trait are not scored")
+
+    st.markdown("---")
+    with st.expander("📊 Submit actual results for the whole roster"):
+        actual = pd.to_numeric(roster['actual'], errors='coerce')
+        complete = actual.notna().to_numpy() & ~np.isnan(predictions)
+        st.write(f"{int(complete.sum())} of {len(roster)} players have an actual result entered.")
+        if st.button("Submit Roster Results", key="submit_roster", disabled=not complete.any()):
+            submitted = roster[complete].copy()
+            for column in ['team', 'player_name']:
+                submitted[column] = submitted[column].fillna('').astype(str).str.strip()
+            # Rows added in the editor leave blank numeric cells as NaN
+            for column in ['snaps', 'xp_penalty']:
+                submitted[column] = pd.to_numeric(submitted[column], errors='coerce').fillna(0).round().astype(int)
+            players = []
+            for _, row in submitted.iterrows():
+                player = {column: row[column] for column in INPUT_COLUMNS}
+                # Plain ints: the rows are logged as JSON
+                player.update({column: int(row[column]) for column in ['snaps', 'xp_penalty'] + list(coaching_vars)})
+                players.append(player)
+            actuals = actual[complete].round().astype(int).tolist()
+            if save_roster(players, actuals):
+                st.success(f"✅ Thank you! {len(players)} results queued for the database in one write.")
+            else:
+                st.error("Could not save to database")
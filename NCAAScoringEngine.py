@@ -0,0 +1,525 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+DEFAULT_MODEL_PATH = os.path.join(MODELS_DIR, "ncaa_v3.0.json")
+
+def load_artifact(path):
+    """Read a coefficient artifact written by NCAATraining.py"""
+    with open(path) as f:
+        return json.load(f)
+
+
+def intervals_path(artifact_path):
+    """Sidecar file holding bootstrap prediction intervals for an artifact"""
+    return os.path.splitext(artifact_path)[0] + '.intervals.npz'
+
+
+def _column(players, name, n=None, default=None):
+    """Pull one column out of a DataFrame, dict of columns or list of player dicts
+
+    When n is given a missing column is filled with the default instead of
+    raising, matching the scalar path where absent abilities count as 0.
+    """
+    if isinstance(players, (list, tuple)):
+        if n is None:
+            return [player[name] for player in players]
+        return [player.get(name, default) for player in players]
+    try:
+        return players[name]
+    except (KeyError, ValueError, IndexError):
+        if n is None:
+            raise KeyError(name)
+        return np.full(n, default)
+
+
+def _encode(values, index, label):
+    """Map category labels to integer codes, raising KeyError on unknown labels"""
+    values = np.asarray(values, dtype=object)
+    if values.size == 0:
+        return np.zeros(0, dtype=np.intp)
+    uniques, inverse = np.unique(values, return_inverse=True)
+    try:
+        lookup = np.array([index[u] for u in uniques], dtype=np.intp)
+    except KeyError as e:
+        raise KeyError(f"Unknown {label}: {e.args[0]!r}")
+    return lookup[inverse.reshape(-1)]
+
+
+def _flags(values, name):
+    """Coaching flags as a bool array, raising ValueError unless every value is 0 or 1
+
+    Values are compared as numbers, so the string '0' is off and a blank
+    (NaN, None or '') is an error rather than a truthy "has ability".
+    """
+    values = np.asarray(values).reshape(-1)
+    if values.dtype.kind == 'b':
+        return values
+    try:
+        numbers = values.astype(np.float64)
+    except (TypeError, ValueError):
+        numbers = None
+    if numbers is None or ((numbers != 0) & (numbers != 1)).any():
+        bad = [v for v in values.tolist() if not _is_flag(v)]
+        raise ValueError(f"{name} must be 0 or 1, got {bad[0]!r}")
+    return numbers == 1
+
+
+def _is_flag(value):
+    try:
+        return float(value) in (0, 1)
+    except (TypeError, ValueError):
+        return False
+
+
+class ScoringEngine:
+    """Vectorized scorer for the additive skill points regression
+
+    Every prediction is one row of a one-hot design matrix times the
+    coefficient vector, so a whole roster is scored with a single
+    matrix-vector product and a single player is just a roster of one.
+    interactions optionally maps 'A:B' names to coefficients, where each
+    side is a coaching variable or a category dummy (Position_QB, Year_FR,
+    DevT_Star), as NCAAModelSearch exports them.
+    """
+
+    def __init__(self, coefficients, position_coeffs, year_coeffs, dev_trait_coeffs, floor=0,
+                 interactions=None):
+        self.coefficients = coefficients
+        self.position_coeffs = position_coeffs
+        self.year_coeffs = year_coeffs
+        self.dev_trait_coeffs = dev_trait_coeffs
+        self.floor = floor
+        self.interactions = dict(interactions or {})
+
+        self.positions = list(position_coeffs)
+        self.years = list(year_coeffs)
+        self.dev_traits = list(dev_trait_coeffs)
+        self.coaching_vars = [var for var in coefficients if var not in ('Intercept', 'XP_Penalty')]
+        self.position_index = {p: i for i, p in enumerate(self.positions)}
+        self.year_index = {y: i for i, y in enumerate(self.years)}
+        self.dev_trait_index = {d: i for i, d in enumerate(self.dev_traits)}
+
+        # Design matrix layout: intercept | positions | years | dev traits | coaching | XP | interactions
+        self.columns = (
+            ['Intercept']
+            + [f'Position_{p}' for p in self.positions]
+            + [f'Year_{y}' for y in self.years]
+            + [f'DevT_{d}' for d in self.dev_traits]
+            + self.coaching_vars
+            + ['XP_Penalty']
+            + list(self.interactions)
+        )
+        self.position_offset = 1
+        self.year_offset = self.position_offset + len(self.positions)
+        self.dev_trait_offset = self.year_offset + len(self.years)
+        self.coaching_offset = self.dev_trait_offset + len(self.dev_traits)
+        self.xp_column = self.coaching_offset + len(self.coaching_vars)
+        self.interaction_offset = self.xp_column + 1
+        self.interaction_factors = [tuple(self._factor(f) for f in name.split(':')) for name in self.interactions]
+
+        self.beta = np.array(
+            [coefficients['Intercept']]
+            + [position_coeffs[p] for p in self.positions]
+            + [year_coeffs[y] for y in self.years]
+            + [dev_trait_coeffs[d] for d in self.dev_traits]
+            + [coefficients[var] for var in self.coaching_vars]
+            + [coefficients['XP_Penalty']]
+            + list(self.interactions.values()),
+            dtype=np.float64
+        )
+        self.table = PredictionTable(self)
+
+    def _factor(self, name):
+        """('coaching', bit) or (category, code) for one side of an interaction"""
+        if name in self.coaching_vars:
+            return 'coaching', self.coaching_vars.index(name)
+        for category, prefix, index in (('position', 'Position_', self.position_index),
+                                        ('year', 'Year_', self.year_index),
+                                        ('dev_trait', 'DevT_', self.dev_trait_index)):
+            if name.startswith(prefix) and name[len(prefix):] in index:
+                return category, index[name[len(prefix):]]
+        raise KeyError(f"Unknown interaction factor: {name!r}")
+
+    def _factor_column(self, factor):
+        category, code = factor
+        offsets = {'coaching': self.coaching_offset, 'position': self.position_offset,
+                   'year': self.year_offset, 'dev_trait': self.dev_trait_offset}
+        return offsets[category] + code
+
+    @classmethod
+    def from_artifact(cls, artifact, floor=0):
+        """Engine for a coefficient artifact (dict or path)"""
+        if isinstance(artifact, str):
+            artifact = load_artifact(artifact)
+        return cls(artifact['coefficients'], artifact['position_coeffs'], artifact['year_coeffs'],
+                   artifact['dev_trait_coeffs'], floor=floor, interactions=artifact.get('interactions'))
+
+    def encode(self, players):
+        """Encode a batch of players as category codes, coaching bitmasks and XP values"""
+        positions = _encode(_column(players, 'position'), self.position_index, 'position')
+        years = _encode(_column(players, 'year'), self.year_index, 'year')
+        dev_traits = _encode(_column(players, 'dev_trait'), self.dev_trait_index, 'development trait')
+        n = len(positions)
+        masks = np.zeros(n, dtype=np.int64)
+        for bit, var in enumerate(self.coaching_vars):
+            flags = _flags(_column(players, var, n, 0), var)
+            masks |= flags.astype(np.int64) << bit
+        xp = np.asarray(_column(players, 'xp_penalty'), dtype=np.float64).reshape(-1)
+        return positions, years, dev_traits, masks, xp
+
+    def design_matrix(self, players):
+        """Build the encoded design matrix for a batch of players"""
+        positions, years, dev_traits, masks, xp = self.encode(players)
+        n = len(positions)
+        rows = np.arange(n)
+
+        X = np.zeros((n, len(self.columns)), dtype=np.float64)
+        X[:, 0] = 1.0
+        X[rows, self.position_offset + positions] = 1.0
+        X[rows, self.year_offset + years] = 1.0
+        X[rows, self.dev_trait_offset + dev_traits] = 1.0
+        bits = np.arange(len(self.coaching_vars))
+        X[:, self.coaching_offset:self.xp_column] = (masks[:, None] >> bits) & 1
+        X[:, self.xp_column] = xp
+        for i, (a, b) in enumerate(self.interaction_factors):
+            X[:, self.interaction_offset + i] = X[:, self._factor_column(a)] * X[:, self._factor_column(b)]
+        return X
+
+    def predict_batch(self, players):
+        """Predict skill points for a batch of players with the floor applied"""
+        predictions = self.design_matrix(players) @ self.beta
+        if self.floor is not None:
+            np.maximum(predictions, self.floor, out=predictions)
+        return predictions
+
+    def predict(self, position, year, dev_trait, xp_penalty, coaching_abilities):
+        """Predict skill points for a single player
+
+        Reads the same coefficient vector through the precomputed tables, so
+        a one-off prediction skips building a design matrix.
+        """
+        key = self.table.encode_key(position, year, dev_trait, coaching_abilities)
+        return float(self.table.predict_keys(key, xp_penalty))
+
+    def predict_lookup(self, players):
+        """Predict a batch of players through the precomputed lookup tables"""
+        positions, years, dev_traits, masks, xp = self.encode(players)
+        keys = self.table.pack(positions, years, dev_traits, masks)
+        return self.table.predict_keys(keys, xp)
+
+    def predict_terms(self, players):
+        """Per-term contributions for a batch, as in the desktop app's breakdown
+
+        Returns arrays for base, position, year, dev_trait, coaching and
+        xp_penalty plus the floored total. A model with interactions adds an
+        interactions term for the ones involving a category; coaching x
+        coaching interactions are part of the coaching term.
+        """
+        positions, years, dev_traits, masks, xp = self.encode(players)
+        terms = {
+            'base': np.full(len(positions), self.beta[0]),
+            'position': self.beta[self.position_offset + positions],
+            'year': self.beta[self.year_offset + years],
+            'dev_trait': self.beta[self.dev_trait_offset + dev_traits],
+            'coaching': self.table.coaching[masks],
+            'xp_penalty': self.beta[self.xp_column] * xp
+        }
+        if self.interactions:
+            cells = self.table.pack(positions, years, dev_traits, 0)
+            additive = terms['base'] + terms['position'] + terms['year'] + terms['dev_trait']
+            terms['interactions'] = self.table.base[cells] - additive + self.table.cross(cells, masks)
+        total = sum(terms.values())
+        if self.floor is not None:
+            total = np.maximum(total, self.floor)
+        terms['total'] = total
+        return terms
+
+
+class PredictionTable:
+    """Precomputed tables for the additive model
+
+    A prediction is base[position, year, dev trait] + coaching[mask] +
+    XP_Penalty * xp, so the position x year x dev trait combinations and the 2^13 coaching
+    mask sums are computed once and scoring becomes array indexing. A player
+    is packed into one integer key: the coaching mask sits above the base
+    index bits. Interactions between categories are folded into base and
+    those between coaching abilities into coaching; a coaching ability x
+    category interaction adds cross(cell, mask), which is 0 for additive
+    models.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.shape = (len(engine.positions), len(engine.years), len(engine.dev_traits))
+        pos = engine.beta[engine.position_offset:engine.year_offset]
+        year = engine.beta[engine.year_offset:engine.dev_trait_offset]
+        dev = engine.beta[engine.dev_trait_offset:engine.coaching_offset]
+        self.base = (
+            engine.beta[0] + pos[:, None, None] + year[None, :, None] + dev[None, None, :]
+        ).reshape(-1)
+
+        coaching = engine.beta[engine.coaching_offset:engine.xp_column]
+        n_bits = len(coaching)
+        masks = np.arange(1 << n_bits, dtype=np.int64)
+        self.coaching = ((masks[:, None] >> np.arange(n_bits)) & 1) @ coaching
+
+        # Per coaching bit, the extra points its interactions with categories add in each base cell
+        grid = dict(zip(('position', 'year', 'dev_trait'),
+                        (g.reshape(-1) for g in np.indices(self.shape))))
+        cross = {}
+        for (a, b), coef in zip(engine.interaction_factors, engine.interactions.values()):
+            if a[0] == 'coaching' and b[0] == 'coaching':
+                self.coaching = self.coaching + coef * ((masks >> a[1]) & (masks >> b[1]) & 1)
+            elif a[0] == 'coaching' or b[0] == 'coaching':
+                (_, bit), (category, code) = (a, b) if a[0] == 'coaching' else (b, a)
+                cross[bit] = cross.get(bit, 0.0) + coef * (grid[category] == code)
+            else:
+                self.base = self.base + coef * ((grid[a[0]] == a[1]) & (grid[b[0]] == b[1]))
+        self.cross_bits = np.array(sorted(cross), dtype=np.int64)
+        self.cross_cells = np.array([cross[bit] for bit in sorted(cross)], dtype=np.float64).reshape(
+            len(cross), self.base.size)
+
+        self.xp_coef = engine.beta[engine.xp_column]
+        self.base_bits = max(1, int(self.base.size - 1).bit_length())
+        self.base_mask = (1 << self.base_bits) - 1
+
+    def pack(self, positions, years, dev_traits, masks):
+        """Pack category codes and coaching masks into integer keys"""
+        _, n_year, n_dev = self.shape
+        base_index = (np.asarray(positions) * n_year + np.asarray(years)) * n_dev + np.asarray(dev_traits)
+        return (np.asarray(masks, dtype=np.int64) << self.base_bits) | base_index
+
+    def unpack(self, keys):
+        """Split keys back into (position, year, dev trait, mask) codes"""
+        keys = np.asarray(keys, dtype=np.int64)
+        _, n_year, n_dev = self.shape
+        base_index = keys & self.base_mask
+        positions, rest = np.divmod(base_index, n_year * n_dev)
+        years, dev_traits = np.divmod(rest, n_dev)
+        return positions, years, dev_traits, keys >> self.base_bits
+
+    def encode_key(self, position, year, dev_trait, coaching_abilities):
+        """Packed key for a single player"""
+        engine = self.engine
+        try:
+            base_index = (
+                engine.position_index[position] * self.shape[1] + engine.year_index[year]
+            ) * self.shape[2] + engine.dev_trait_index[dev_trait]
+        except KeyError as e:
+            raise KeyError(f"Unknown player category: {e.args[0]!r}")
+        unknown = coaching_abilities.keys() - set(engine.coaching_vars)
+        if unknown:
+            # The coefficient-dict scorer this replaced raised KeyError for them too
+            raise KeyError(f"Unknown coaching ability: {sorted(unknown)[0]!r}")
+        mask = 0
+        for bit, var in enumerate(engine.coaching_vars):
+            value = coaching_abilities.get(var, 0)
+            if not _is_flag(value):
+                raise ValueError(f"{var} must be 0 or 1, got {value!r}")
+            if float(value):
+                mask |= 1 << bit
+        return (mask << self.base_bits) | base_index
+
+    def cross(self, cells, masks):
+        """Coaching ability x category interaction points for base cell indexes and coaching masks"""
+        if not self.cross_bits.size:
+            return 0.0
+        cells = np.asarray(cells)
+        masks = np.asarray(masks, dtype=np.int64)
+        total = 0.0
+        for bit, values in zip(self.cross_bits.tolist(), self.cross_cells):
+            total = total + ((masks >> bit) & 1) * values[cells]
+        return total
+
+    def predict_keys(self, keys, xp_penalty=0):
+        """Predict skill points for packed keys with the engine's floor applied"""
+        if isinstance(keys, int):
+            prediction = self.base[keys & self.base_mask] + self.coaching[keys >> self.base_bits]
+            prediction += self.xp_coef * xp_penalty
+            if self.cross_bits.size:
+                prediction += self.cross(keys & self.base_mask, keys >> self.base_bits)
+            if self.engine.floor is not None:
+                prediction = max(self.engine.floor, prediction)
+            return prediction
+        keys = np.asarray(keys, dtype=np.int64)
+        predictions = self.base[keys & self.base_mask] + self.coaching[keys >> self.base_bits]
+        predictions = predictions + self.xp_coef * np.asarray(xp_penalty, dtype=np.float64)
+        predictions = predictions + self.cross(keys & self.base_mask, keys >> self.base_bits)
+        if self.engine.floor is not None:
+            predictions = np.maximum(predictions, self.engine.floor)
+        return predictions
+
+
+class PredictionIntervals:
+    """Bootstrap prediction-interval offsets for every position x year x dev trait cell
+
+    offsets[cell, level] holds the (lower, upper) offsets from the point
+    prediction, with cells indexed like PredictionTable.base, so a lookup is
+    one array read. Written by NCAABootstrap.py.
+    """
+
+    def __init__(self, levels, offsets, positions, years, dev_traits, n_boot):
+        self.levels = [float(level) for level in levels]
+        self.offsets = np.asarray(offsets, dtype=np.float32)
+        self.positions = [str(p) for p in positions]
+        self.years = [str(y) for y in years]
+        self.dev_traits = [str(d) for d in dev_traits]
+        self.n_boot = int(n_boot)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as f:
+            return cls(f['levels'], f['offsets'], f['positions'], f['years'], f['dev_traits'], f['n_boot'])
+
+    def save(self, path):
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, levels=np.array(self.levels), offsets=self.offsets,
+                     positions=np.array(self.positions), years=np.array(self.years),
+                     dev_traits=np.array(self.dev_traits), n_boot=self.n_boot)
+        os.replace(tmp, path)
+
+    def matches(self, engine):
+        """True when the cells line up with the engine's category encoding"""
+        return (self.positions == engine.positions and self.years == engine.years
+                and self.dev_traits == engine.dev_traits)
+
+    def lookup(self, engine, position, year, dev_trait, prediction):
+        """[(level, lower, upper), ...] around a point prediction"""
+        cell = engine.table.encode_key(position, year, dev_trait, {})
+        return [
+            (level, max(0.0, prediction + float(lower)), prediction + float(upper))
+            for level, (lower, upper) in zip(self.levels, self.offsets[cell])
+        ]
+
+
+class Model:
+    """A parsed coefficient artifact together with its scoring engine"""
+
+    def __init__(self, artifact, floor=0):
+        self.artifact = artifact
+        self.version = artifact['version']
+        self.name = artifact.get('name', '')
+        self.coefficients = artifact['coefficients']
+        self.position_coeffs = artifact['position_coeffs']
+        self.year_coeffs = artifact['year_coeffs']
+        self.dev_trait_coeffs = artifact['dev_trait_coeffs']
+        self.model_stats = artifact.get('model_stats', {})
+        self.devt_accuracy = artifact.get('devt_accuracy', {})
+        self.engine = ScoringEngine.from_artifact(artifact, floor=floor)
+        self.intervals = None
+        self._overlay = (None, None)
+
+    def interval(self, position, year, dev_trait, prediction):
+        """Bootstrap prediction intervals for a player, or None when none are loaded"""
+        if self.intervals is None:
+            return None
+        return self.intervals.lookup(self.engine, position, year, dev_trait, prediction)
+
+    def with_coefficients(self, dicts):
+        """Same model with coefficient dicts (e.g. from the online model) swapped in
+
+        The result is remembered until a different dicts object is passed.
+        """
+        source, model = self._overlay
+        if source is dicts:
+            return model
+        artifact = dict(self.artifact)
+        for key in ('coefficients', 'position_coeffs', 'year_coeffs', 'dev_trait_coeffs'):
+            artifact[key] = dicts[key]
+        # The online model's coefficient dicts describe the whole model, interactions included
+        artifact['interactions'] = dicts.get('interactions', {})
+        if 'n' in dicts:
+            # A refit (the online model) is no longer the artifact's fit: label it as such
+            # and keep only the statistics the refit has, not the artifact's
+            artifact['version'] = f"{self.version}+online"
+            artifact['name'] = f"{self.name} refit online {dicts['updated_at']}".strip()
+            artifact['model_stats'] = {key: dicts[key] for key in ('n', 'rmse', 'r_squared') if key in dicts}
+        model = Model(artifact, floor=self.engine.floor)
+        model.intervals = self.intervals
+        self._overlay = (dicts, model)
+        return model
+
+    def accuracy_summary(self):
+        """'71% of predictions within ±5 points | 94% within ±10 points' style caption
+
+        Lists every range the artifact has accuracy figures for.
+        """
+        parts = []
+        for acc in self.model_stats.get('accuracy_ranges', []):
+            suffix = " of predictions" if not parts else ""
+            parts.append(f"{acc['percentage']:.0f}%{suffix} within ±{acc['range']:g} points")
+        return " | ".join(parts)
+
+
+class ModelStore:
+    """Loads a model artifact once and reloads it atomically when the file changes
+
+    get() is cheap enough to call on every Streamlit rerun or Tk poll: the
+    file is stat'ed at most once per check_interval and only re-parsed when
+    its mtime or size changed. A reload builds the new Model completely
+    before swapping the reference, so callers see either the old model or
+    the new one. If the new file fails to parse the old model keeps serving.
+    Bootstrap intervals in the artifact's sidecar file are attached when
+    present and reloaded the same way.
+    """
+
+    def __init__(self, path=DEFAULT_MODEL_PATH, floor=0, check_interval=1.0):
+        self.path = path
+        self.intervals_path = intervals_path(path)
+        self.floor = floor
+        self.check_interval = check_interval
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stamp = self._stat()
+        self._model = self._load()
+        self._checked = time.monotonic()
+
+    def _stat(self):
+        stamps = []
+        for path in (self.path, self.intervals_path):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                if path == self.path:
+                    raise
+                stamps.append(None)
+                continue
+            stamps.append((st.st_mtime_ns, st.st_size))
+        return tuple(stamps)
+
+    def _load(self):
+        model = Model(load_artifact(self.path), floor=self.floor)
+        if os.path.exists(self.intervals_path):
+            intervals = PredictionIntervals.load(self.intervals_path)
+            if intervals.matches(model.engine):
+                model.intervals = intervals
+        return model
+
+    def get(self):
+        """Current model, reloading first if the artifact changed on disk"""
+        if time.monotonic() - self._checked >= self.check_interval:
+            self.reload()
+        return self._model
+
+    def reload(self, force=False):
+        """Re-read the artifact if it changed; returns True when a new model was swapped in"""
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                stamp = self._stat()
+                if stamp == self._stamp and not force:
+                    return False
+                model = self._load()
+            except (OSError, ValueError, KeyError) as e:
+                self.last_error = e
+                return False
+            self._stamp = stamp
+            self._model = model
+            self.last_error = None
+            return True
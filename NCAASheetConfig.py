@@ -0,0 +1,12 @@
+"""Google Sheet the community submissions live in, shared by the web app and the command-line tools
+
+Kept apart from NCAAModelWebApp so a script can reach the sheet without
+importing the app (which sets up the Streamlit page and starts its
+metrics exporters at import).
+"""
+
+SHEET_ID = "1ANYMLAgjc1nwXYCdm2nbegrgPtUfUGh1aR_nhLxcMK8"
+SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive'
+]
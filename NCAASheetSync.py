@@ -0,0 +1,211 @@
+"""Incremental sync of the community sheet into a local training store
+
+Usage: python NCAASheetSync.py [--store community.db] [--batch 500] [--full]
+       (reads the sheet with the service account in .streamlit/secrets.toml)
+
+The sheet is read in bounded A1 ranges. Rows are validated against the
+save_complete_data layout and upserted on (team, player, season): a
+player's latest sheet row replaces what is stored for them. The sheet has
+no season column, so the class year stands in for the season: the same
+player is a new data point once a year later. The store remembers the
+last row it ingested, so a sync only reads the rows appended since. The
+web app overwrites a player's row in place when a result is corrected
+(NCAASubmissionIndex), which that cursor never sees; --full rereads the
+whole sheet to pick such corrections up.
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import time
+
+from NCAAFakeSheet import _column_letter
+from NCAAMetrics import timed
+from NCAASheetConfig import SCOPES, SHEET_ID
+from NCAASubmissionLog import transaction
+from NCAATraining import COACHING_VARS, DEVT_ORDER, POSITION_ORDER, SHEET_COLUMNS, YEAR_ORDER, rows_to_data
+
+STORE_PATH = "community.db"
+
+
+def validate_row(values):
+    """Sheet values (strings) as a typed row in the save_complete_data layout
+
+    Raises ValueError describing the first problem found.
+    """
+    values = list(values) + [""] * (len(SHEET_COLUMNS) - len(values))
+    if len(values) != len(SHEET_COLUMNS):
+        raise ValueError(f"expected {len(SHEET_COLUMNS)} columns, got {len(values)}")
+    row = dict(zip(SHEET_COLUMNS, values))
+
+    team, name = str(row['Team']).strip(), str(row['Name']).strip()
+    if not team or not name:
+        raise ValueError("missing team or player name")
+    position, year, devt = (str(row[c]).strip() for c in ('Position', 'Year', 'DevT'))
+    if position not in POSITION_ORDER:
+        raise ValueError(f"unknown position {position!r}")
+    if year not in YEAR_ORDER:
+        raise ValueError(f"unknown year {year!r}")
+    if devt not in DEVT_ORDER:
+        raise ValueError(f"unknown dev trait {devt!r}")
+
+    numbers = {}
+    for column in ['Skill.Points', 'DevT.Num', 'Snaps', 'XP.Penalty'] + COACHING_VARS:
+        try:
+            numbers[column] = float(row[column])
+        except (TypeError, ValueError):
+            raise ValueError(f"{column} is not a number: {row[column]!r}")
+    for var in COACHING_VARS:
+        if numbers[var] not in (0, 1):
+            raise ValueError(f"{var} must be 0 or 1")
+    if numbers['Skill.Points'] < 0:
+        raise ValueError("negative skill points")
+
+    return [team, name, numbers['Skill.Points'], position, year, devt, int(numbers['DevT.Num']),
+            numbers['Snaps']] + [int(numbers[var]) for var in COACHING_VARS] + [numbers['XP.Penalty']]
+
+
+class SheetSync:
+    """Local SQLite store of validated community rows plus the sync cursor"""
+
+    def __init__(self, path=STORE_PATH, header_rows=1):
+        self.path = path
+        self.header_rows = header_rows
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS community_rows (
+                sheet_row INTEGER PRIMARY KEY,
+                team TEXT NOT NULL,
+                player TEXT NOT NULL,
+                season TEXT NOT NULL,
+                row TEXT NOT NULL,
+                UNIQUE (team, player, season)
+            )
+        """)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.last_errors = []
+
+    @property
+    def last_row(self):
+        """Last sheet row (1-based) already ingested"""
+        with self._lock:
+            found = self._conn.execute("SELECT value FROM sync_state WHERE key = 'last_row'").fetchone()
+        return int(found[0]) if found else self.header_rows
+
+    def sync(self, sheet, batch_size=500, rescan=False):
+        """Fetch and upsert the rows appended since the last sync, or with rescan=True every row
+
+        Returns counts of rows read, added, updated, duplicated (an earlier
+        sheet row of a player stored from a later one) and rejected. Each
+        batch and the cursor move in one transaction, so an interrupted sync
+        resumes without losing or repeating rows (a rescan starts over from
+        the top).
+        """
+        counts = {'read': 0, 'added': 0, 'updated': 0, 'duplicates': 0, 'rejected': 0}
+        self.last_errors = []
+        last_row = self.last_row
+        start = self.header_rows + 1 if rescan else last_row + 1
+        width = _column_letter(len(SHEET_COLUMNS))
+        while True:
+            with timed("sheet_read"):
+                values = sheet.get(f"A{start}:{width}{start + batch_size - 1}")
+            rows = []
+            for offset, raw in enumerate(values):
+                if not any(str(v).strip() for v in raw):
+                    continue
+                try:
+                    rows.append((start + offset, validate_row(raw)))
+                except ValueError as e:
+                    counts['rejected'] += 1
+                    self.last_errors.append((start + offset, str(e)))
+
+            with self._lock, transaction(self._conn):
+                for sheet_row, row in rows:
+                    outcome = self._upsert(sheet_row, row)
+                    if outcome:
+                        counts[outcome] += 1
+                if values and start + len(values) - 1 > last_row:
+                    last_row = start + len(values) - 1
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO sync_state (key, value) VALUES ('last_row', ?)", (str(last_row),)
+                    )
+
+            counts['read'] += len(values)
+            if len(values) < batch_size:
+                return counts
+            start += batch_size
+
+    def _upsert(self, sheet_row, row):
+        """Store a row unless a later sheet row of the player is stored; returns what happened, or None if unchanged"""
+        key = (row[0].lower(), row[1].lower(), row[4])
+        stored = json.dumps(row)
+        found = self._conn.execute(
+            "SELECT sheet_row, row FROM community_rows WHERE team = ? AND player = ? AND season = ?", key
+        ).fetchone()
+        if found is not None:
+            if found == (sheet_row, stored):
+                return None
+            if found[0] > sheet_row:
+                return 'duplicates'
+        # Replaces the player's earlier row, and whatever player this sheet row held before an edit
+        self._conn.execute(
+            "INSERT OR REPLACE INTO community_rows (sheet_row, team, player, season, row) VALUES (?, ?, ?, ?, ?)",
+            (sheet_row,) + key + (stored,)
+        )
+        if found is None:
+            return 'added'
+        return 'updated' if found[1] != stored else 'duplicates'
+
+    def rows(self):
+        """Stored rows in sheet order"""
+        with self._lock:
+            found = self._conn.execute("SELECT row FROM community_rows ORDER BY sheet_row").fetchall()
+        return [json.loads(row) for row, in found]
+
+    def training_data(self):
+        """Stored rows as a training column dict (see NCAATraining.rows_to_data)"""
+        return rows_to_data(self.rows())
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM community_rows").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_sheet(secrets_path=".streamlit/secrets.toml"):
+    """The community sheet, authorised with the web app's service account"""
+    import gspread
+    import toml
+    from google.oauth2.service_account import Credentials
+
+    info = toml.load(secrets_path)["gcp_service_account"]
+    client = gspread.authorize(Credentials.from_service_account_info(info, scopes=SCOPES))
+    return client.open_by_key(SHEET_ID).sheet1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--batch", type=int, default=500, help="rows per range read")
+    parser.add_argument("--secrets", default=".streamlit/secrets.toml")
+    parser.add_argument("--full", action="store_true",
+                        help="reread the whole sheet to pick up rows corrected in place")
+    args = parser.parse_args()
+
+    store = SheetSync(args.store)
+    start = time.perf_counter()
+    counts = store.sync(open_sheet(args.secrets), args.batch, rescan=args.full)
+    print(f"Read {counts['read']} rows in {time.perf_counter() - start:.2f}s: {counts['added']} added, "
+          f"{counts['updated']} updated, {counts['duplicates']} duplicates, {counts['rejected']} rejected "
+          f"({store.count()} stored)")
+    for sheet_row, error in store.last_errors[:20]:
+        print(f"  row {sheet_row}: {error}")
+
+
+if __name__ == "__main__":
+    main()
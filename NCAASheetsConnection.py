@@ -0,0 +1,314 @@
+"""Self-healing, quota-aware Google Sheets connection shared by every session of the web app
+
+The connection is opened lazily and reopened after it breaks, instead of a
+failed first attempt being cached for the life of the process. Credentials
+are refreshed refresh_margin seconds before they expire. Sheet calls go
+through a worksheet proxy:
+    - writes wait for a token bucket sized below the per-minute write quota
+    - 429s and 5xx/transport errors are retried with exponential backoff and
+      full jitter (honouring Retry-After), never past max_latency seconds;
+      appends are only retried on errors that say nothing was written
+      (429, 408, 401), since a 5xx or a timeout can follow a write that went
+      through and a retry would add the rows twice
+    - a circuit breaker stops calling after repeated failures and lets one
+      trial call through every reset_timeout seconds until the sheet answers
+While the breaker is open sheet() returns None, which is what
+SubmissionQueue takes as "unreachable, keep the rows and try later".
+"""
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from NCAAMetrics import inc, set_gauge
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+AUTH_STATUSES = {401}
+# Errors that mean the request was not carried out, so even an append can be retried
+UNAPPLIED_STATUSES = {401, 408, 429}
+
+
+class SheetsUnavailable(ConnectionError):
+    """The sheet cannot be reached right now (circuit open, or retries ran out of time); nothing was written"""
+
+
+def status_code(error):
+    """HTTP status of a gspread APIError (or anything shaped like it), else None"""
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code
+    return getattr(getattr(error, 'response', None), 'status_code', None)
+
+
+def retry_after(error):
+    """Seconds from a Retry-After header on the error's response, else None"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_transient(error):
+    """Quota, server and transport errors are worth retrying; anything else is a real failure"""
+    status = status_code(error)
+    if status is not None:
+        return status in RETRY_STATUSES or status in AUTH_STATUSES
+    # requests' ConnectionError and Timeout are OSErrors
+    return isinstance(error, (ConnectionError, TimeoutError, OSError))
+
+
+class TokenBucket:
+    """Allows rate calls per second on average and bursts of up to capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, timeout=None):
+        """Take a token, waiting up to timeout seconds (forever when None); returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None:
+                if now + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the server said the quota is used up"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 0.0)
+
+
+class CircuitBreaker:
+    """Opens after threshold consecutive failures; half-opens for one trial call every reset_timeout seconds"""
+
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if self.trial else 'open'
+
+    def blocked(self):
+        """Whether calls are being refused right now (does not use up the half-open trial)"""
+        with self._lock:
+            return self.opened_at is not None and (
+                self.trial or time.monotonic() - self.opened_at < self.reset_timeout)
+
+    def allow(self):
+        """Whether a call may go out now; in the half-open state only the first caller gets through"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self.trial and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+        set_gauge("ncaa_sheets_circuit_open", 0)
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                if self.opened_at is None or self.trial:
+                    inc("ncaa_sheets_circuit_opened_total")
+                self.opened_at = time.monotonic()
+                self.trial = False
+        if self.opened_at is not None:
+            set_gauge("ncaa_sheets_circuit_open", 1)
+
+
+def _auth_request():
+    # Imported on first use, like gspread itself, to keep it off the web app's cold start
+    from google.auth.transport.requests import Request
+    return Request()
+
+
+class SheetsConnection:
+    """Lazily (re)connected worksheet with token refresh, write rate limiting, backoff and a circuit breaker
+
+    connect() opens the worksheet and returns (worksheet, credentials);
+    credentials may be None for sheets that need none (FakeWorksheet).
+    """
+
+    def __init__(self, connect, writes_per_minute=50, burst=10, max_latency=30.0, base_delay=1.0, max_delay=32.0,
+                 refresh_margin=300.0, failure_threshold=5, reset_timeout=30.0):
+        self.connect = connect
+        self.max_latency = max_latency
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.refresh_margin = refresh_margin
+        self.bucket = TokenBucket(writes_per_minute / 60.0, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.worksheet = None
+        self.credentials = None
+        self.last_error = None
+        self.connects = 0
+        self._lock = threading.Lock()
+        self._proxy = ManagedWorksheet(self)
+
+    def sheet(self):
+        """Worksheet proxy, or None while the sheet is unreachable"""
+        if self.breaker.blocked():
+            return None
+        try:
+            self._current()
+        except Exception as e:
+            self.last_error = e
+            self.breaker.failure()
+            return None
+        return self._proxy
+
+    def _current(self):
+        """Connected worksheet with fresh credentials, connecting first when needed"""
+        with self._lock:
+            if self.worksheet is None:
+                self.worksheet, self.credentials = self.connect()
+                self.connects += 1
+                inc("ncaa_sheets_connects_total")
+            elif self._expiring():
+                try:
+                    self.credentials.refresh(_auth_request())
+                except Exception:
+                    # Start over with a new connection next time
+                    self.worksheet = None
+                    raise
+                inc("ncaa_sheets_token_refreshes_total")
+            return self.worksheet
+
+    def _expiring(self):
+        expiry = getattr(self.credentials, 'expiry', None)
+        if expiry is None:
+            return False
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return (expiry - now).total_seconds() < self.refresh_margin
+
+    def available(self):
+        """False while the circuit is open or the last connection attempt failed"""
+        return not self.breaker.blocked() and (self.worksheet is not None or self.last_error is None)
+
+    def reset(self):
+        """Drop the connection so the next call reconnects"""
+        with self._lock:
+            self.worksheet = None
+
+    def call(self, method, args=(), kwargs=None, write=False, idempotent=True):
+        """Call a worksheet method with rate limiting, retries and the circuit breaker
+
+        Raises SheetsUnavailable when the breaker is open or the call could
+        not succeed within max_latency seconds; non-transient errors (a bad
+        range, a permission error) are raised at once. A call that is not
+        idempotent (an append) is only retried on UNAPPLIED_STATUSES; any
+        other transient error is raised as is, because the write may have
+        been applied.
+        """
+        kwargs = kwargs or {}
+        deadline = time.monotonic() + self.max_latency
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise SheetsUnavailable(f"Google Sheets circuit open after: {self.last_error}")
+            if write and not self.bucket.acquire(timeout=deadline - time.monotonic()):
+                inc("ncaa_sheets_throttled_total")
+                raise SheetsUnavailable("Write rate limit: no quota left within max_latency")
+            try:
+                result = getattr(self._current(), method)(*args, **kwargs)
+            except Exception as e:
+                self.last_error = e
+                if not is_transient(e):
+                    # An HTTP error the sheet answered with (a bad range, no permission) says it is up
+                    if status_code(e) is not None:
+                        self.breaker.success()
+                    else:
+                        self.breaker.failure()
+                    raise
+                status = status_code(e)
+                if status == 429:
+                    # The sheet is up but the quota is spent, for every writer in this process
+                    self.breaker.success()
+                    self.bucket.drain()
+                else:
+                    self.breaker.failure()
+                    if status is None or status in AUTH_STATUSES:
+                        self.reset()
+                if not idempotent and status not in UNAPPLIED_STATUSES:
+                    raise
+                inc("ncaa_sheets_retries_total", status=str(status or type(e).__name__))
+                delay = retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                attempt += 1
+                if time.monotonic() + delay >= deadline:
+                    raise SheetsUnavailable(f"Google Sheets still failing after {attempt} attempts: {e}") from e
+                time.sleep(delay)
+                continue
+            self.breaker.success()
+            return result
+
+    def stats(self):
+        return {
+            'state': self.breaker.state,
+            'connected': self.worksheet is not None,
+            'connects': self.connects,
+            'consecutive_failures': self.breaker.failures,
+            'write_tokens': self.bucket.tokens,
+            'last_error': repr(self.last_error) if self.last_error else None
+        }
+
+
+class ManagedWorksheet:
+    """gspread-style worksheet whose calls go through a SheetsConnection"""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def append_row(self, *args, **kwargs):
+        return self._connection.call('append_row', args, kwargs, write=True, idempotent=False)
+
+    def append_rows(self, *args, **kwargs):
+        return self._connection.call('append_rows', args, kwargs, write=True, idempotent=False)
+
+    def update(self, *args, **kwargs):
+        return self._connection.call('update', args, kwargs, write=True)
+
+    def batch_update(self, *args, **kwargs):
+        return self._connection.call('batch_update', args, kwargs, write=True)
+
+    def get(self, *args, **kwargs):
+        return self._connection.call('get', args, kwargs)
+
+    def get_all_values(self, *args, **kwargs):
+        return self._connection.call('get_all_values', args, kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._connection._current(), name)
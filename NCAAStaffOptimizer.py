@@ -0,0 +1,160 @@
+"""Coaching staff optimizer: the ability combinations that earn a roster the most skill points
+
+Usage: python NCAAStaffOptimizer.py roster.csv [--model models/ncaa_v3.0.json] [--top 10]
+                                    [--slots HC OC DC] [--budget 6 --cost HC_TD3=3 ...]
+                                    [--one-tier] [--required HC_Moti.1 ...] [--weight QB=2 ...]
+
+roster.csv uses the web app's input names (player_name, position, year,
+dev_trait, xp_penalty); its coaching columns are ignored, since those are
+what is being chosen. Every allowed combination of the model's coaching
+abilities is scored against the whole roster at once through the
+engine's lookup tables.
+"""
+import argparse
+import re
+import time
+
+import numpy as np
+
+
+def coach_slot(var):
+    """Coach slot (HC, OC or DC) an ability belongs to"""
+    return var.split('_')[0]
+
+
+def tier_groups(coaching_vars):
+    """Group tiered abilities of the same coach, e.g. HC_TD1/HC_TD2/HC_TD3"""
+    groups = {}
+    for var in coaching_vars:
+        groups.setdefault(re.sub(r'\.?\d+$', '', var), []).append(var)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def candidate_masks(coaching_vars, slots=None, costs=None, budget=None, exclusive=(), required=()):
+    """Every coaching bitmask that satisfies the constraints, with its cost"""
+    n_bits = len(coaching_vars)
+    masks = np.arange(1 << n_bits, dtype=np.int64)
+    bits = (masks[:, None] >> np.arange(n_bits)) & 1
+    keep = np.ones(masks.size, dtype=bool)
+
+    if slots is not None:
+        for i, var in enumerate(coaching_vars):
+            if coach_slot(var) not in slots:
+                keep &= bits[:, i] == 0
+    for var in required:
+        keep &= bits[:, coaching_vars.index(var)] == 1
+    for group in exclusive:
+        columns = [coaching_vars.index(var) for var in group]
+        keep &= bits[:, columns].sum(axis=1) <= 1
+
+    cost_vector = np.array([(costs or {}).get(var, 0) for var in coaching_vars], dtype=np.float64)
+    mask_costs = bits @ cost_vector
+    if budget is not None:
+        keep &= mask_costs <= budget
+    return masks[keep], mask_costs[keep]
+
+
+def optimize_staff(engine, roster, top_k=10, position_weights=None, slots=None,
+                   costs=None, budget=None, exclusive=(), required=(), chunk_size=2048):
+    """Rank coaching staff configurations by predicted skill points for a roster
+
+    roster is anything ScoringEngine.encode accepts; its coaching columns are
+    ignored since those are what we are choosing. Every allowed ability
+    combination is scored against every player at once through the engine's
+    lookup tables. position_weights scales each player's points by position
+    (unlisted positions weigh 1). slots limits abilities to the coach slots
+    on staff, costs/budget cap the spend, exclusive lists groups of which at
+    most one may be bought (see tier_groups) and required lists abilities
+    already owned.
+    """
+    table = engine.table
+    positions, years, dev_traits, _, xp = engine.encode(roster)
+    base_index = table.pack(positions, years, dev_traits, 0)
+    base = table.base[base_index] + table.xp_coef * xp
+    weights = np.ones(base.size)
+    if position_weights:
+        weights = np.array([position_weights.get(engine.positions[p], 1.0) for p in positions])
+
+    masks, mask_costs = candidate_masks(engine.coaching_vars, slots, costs, budget, exclusive, required)
+    if masks.size == 0:
+        return []
+
+    totals = np.empty(masks.size)
+    for start in range(0, masks.size, chunk_size):
+        chunk = masks[start:start + chunk_size]
+        points = base[None, :] + table.coaching[chunk][:, None] + table.cross(base_index[None, :], chunk[:, None])
+        if engine.floor is not None:
+            np.maximum(points, engine.floor, out=points)
+        totals[start:start + chunk_size] = points @ weights
+
+    k = min(top_k, masks.size)
+    best = np.argpartition(-totals, k - 1)[:k]
+    best = best[np.lexsort((mask_costs[best], -totals[best]))]
+
+    return [
+        {
+            'abilities': [var for bit, var in enumerate(engine.coaching_vars) if masks[i] >> bit & 1],
+            'mask': int(masks[i]),
+            'total': float(totals[i]),
+            'cost': float(mask_costs[i])
+        }
+        for i in best
+    ]
+
+
+def _assignments(values, option):
+    """{'NAME': float} from NAME=VALUE command line arguments"""
+    parsed = {}
+    for value in values:
+        name, sep, number = value.partition('=')
+        try:
+            parsed[name] = float(number)
+        except ValueError:
+            sep = ''
+        if not sep:
+            raise SystemExit(f"{option} expects NAME=NUMBER, got {value!r}")
+    return parsed
+
+
+def main():
+    # Imported here: the simulator imports coach_slot from this module
+    from NCAADynastySimulator import read_roster
+    from NCAAScoringEngine import DEFAULT_MODEL_PATH, Model, load_artifact
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("roster", help="CSV roster in the web app's input layout")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--top", type=int, default=10, help="configurations to list")
+    parser.add_argument("--slots", nargs="+", choices=["HC", "OC", "DC"], help="coach slots on staff (default all)")
+    parser.add_argument("--cost", nargs="+", default=[], metavar="ABILITY=COST", help="cost of an ability (default 0)")
+    parser.add_argument("--budget", type=float, help="cap on the summed cost of the chosen abilities")
+    parser.add_argument("--one-tier", action="store_true", help="buy at most one tier of each tiered ability")
+    parser.add_argument("--required", nargs="+", default=[], metavar="ABILITY", help="abilities already owned")
+    parser.add_argument("--weight", nargs="+", default=[], metavar="POSITION=WEIGHT",
+                        help="scale a position's points (default 1)")
+    args = parser.parse_args()
+
+    engine = Model(load_artifact(args.model)).engine
+    costs = _assignments(args.cost, "--cost")
+    for var in list(costs) + args.required:
+        if var not in engine.coaching_vars:
+            raise SystemExit(f"Unknown coaching ability {var!r}; the model has {', '.join(engine.coaching_vars)}")
+    roster = read_roster(args.roster, engine.coaching_vars)
+    exclusive = tier_groups(engine.coaching_vars) if args.one_tier else ()
+
+    start = time.perf_counter()
+    ranked = optimize_staff(engine, roster, args.top, _assignments(args.weight, "--weight"), args.slots,
+                            costs, args.budget, exclusive, args.required)
+    elapsed = time.perf_counter() - start
+
+    if not ranked:
+        print("No staff configuration satisfies the constraints")
+        return
+    print(f"{'Rank':>4} {'Total':>9} {'Cost':>6}  Abilities")
+    for rank, config in enumerate(ranked, start=1):
+        print(f"{rank:>4} {config['total']:>9.1f} {config['cost']:>6g}  {', '.join(config['abilities']) or '(none)'}")
+    print(f"\nBest staff for {len(roster)} players: {ranked[0]['total']:.1f} total skill points ({elapsed:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
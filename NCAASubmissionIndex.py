@@ -0,0 +1,245 @@
+"""Upsert index of submitted players, so resubmissions update their sheet row instead of appending
+
+Usage: python NCAASubmissionIndex.py status [--index submission_index.db]
+       python NCAASubmissionIndex.py rebuild [--index submission_index.db] [--secrets .streamlit/secrets.toml]
+
+Every submission is keyed on (team, player_name, position, year, season),
+with team and player name compared ignoring case and surrounding spaces.
+Sheet rows carry no season column: season is the label the app runs with
+(NCAA_SEASON, empty by default), and within it the class year already
+separates a player's results from one season to the next (the same
+assumption NCAASheetSync makes). The index lives in a dict for O(1)
+checks and is written through to SQLite together with the sheet row each
+entry landed in, so a correction is a single update of that row's range.
+rebuild reads the sheet once to index rows written before the index
+existed, or after the sheet was edited by hand.
+"""
+import argparse
+import json
+import re
+import sqlite3
+import threading
+
+from NCAASubmissionLog import transaction
+
+INDEX_PATH = "submission_index.db"
+
+NEW, DUPLICATE, CORRECTION = 'new', 'duplicate', 'correction'
+
+
+def _name(value):
+    return ' '.join(str(value).split()).casefold()
+
+
+def _value(value):
+    """Cell value in a form that compares equal whether it came from the app or back from the sheet"""
+    try:
+        return format(float(value), 'g')
+    except (TypeError, ValueError):
+        return str(value).strip()
+
+
+def first_row(response):
+    """First sheet row of an append_rows response ('Sheet1!A12:V14' -> 12)"""
+    updated = response.get('updates', response).get('updatedRange', '')
+    match = re.search(r"![A-Z]+(\d+)|^[A-Z]+(\d+)", updated)
+    if not match:
+        raise ValueError(f"No row number in updatedRange {updated!r}")
+    return int(match.group(1) or match.group(2))
+
+
+class SubmissionIndex:
+    """(team, player, position, year, season) -> sheet row and last submitted values"""
+
+    def __init__(self, path=INDEX_PATH, season=''):
+        self.path = path
+        self.season = season
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS submission_index (
+                team TEXT NOT NULL,
+                player TEXT NOT NULL,
+                position TEXT NOT NULL,
+                year TEXT NOT NULL,
+                season TEXT NOT NULL,
+                sheet_row INTEGER,
+                row TEXT NOT NULL,
+                PRIMARY KEY (team, player, position, year, season)
+            )
+        """)
+        self._entries = {
+            tuple(key): [sheet_row, json.loads(row)]
+            for *key, sheet_row, row in self._conn.execute(
+                "SELECT team, player, position, year, season, sheet_row, row FROM submission_index"
+            )
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, row):
+        """Index key of a row in the save_complete_data layout"""
+        return _name(row[0]), _name(row[1]), str(row[3]).strip(), str(row[4]).strip(), self.season
+
+    def classify(self, rows):
+        """NEW, DUPLICATE or CORRECTION for each row, counting earlier rows of the same batch"""
+        with self._lock:
+            return self._classify(rows)
+
+    def record(self, rows):
+        """Store rows as the latest values for their keys, keeping any known sheet row"""
+        with self._lock:
+            self._record(rows)
+
+    def upsert(self, rows, write=None):
+        """Classify rows and record the new and corrected ones in one step; returns the kinds
+
+        Holding the lock across both means two sessions submitting the same
+        player cannot both see it as NEW. write(kinds), when given, durably
+        stores the rows (the submission log) before they are recorded; if it
+        raises nothing is recorded, so a retry is not mistaken for a
+        duplicate of a row that was never saved.
+        """
+        with self._lock:
+            kinds = self._classify(rows)
+            if write is not None:
+                write(kinds)
+            self._record([row for row, kind in zip(rows, kinds) if kind != DUPLICATE])
+            return kinds
+
+    def _classify(self, rows):
+        kinds = []
+        seen = {}
+        for row in rows:
+            key = self.key(row)
+            # Team and player name are already compared through the key
+            values = [_value(v) for v in row[2:]]
+            previous = seen.get(key)
+            if previous is None and key in self._entries:
+                previous = [_value(v) for v in self._entries[key][1][2:]]
+            if previous is None:
+                kinds.append(NEW)
+            else:
+                kinds.append(DUPLICATE if previous == values else CORRECTION)
+            seen[key] = values
+        return kinds
+
+    def _record(self, rows):
+        updates = {}
+        for row in rows:
+            key = self.key(row)
+            entry = self._entries.get(key)
+            updates[key] = [None if entry is None else entry[0], list(row)]
+        self._write(updates)
+
+    def _write(self, updates):
+        """Store {key: [sheet_row, row]}, changing the in-memory entries only once the write commits"""
+        with transaction(self._conn):
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO submission_index VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [key + (sheet_row, json.dumps(row)) for key, (sheet_row, row) in updates.items()]
+            )
+        self._entries.update(updates)
+
+    def record_append(self, rows, response):
+        """Note which sheet rows appended rows landed in (SubmissionQueue on_append callback)"""
+        start = first_row(response)
+        with self._lock:
+            updates = {}
+            for offset, row in enumerate(rows):
+                key = self.key(row)
+                entry = updates.get(key) or self._entries.get(key)
+                if entry is None:
+                    updates[key] = [start + offset, list(row)]
+                elif entry[0] is None:
+                    updates[key] = [start + offset, entry[1]]
+            self._write(updates)
+
+    def located(self):
+        """Number of indexed players whose sheet row is known"""
+        with self._lock:
+            return sum(1 for sheet_row, _ in self._entries.values() if sheet_row is not None)
+
+    def sheet_row(self, row):
+        """Sheet row holding this row's player, or None while it has not been written"""
+        with self._lock:
+            entry = self._entries.get(self.key(row))
+        return entry[0] if entry is not None else None
+
+    def in_sheet(self, sheet, rows, header_rows=1):
+        """Whether each row is already in the sheet with the same values, noting the sheet row of those that are
+
+        Used before re-appending rows whose earlier write may have gone
+        through unacknowledged (a crash or a failed call after the write).
+        """
+        wanted = {(self.key(row), tuple(_value(v) for v in row[2:])) for row in rows}
+        found = {}
+        for sheet_row, values in enumerate(sheet.get_all_values()[header_rows:], start=header_rows + 1):
+            if len(values) < 5:
+                continue
+            item = (self.key(values), tuple(_value(v) for v in values[2:]))
+            if item in wanted and item not in found:
+                found[item] = sheet_row
+        present = []
+        with self._lock:
+            updates = {}
+            for row in rows:
+                key = self.key(row)
+                sheet_row = found.get((key, tuple(_value(v) for v in row[2:])))
+                present.append(sheet_row is not None)
+                entry = self._entries.get(key)
+                if sheet_row is not None and entry is not None and entry[0] is None and key not in updates:
+                    updates[key] = [sheet_row, entry[1]]
+            self._write(updates)
+        return present
+
+    def rebuild(self, sheet, header_rows=1):
+        """Re-index every row in the sheet; returns (indexed keys, rows repeating an earlier key)"""
+        values = sheet.get_all_values()[header_rows:]
+        entries = {}
+        repeats = 0
+        for sheet_row, row in enumerate(values, start=header_rows + 1):
+            if len(row) < 5 or not str(row[0]).strip() or not str(row[1]).strip():
+                continue
+            key = self.key(row)
+            if key in entries:
+                repeats += 1
+                entries[key][1] = row
+            else:
+                entries[key] = [sheet_row, row]
+        with self._lock:
+            with transaction(self._conn):
+                self._conn.execute("DELETE FROM submission_index")
+                self._conn.executemany(
+                    "INSERT INTO submission_index VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [key + (sheet_row, json.dumps(row)) for key, (sheet_row, row) in entries.items()]
+                )
+            self._entries = entries
+        return len(entries), repeats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["status", "rebuild"])
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--season", default="")
+    parser.add_argument("--secrets", default=".streamlit/secrets.toml")
+    args = parser.parse_args()
+
+    index = SubmissionIndex(args.index, args.season)
+    if args.command == "rebuild":
+        from NCAASheetSync import open_sheet
+        indexed, repeats = index.rebuild(open_sheet(args.secrets))
+        print(f"Indexed {indexed} players; {repeats} sheet rows repeat an earlier player and point at its first row")
+    print(f"{len(index)} players indexed, {index.located()} with a known sheet row")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from NCAAFakeSheet import _column_letter
+
+
+def row_range(sheet_row, width):
+    """A1 range covering one whole sheet row, e.g. 'A12:V12'"""
+    return f"A{sheet_row}:{_column_letter(width)}{sheet_row}"
+
+
+@contextmanager
+def transaction(conn):
+    """BEGIN ... COMMIT on an autocommit connection, rolled back if the block raises
+
+    Without the rollback a failed block would leave the shared connection
+    inside the transaction, and every later BEGIN would fail.
+    """
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+class SubmissionLog:
+    """Append-only SQLite (WAL mode) log of submitted sheet rows
+
+    Every submission is written here before any Google Sheets call, so a
+    row survives outages, quota throttling and restarts. Rows stay pending
+    until a successful sheet write marks them sent, so delivery is
+    at-least-once: a crash between the write and mark_sent leaves a row
+    pending that is already in the sheet. SubmissionQueue is the only
+    replay path and looks for such rows before appending them again
+    (SubmissionIndex.in_sheet). An entry's kind is
+    'append' for a new sheet row or 'update' for a correction that
+    overwrites the row already written for the same player
+    (NCAASubmissionIndex).
+    """
+
+    def __init__(self, path='submissions.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS submissions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                row TEXT NOT NULL,
+                sent_at REAL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS submissions_pending ON submissions (id) WHERE sent_at IS NULL"
+        )
+        # Logs written before corrections existed hold only appends
+        columns = [c[1] for c in self._conn.execute("PRAGMA table_info(submissions)")]
+        if 'kind' not in columns:
+            self._conn.execute("ALTER TABLE submissions ADD COLUMN kind TEXT NOT NULL DEFAULT 'append'")
+
+    def append(self, row, kind='append'):
+        """Durably record one row and return its log id"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO submissions (created_at, row, kind) VALUES (?, ?, ?)",
+                (time.time(), json.dumps(row), kind)
+            )
+            return cursor.lastrowid
+
+    def append_many(self, rows):
+        """Durably record several rows in one transaction and return their log ids"""
+        now = time.time()
+        with self._lock, transaction(self._conn):
+            ids = [
+                self._conn.execute(
+                    "INSERT INTO submissions (created_at, row) VALUES (?, ?)", (now, json.dumps(row))
+                ).lastrowid
+                for row in rows
+            ]
+        return ids
+
+    def mark_sent(self, ids):
+        """Mark log entries as written to the sheet"""
+        ids = [i for i in ids if i is not None]
+        if not ids:
+            return
+        now = time.time()
+        with self._lock, transaction(self._conn):
+            self._conn.executemany(
+                "UPDATE submissions SET sent_at = ? WHERE id = ? AND sent_at IS NULL",
+                [(now, i) for i in ids]
+            )
+
+    def pending(self, limit=None):
+        """Unsent entries as (id, row) pairs in submission order"""
+        return [(i, row) for i, row, _ in self.pending_entries(limit)]
+
+    def pending_entries(self, limit=None):
+        """Unsent entries as (id, row, kind) triples in submission order"""
+        query = "SELECT id, row, kind FROM submissions WHERE sent_at IS NULL ORDER BY id"
+        params = ()
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (limit,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [(i, json.loads(row), kind) for i, row, kind in rows]
+
+    def entries(self, kind=None):
+        """Every logged entry, sent or not, as (created_at, row) pairs in submission order
+
+        kind limits them to 'append' or 'update' entries.
+        """
+        query = "SELECT created_at, row FROM submissions"
+        params = ()
+        if kind is not None:
+            query += " WHERE kind = ?"
+            params = (kind,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [(created_at, json.loads(row)) for created_at, row in rows]
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM submissions WHERE sent_at IS NULL").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,227 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from NCAAMetrics import inc, set_gauge, timed
+from NCAASheetsConnection import SheetsUnavailable
+from NCAASubmissionLog import row_range
+
+logger = logging.getLogger(__name__)
+
+
+class SubmissionQueue:
+    """Buffer submitted sheet rows and write them in batches from a background thread
+
+    Rows are flushed once max_batch rows are waiting or flush_interval
+    seconds have passed, whichever comes first: the new rows of a flush go
+    out in one append_rows call and its corrections in one batch_update
+    call after it, so a flush costs at most two write requests.
+    get_sheet is any callable returning a gspread-style worksheet (or None
+    when the sheet is unreachable), so a FakeWorksheet can stand in offline.
+    Rows from a failed flush go back to the front of the queue and are
+    retried on the next flush. Rows queued together with submit_many are
+    always written in the same append_rows call. A correction queued with
+    submit_update overwrites the sheet row locate(row) returns at flush
+    time, after the rows appended in the same flush, so it finds a row
+    whose append was queued just before it. on_append,
+    when given, is called with the rows and the append_rows response (whose
+    updatedRange says where they landed). Rows queued with check=True may
+    already be in the sheet (replayed from the log after a crash); when
+    in_sheet is given, in_sheet(sheet, rows) is asked first and the rows
+    it finds are marked flushed instead of appended again. Appends from a
+    flush that failed after reaching the sheet are requeued the same way,
+    since the error may have come after the rows were written.
+    """
+
+    def __init__(self, get_sheet, max_batch=50, flush_interval=5.0, on_flush=None, on_append=None, in_sheet=None):
+        self.get_sheet = get_sheet
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.on_append = on_append
+        self.in_sheet = in_sheet
+
+        self._items = deque()
+        self._rows = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.rows_flushed = 0
+        self.unlocated_corrections = 0
+        self.last_flush_latency = None
+        self.total_flush_latency = 0.0
+        self.last_error = None
+
+        self._thread = threading.Thread(target=self._run, name='submission-queue', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, row, key=None, check=False):
+        """Queue one row and return the queue depth; never blocks on the sheet"""
+        return self._enqueue([key], [row], check=check)
+
+    def submit_many(self, rows, keys=None):
+        """Queue rows to be written together in one append_rows call, starting right away"""
+        keys = list(keys) if keys is not None else [None] * len(rows)
+        depth = self._enqueue(keys, list(rows))
+        self._wake.set()
+        return depth
+
+    def submit_update(self, row, locate, key=None):
+        """Queue a correction overwriting the sheet row locate(row) returns (appended when it returns None)"""
+        return self._enqueue([key], [row], locate)
+
+    def _enqueue(self, keys, rows, locate=None, check=False):
+        if self._closed.is_set():
+            raise RuntimeError("Submission queue is closed")
+        with self._lock:
+            self._items.append((keys, rows, locate, check))
+            self._rows += len(rows)
+            depth = self._rows
+        set_gauge("ncaa_submission_queue_depth", depth)
+        if depth >= self.max_batch:
+            self._wake.set()
+        return depth
+
+    def depth(self):
+        """Rows waiting to be written"""
+        with self._lock:
+            return self._rows
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._closed.is_set():
+                break
+            while self.flush() and self.depth() >= self.max_batch:
+                pass
+
+    def flush(self):
+        """Write up to max_batch queued rows to the sheet; returns True on success"""
+        with self._flush_lock:
+            with self._lock:
+                batch = []
+                size = 0
+                while self._items and (not batch or size + len(self._items[0][1]) <= self.max_batch):
+                    batch.append(self._items.popleft())
+                    size += len(batch[-1][1])
+                self._rows -= size
+            if not batch:
+                return True
+
+            appends = [item for item in batch if item[2] is None]
+            corrections = [item for item in batch if item[2] is not None]
+            start = time.perf_counter()
+            sheet = None
+            try:
+                sheet = self.get_sheet()
+                if sheet is None:
+                    raise ConnectionError("Google Sheets connection unavailable")
+                if appends:
+                    self._append(sheet, appends)
+                    appends = []
+                if corrections:
+                    self._correct(sheet, corrections)
+            except Exception as e:
+                # Only what was not written goes back to the front of the queue. Unless the sheet was never
+                # called or said nothing was written, the appends are looked for before they are sent again
+                if sheet is not None and not isinstance(e, SheetsUnavailable):
+                    appends = [(keys, rows, None, True) for keys, rows, _, _ in appends]
+                failed = appends + corrections
+                with self._lock:
+                    self._items.extendleft(reversed(failed))
+                    self._rows += sum(len(rows) for _, rows, _, _ in failed)
+                inc("ncaa_submission_retries_total")
+                self.failed_flushes += 1
+                self.last_error = e
+                set_gauge("ncaa_submission_queue_depth", self.depth())
+                return False
+
+            latency = time.perf_counter() - start
+            self.flushes += 1
+            self.last_flush_latency = latency
+            self.total_flush_latency += latency
+            set_gauge("ncaa_submission_queue_depth", self.depth())
+            return True
+
+    def _append(self, sheet, items):
+        keys = [key for item in items for key in item[0]]
+        rows = [row for item in items for row in item[1]]
+        count = len(rows)
+        if self.in_sheet is not None and any(item[3] for item in items):
+            present = self.in_sheet(sheet, rows)
+            rows = [row for row, found in zip(rows, present) if not found]
+            if len(rows) < count:
+                inc("ncaa_submission_already_in_sheet_total", count - len(rows))
+        if rows:
+            with timed("sheet_append"):
+                response = sheet.append_rows(rows)
+            if self.on_append is not None:
+                self.on_append(rows, response)
+        self._flushed(keys, count)
+
+    def _correct(self, sheet, items):
+        """Write corrections over their sheet rows in one batch_update, appending those with no known row"""
+        located = {}
+        unlocated = []
+        for _, rows, locate, _ in items:
+            target = locate(rows[0])
+            if target is None:
+                unlocated.append(rows[0])
+            else:
+                # The latest correction of a row wins
+                located[target] = rows[0]
+        if unlocated:
+            # The original row was never located (its append is still pending, or it was
+            # written before the index existed), so these corrections become second rows
+            with timed("sheet_append"):
+                response = sheet.append_rows(unlocated)
+            if self.on_append is not None:
+                self.on_append(unlocated, response)
+            self.unlocated_corrections += len(unlocated)
+            inc("ncaa_submission_unlocated_corrections_total", len(unlocated))
+            for row in unlocated:
+                logger.warning("No sheet row known for %s / %s; appended the correction", row[0], row[1])
+        if located:
+            with timed("sheet_update"):
+                sheet.batch_update([
+                    {'range': row_range(target, len(row)), 'values': [row]} for target, row in located.items()
+                ])
+        self._flushed([key for keys, _, _, _ in items for key in keys], len(items))
+
+    def _flushed(self, keys, count):
+        self.rows_flushed += count
+        inc("ncaa_submission_rows_total", count)
+        if self.on_flush is not None:
+            self.on_flush(keys)
+
+    def close(self, timeout=30.0):
+        """Stop the background thread and flush whatever is still queued"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        deadline = time.monotonic() + timeout
+        while self.depth() and time.monotonic() < deadline:
+            if not self.flush():
+                break
+
+    def stats(self):
+        """Queue depth and flush latency figures"""
+        return {
+            'depth': self.depth(),
+            'flushes': self.flushes,
+            'failed_flushes': self.failed_flushes,
+            'rows_flushed': self.rows_flushed,
+            'unlocated_corrections': self.unlocated_corrections,
+            'last_flush_latency': self.last_flush_latency,
+            'avg_flush_latency': self.total_flush_latency / self.flushes if self.flushes else None
+        }
@@ -0,0 +1,339 @@
+"""Refit the skill points regression in Python (replaces the R notebook fit)
+
+Usage: python NCAATraining.py ["NCAA R Code Data.xlsx"] [--sheet FINAL] [--out model.json]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+DATA_PATH = "NCAA R Code Data.xlsx"
+
+COACHING_VARS = [
+    'HC_Moti.1', 'HC_Moti.2', 'OC_Moti.1', 'DC_Moti.1',
+    'HC_TD1', 'HC_TD2', 'HC_TD3',
+    'OC_TD1', 'OC_TD2', 'OC_TD3',
+    'DC_TD1', 'DC_TD2', 'DC_TD3'
+]
+
+# Display order of the categories; baselines (QB, FR, Elite) come first
+POSITION_ORDER = ['QB', 'RB', 'WR', 'TE', 'OL', 'DL', 'DT', 'LB', 'CB', 'S', 'K', 'P']
+YEAR_ORDER = ['FR', 'FR (RS)', 'SO', 'SO (RS)', 'JR', 'JR (RS)', 'SR']
+DEVT_ORDER = ['Elite', 'Star', 'Impact', 'Normal']
+
+# Categorical terms: data column -> (dummy column prefix, category order)
+CATEGORICAL = {
+    'DevT': ('DevT', DEVT_ORDER),
+    'Position': ('Position_', POSITION_ORDER),
+    'Year': ('Year_', YEAR_ORDER)
+}
+
+# Model formulas from NCAAModel.ipynb
+FULL_MODEL = ['DevT', 'Snaps'] + COACHING_VARS + ['XP.Penalty']
+DUMMY_MODEL = ['DevT'] + COACHING_VARS + ['XP.Penalty', 'Position', 'Year']
+
+# Column layout shared by the training workbook and the community sheet rows
+SHEET_COLUMNS = [
+    'Team', 'Name', 'Skill.Points', 'Position', 'Year', 'DevT', 'DevT.Num', 'Snaps'
+] + COACHING_VARS + ['XP.Penalty']
+
+ACCURACY_RANGES = [5, 7.5, 10, 20, 25]
+DEVT_ACCURACY_RANGES = [5, 10, 15]
+
+
+def _r_name(column):
+    """Column name as R's read.xlsx reports it ('HC_Moti 1' -> 'HC_Moti.1')"""
+    return str(column).strip().replace(' ', '.')
+
+
+def load_training_data(path=DATA_PATH, sheet_name=0, cache=True):
+    """Read the training workbook into a dict of NumPy columns
+
+    Column names follow the notebook (Skill.Points, HC_Moti.1, XP.Penalty)
+    and Team/Position/Year are trimmed as the notebook does with trimws.
+    With cache, the sheet is parsed once into NCAADataCache and later
+    loads read the cached columns. A .ncaarec file (NCAAPlayerRecord) is
+    read directly.
+    """
+    if path.endswith('.ncaarec'):
+        from NCAAPlayerRecord import PlayerRecords
+        return PlayerRecords.load(path).to_data()
+    if cache:
+        from NCAADataCache import load_cached
+        return load_cached(path, sheet_name)
+    return parse_training_data(path, sheet_name)
+
+
+def parse_training_data(path=DATA_PATH, sheet_name=0):
+    """Parse the workbook sheet directly (the uncached path of load_training_data)"""
+    import pandas as pd
+
+    frame = pd.read_excel(path, sheet_name=sheet_name)
+    frame.columns = [_r_name(c) for c in frame.columns]
+    data = {}
+    for column in ['Team', 'Name', 'Position', 'Year', 'DevT']:
+        data[column] = np.array([str(v).strip() for v in frame[column]], dtype=object)
+    for column in ['Skill.Points', 'Snaps', 'XP.Penalty'] + COACHING_VARS:
+        data[column] = frame[column].to_numpy(dtype=np.float64)
+    return data
+
+
+def rows_to_data(rows):
+    """Column dict for sheet rows in the save_complete_data layout"""
+    columns = list(zip(*rows)) if rows else [()] * len(SHEET_COLUMNS)
+    raw = dict(zip(SHEET_COLUMNS, columns))
+    data = {}
+    for column in ['Team', 'Name', 'Position', 'Year', 'DevT']:
+        data[column] = np.array([str(v).strip() for v in raw[column]], dtype=object)
+    for column in ['Skill.Points', 'Snaps', 'XP.Penalty'] + COACHING_VARS:
+        data[column] = np.array(raw[column], dtype=np.float64)
+    return data
+
+
+def subset(data, keep):
+    """Rows of a column dict selected by a boolean mask or index array"""
+    return {column: values[keep] for column, values in data.items()}
+
+
+def concat(*datasets):
+    """Stack column dicts with the same columns"""
+    return {column: np.concatenate([d[column] for d in datasets]) for column in datasets[0]}
+
+
+def category_levels(data, column):
+    """Levels of a categorical column present in the data, baseline first"""
+    order = CATEGORICAL[column][1]
+    present = set(data[column])
+    return [level for level in order if level in present] + sorted(present - set(order))
+
+
+def term_columns(data, term, levels=None):
+    """Columns and names for one formula term
+
+    'A:B' is the interaction of two terms, one column per pair of their
+    columns (e.g. HC_TD3:DevTStar).
+    """
+    levels = levels or {}
+    if ':' in term:
+        left, right = term.split(':', 1)
+        left_columns, left_names = term_columns(data, left, levels)
+        right_columns, right_names = term_columns(data, right, levels)
+        pairs = [(i, j) for i in range(len(left_names)) for j in range(len(right_names))]
+        return ([left_columns[i] * right_columns[j] for i, j in pairs],
+                [f"{left_names[i]}:{right_names[j]}" for i, j in pairs])
+    if term in CATEGORICAL:
+        prefix = CATEGORICAL[term][0]
+        term_levels = levels.get(term) or category_levels(data, term)
+        return ([(data[term] == level).astype(np.float64) for level in term_levels[1:]],
+                [f"{prefix}{level}" for level in term_levels[1:]])
+    return [np.asarray(data[term], dtype=np.float64)], [term]
+
+
+def design_matrix(data, terms, levels=None):
+    """Design matrix and column names for a formula given as a list of terms
+
+    Categorical terms expand to dummies with the first level as baseline.
+    Pass levels (term -> level list) to keep columns aligned across subsets.
+    """
+    n = len(data['Skill.Points'])
+    columns = [np.ones(n)]
+    names = ['Intercept']
+    for term in terms:
+        term_cols, term_names = term_columns(data, term, levels)
+        columns.extend(term_cols)
+        names.extend(term_names)
+    return np.column_stack(columns), names
+
+
+class LinearFit:
+    """Ordinary least squares fit with the summary numbers the notebook reports"""
+
+    def __init__(self, X, y, names):
+        self.names = names
+        self.beta, _, self.rank, _ = np.linalg.lstsq(X, y, rcond=None)
+        self.fitted = X @ self.beta
+        self.residuals = y - self.fitted
+
+        n, p = X.shape
+        self.n = n
+        self.p = p
+        self.rss = float(self.residuals @ self.residuals)
+        tss = float(((y - y.mean()) ** 2).sum())
+        self.r_squared = 1 - self.rss / tss
+        self.adj_r_squared = 1 - (1 - self.r_squared) * (n - 1) / (n - self.rank)
+        self.mae = float(np.abs(self.residuals).mean())
+        self.rmse = float(np.sqrt(self.rss / n))
+        # Same definition as R's AIC() for lm: the error variance counts as a parameter
+        self.aic = n * (np.log(2 * np.pi) + 1 + np.log(self.rss / n)) + 2 * (self.rank + 1)
+
+    def coef(self):
+        return dict(zip(self.names, self.beta.tolist()))
+
+    def summary(self):
+        return {
+            'r_squared': self.r_squared,
+            'adj_r_squared': self.adj_r_squared,
+            'mae': self.mae,
+            'rmse': self.rmse,
+            'aic': self.aic,
+            'n': self.n
+        }
+
+
+def fit(data, terms, levels=None):
+    X, names = design_matrix(data, terms, levels)
+    return LinearFit(X, data['Skill.Points'], names)
+
+
+def iqr_bounds(residuals, k=1.5):
+    """Outlier fences k * IQR below the first and above the third quartile"""
+    q1, q3 = np.quantile(residuals, [0.25, 0.75])
+    iqr = q3 - q1
+    return q1 - k * iqr, q3 + k * iqr
+
+
+def iqr_inliers(residuals, k=1.5):
+    """Rows whose residual lies within the IQR fences"""
+    lower, upper = iqr_bounds(residuals, k)
+    return (residuals >= lower) & (residuals <= upper)
+
+
+def train(data, terms=DUMMY_MODEL, clean=True, exclude_teams=()):
+    """Fit a formula, drop 1.5 x IQR residual outliers and refit (Dummy_Model_Clean)
+
+    exclude_teams drops teams after outlier removal, as the notebook does
+    for the Auburn-free Dummy_Model_Final. Returns (fit, training rows).
+    """
+    model = fit(data, terms)
+    if clean:
+        data = subset(data, iqr_inliers(model.residuals))
+    if exclude_teams:
+        data = subset(data, ~np.isin(data['Team'], list(exclude_teams)))
+    if clean or exclude_teams:
+        model = fit(data, terms)
+    return model, data
+
+
+def accuracy_ranges(residuals, ranges):
+    n = len(residuals)
+    return [
+        {'range': r, 'percentage': round(float((np.abs(residuals) <= r).sum()) / n * 100, 2)}
+        for r in ranges
+    ]
+
+
+def _engine_factor(name):
+    """Dummy name as the scoring engine spells it (DevTStar -> DevT_Star)"""
+    if name.startswith('DevT') and not name.startswith('DevT_'):
+        return f"DevT_{name[len('DevT'):]}"
+    return name
+
+
+def coefficient_dicts(coef, levels):
+    """Split named regression coefficients into the apps' coefficient dicts
+
+    Raises ValueError for a coefficient the apps cannot score (e.g. Snaps),
+    rather than writing an artifact that silently predicts without it.
+    """
+    unscored = [name for name in coef if ':' not in name and name not in ('Intercept', 'XP.Penalty')
+                and name not in COACHING_VARS and not name.startswith(('Position_', 'Year_', 'DevT'))]
+    if unscored:
+        raise ValueError(f"The apps cannot score these terms: {', '.join(unscored)}")
+    coefficients = {'Intercept': coef['Intercept']}
+    # A formula without a coaching term (e.g. from NCAAModelSearch) still scores every ability, at 0
+    coefficients.update((var, coef.get(var, 0.0)) for var in COACHING_VARS)
+    coefficients['XP_Penalty'] = coef.get('XP.Penalty', 0.0)
+    dicts = {
+        'coefficients': coefficients,
+        'position_coeffs': {p: coef.get(f'Position_{p}', 0.0) for p in levels['Position']},
+        'year_coeffs': {y: coef.get(f'Year_{y}', 0.0) for y in levels['Year']},
+        'dev_trait_coeffs': {d: coef.get(f'DevT{d}', 0.0) for d in levels['DevT']}
+    }
+    interactions = {':'.join(map(_engine_factor, name.split(':'))): value
+                    for name, value in coef.items() if ':' in name}
+    if interactions:
+        dicts['interactions'] = interactions
+    return dicts
+
+
+def to_artifact(model, data, version, name=''):
+    """Coefficient artifact in the dict layout the apps use"""
+    levels = {column: category_levels(data, column) for column in CATEGORICAL}
+
+    devt_accuracy = {}
+    for devt in levels['DevT']:
+        residuals = model.residuals[data['DevT'] == devt]
+        devt_accuracy[devt] = {
+            'n': int(residuals.size),
+            'mae': round(float(np.abs(residuals).mean()), 2),
+            'ranges': accuracy_ranges(residuals, DEVT_ACCURACY_RANGES)
+        }
+
+    stats = model.summary()
+    stats['accuracy_ranges'] = accuracy_ranges(model.residuals, ACCURACY_RANGES)
+
+    artifact = {
+        'format': 1,
+        'version': str(version),
+        'name': name,
+        'trained_at': datetime.now(timezone.utc).isoformat(timespec='seconds')
+    }
+    artifact.update(coefficient_dicts(model.coef(), levels))
+    artifact['model_stats'] = stats
+    artifact['devt_accuracy'] = devt_accuracy
+    return artifact
+
+
+def write_json_atomic(obj, path):
+    """Write JSON atomically so readers never see a half-written file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+
+def save_artifact(artifact, path):
+    write_json_atomic(artifact, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data", nargs="?", default=DATA_PATH, help="training workbook")
+    parser.add_argument("--sheet", default=0, help="worksheet name (the notebook uses FINAL)")
+    parser.add_argument("--out", default="model.json", help="coefficient artifact to write")
+    parser.add_argument("--version", default=datetime.now().strftime("%Y.%m.%d"), help="model version label")
+    parser.add_argument("--exclude-team", action="append", default=[], help="team to drop after cleaning")
+    parser.add_argument("--community", help="also train on rows synced by NCAASheetSync into this store")
+    args = parser.parse_args()
+
+    data = load_training_data(args.data, args.sheet)
+    if args.community:
+        from NCAASheetSync import SheetSync
+        community = SheetSync(args.community).training_data()
+        print(f"Adding {len(community['Skill.Points'])} synced community rows")
+        data = concat(data, community)
+
+    print(f"{'Model':<20} {'N':>5} {'R_Squared':>10} {'MAE':>8} {'RMSE':>8} {'AIC':>10} {'Fit ms':>8}")
+    for label, terms, clean in [
+        ("Full_Model", FULL_MODEL, False),
+        ("Dummy_Model", DUMMY_MODEL, False),
+        ("Full_Model_Clean", FULL_MODEL, True),
+        ("Dummy_Model_Clean", DUMMY_MODEL, True)
+    ]:
+        start = time.perf_counter()
+        model, rows = train(data, terms, clean, args.exclude_team)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{label:<20} {model.n:>5} {model.r_squared:>10.5f} {model.mae:>8.3f} "
+              f"{model.rmse:>8.3f} {model.aic:>10.2f} {elapsed:>8.2f}")
+
+    save_artifact(to_artifact(model, rows, args.version, "Dummy_Model_Clean"), args.out)
+    print(f"\nWrote Dummy_Model_Clean coefficients to {args.out}")
+
+
+if __name__ == "__main__":
+    main()